@@ -0,0 +1,84 @@
+"""End-to-end benchmark of `all` on a synthetic channel, comparing source trees.
+
+    python benchmark/bench_all.py [REV ...] [--videos N] [--repeat N] [--python PATH]
+
+REV is a git revision or WORK (the working tree); default: HEAD WORK.
+Each revision runs in its own copy of src and resource, so their working and log dirs do not interfere.
+The crawler finds the video list and details already there, so no API key or network is needed.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import generate_channel  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHANNEL_ID = "UCbenchmark"
+
+
+def export_tree(rev, dest):
+    if rev == "WORK":
+        for name in ("src", "resource"):
+            shutil.copytree(f"{REPO_DIR}/{name}", f"{dest}/{name}", ignore=shutil.ignore_patterns("__pycache__"))
+    else:
+        archive = subprocess.run(["git", "archive", rev, "src", "resource"], cwd=REPO_DIR, check=True,
+                                 stdout=subprocess.PIPE).stdout
+        subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+
+
+def run_all(python, tree_dir, n_videos, n_vocab):
+    """fresh channel data, then `all`; returns (seconds, peak RSS MB of the process)"""
+    shutil.rmtree(f"{tree_dir}/working", ignore_errors=True)
+    generate_channel(f"{tree_dir}/working/{CHANNEL_ID}/crawler", n_videos, n_vocab)
+    with open(f"{tree_dir}/benchmark.yml", "wt") as f:
+        f.write(f"data:\n  channel_id: {CHANNEL_ID}\n  min_word_occur: 3\n  before_date: 2018-08-27\n")
+    env = dict(os.environ, YOUTUBE_API_KEY="unused", PYTHONHASHSEED="0", LC_ALL="C.UTF-8", LANG="C.UTF-8")
+    begin = perf_counter()
+    proc = subprocess.Popen([python, "src/youtube_stat/run.py", "all", "benchmark.yml"], cwd=tree_dir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = perf_counter() - begin
+    if status != 0:
+        sys.stderr.write(stderr.decode(errors="replace")[-3000:])
+        raise RuntimeError(f"`all` failed in {tree_dir}")
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("revs", nargs="*", default=["HEAD", "WORK"])
+    parser.add_argument("--videos", type=int, default=30000)
+    parser.add_argument("--vocab", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--python", default=sys.executable, help="interpreter with the dependencies installed")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_all_")
+    try:
+        rows = []
+        for i, rev in enumerate(args.revs):
+            tree_dir = f"{root}/{i}"
+            os.makedirs(tree_dir)
+            export_tree(rev, tree_dir)
+            results = [run_all(args.python, tree_dir, args.videos, args.vocab) for _ in range(args.repeat)]
+            rows.append((rev, median([t for t, _ in results]), max([m for _, m in results])))
+            print(f"{rev}: {' '.join(f'{t:.2f}' for t, _ in results)} sec", file=sys.stderr)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"all on {args.videos} synthetic videos (median of {args.repeat} runs)")
+    print(f"{'revision':<20} {'seconds':>8} {'peak RSS MB':>12}")
+    for rev, seconds, rss in rows:
+        print(f"{rev:<20} {seconds:>8.2f} {rss:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Microbenchmark of date parsing: the regex fast path, the memoized path and the vectorized path
+of lib.datetime_util against dateutil and dateparser.
+
+    python benchmark/bench_datetime.py [--n N] [--unique N]
+
+Strings are publishedAt of the YouTube API ("2018-06-28T09:00:01.000Z") and dataset dates ("2018/06/28").
+dateparser is slow, so it parses only the first 2000 strings and the rate is extrapolated.
+"""
+import argparse
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from youtube_stat.lib.datetime_util import parse_date_str, parse_date_series, _parse_date_str  # noqa: E402
+
+
+def generate(n, n_unique, fmt, seed=0):
+    rnd = random.Random(seed)
+    values = [fmt.format(y=rnd.randint(2010, 2019), mo=rnd.randint(1, 12), d=rnd.randint(1, 28),
+                         h=rnd.randint(0, 23), mi=rnd.randint(0, 59), s=rnd.randint(0, 59))
+              for _ in range(n_unique)]
+    return [values[rnd.randrange(n_unique)] for _ in range(n)]
+
+
+def timed(func, values):
+    begin = perf_counter()
+    func(values)
+    return perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--unique", type=int, default=20000, help="number of distinct strings")
+    args = parser.parse_args()
+
+    from dateutil import parser as dateutil_parser
+    import dateparser
+
+    inputs = [
+        ("publishedAt", "{y}-{mo:02d}-{d:02d}T{h:02d}:{mi:02d}:{s:02d}.000Z", None),
+        ("Y/m/d", "{y}/{mo:02d}/{d:02d}", "%Y/%m/%d"),
+    ]
+    print(f"{args.n} strings ({args.unique} distinct); microseconds per string")
+    print(f"{'input':<12} {'dateparser':>10} {'dateutil':>9} {'fast path':>10} {'memoized':>9} {'vectorized':>11}")
+    for name, template, fmt in inputs:
+        values = generate(args.n, args.unique, template)
+        few = values[:2000]
+        dateparser_sec = timed(lambda vs: [dateparser.parse(v) for v in vs], few) * len(values) / len(few)
+        dateutil_sec = timed(lambda vs: [dateutil_parser.parse(v) for v in vs], values)
+
+        def fast_path(vs):  # every string parsed by the regex (no cache hits)
+            for v in vs:
+                _parse_date_str.cache_clear()
+                parse_date_str(v)
+        fast_sec = timed(fast_path, values)
+        _parse_date_str.cache_clear()
+        memo_sec = timed(lambda vs: [parse_date_str(v) for v in vs], values)
+        vector_sec = timed(lambda vs: parse_date_series(vs, fmt=fmt), values)
+
+        row = [dateparser_sec, dateutil_sec, fast_sec, memo_sec, vector_sec]
+        print(f"{name:<12} " + " ".join(f"{x / len(values) * 1e6:>{w}.2f}" for x, w in zip(row, [10, 9, 10, 9, 11])))
+        expected = [parse_date_str(v).replace(tzinfo=None) for v in values[:1000]]
+        assert list(parse_date_series(values[:1000], fmt=fmt).dt.to_pydatetime()) == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark of SparseOLS against statsmodels OLS on wide, sparse synthetic designs.
+
+    python benchmark/bench_ols.py [--obs N] [--words N ...] [--targets N]
+
+Each design has month and weekday one-hot columns (rank deficient with the constant) and N word columns
+with about 5 words per row. All targets are fitted at once by SparseOLS, one by one by statsmodels.
+Both are compared with the minimum norm least squares solution by np.linalg.lstsq (SVD with a proper cutoff):
+statsmodels' pinv (rcond=1e-15) can keep a numerically zero singular value of such designs.
+"""
+import argparse
+import os
+import sys
+import warnings
+from time import perf_counter
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from youtube_stat.analysis.ols import SparseOLS, fit_statsmodels_ols  # noqa: E402
+
+
+def create_design(n_obs, n_words, n_targets, seed=0):
+    rng = np.random.RandomState(seed)
+    n_months = 36
+    rows = np.repeat(np.arange(n_obs), 2)
+    cols = np.column_stack([rng.randint(0, n_months, n_obs), n_months + rng.randint(0, 7, n_obs)]).ravel()
+    words_per_row = 5
+    word_rows = np.repeat(np.arange(n_obs), words_per_row)
+    word_cols = n_months + 7 + rng.randint(0, n_words, n_obs * words_per_row)
+    x = sparse.csr_matrix((np.ones(len(rows) + len(word_rows)),
+                           (np.concatenate([rows, word_rows]), np.concatenate([cols, word_cols]))),
+                          shape=(n_obs, n_months + 7 + n_words))
+    x.data[:] = 1  # duplicated words count once
+    columns = [f"m{i}" for i in range(n_months)] + [f"d{i}" for i in range(7)] + [f"w{i}" for i in range(n_words)]
+    ys = [x @ (rng.randn(x.shape[1]) * 0.1) + rng.randn(n_obs) for _ in range(n_targets)]
+    return x, columns, ys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obs", type=int, default=20000)
+    parser.add_argument("--words", type=int, nargs="*", default=[200, 1000, 2000])
+    parser.add_argument("--targets", type=int, default=4)
+    parser.add_argument("--skip-statsmodels", action="store_true")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    print(f"OLS of {args.targets} targets on {args.obs} rows (median of 3 runs for SparseOLS)")
+    print("max differences from lstsq as coef/resid")
+    print(f"{'columns':>8} {'sparse sec':>11} {'statsmodels sec':>16} {'speedup':>8} "
+          f"{'sparse diff':>17} {'statsmodels diff':>17}")
+    for n_words in args.words:
+        x, columns, ys = create_design(args.obs, n_words, args.targets)
+        times = []
+        for _ in range(3):
+            begin = perf_counter()
+            results = SparseOLS(x, columns).fit(ys)
+            times.append(perf_counter() - begin)
+        sparse_sec = float(np.median(times))
+        if args.skip_statsmodels:
+            print(f"{x.shape[1] + 1:>8} {sparse_sec:>11.2f}")
+            continue
+        begin = perf_counter()
+        expected = [fit_statsmodels_ols(x, columns, y) for y in ys]
+        sm_sec = perf_counter() - begin
+        sparse_diff, sm_diff = lstsq_diff(x, ys, results), lstsq_diff(x, ys, expected)
+        print(f"{x.shape[1] + 1:>8} {sparse_sec:>11.2f} {sm_sec:>16.2f} {sm_sec / sparse_sec:>7.1f}x "
+              f"{sparse_diff[0]:>8.1e}/{sparse_diff[1]:>8.1e} {sm_diff[0]:>8.1e}/{sm_diff[1]:>8.1e}")
+
+
+def lstsq_diff(x, ys, results):
+    """max absolute differences of (coef, resid) from np.linalg.lstsq"""
+    xd = np.column_stack([x.toarray(), np.ones(x.shape[0])])
+    coef_diff, resid_diff = 0.0, 0.0
+    for y, result in zip(ys, results):
+        coef = np.linalg.lstsq(xd, y, rcond=None)[0]
+        coef_diff = max(coef_diff, float(np.abs(result.coef - coef).max()))
+        resid_diff = max(resid_diff, float(np.abs(result.resid - (y - xd @ coef)).max()))
+    return coef_diff, resid_diff
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark of ResamplingTest: bootstrap and permutation tests of every coefficient.
+
+    python benchmark/bench_resample.py [--videos N] [--words N] [--resamples N] [--workers N ...]
+
+The design is like a channel's training data: month and weekday one-hot columns and word columns.
+"""
+import argparse
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from youtube_stat.analysis.ols import SparseOLS  # noqa: E402
+from youtube_stat.analysis.resample import ResamplingTest  # noqa: E402
+
+
+def create_design(n_videos, n_words, seed=0):
+    rng = np.random.RandomState(seed)
+    n_months = 24
+    month = np.eye(n_months)[rng.randint(0, n_months, n_videos)]
+    wday = np.eye(7)[rng.randint(0, 7, n_videos)]
+    words = (rng.rand(n_videos, n_words) < 5 / n_words).astype(np.float64)
+    x = sparse.csr_matrix(np.column_stack([month, wday, words]))
+    columns = [f"m{i}" for i in range(n_months)] + [f"d{i}" for i in range(7)] + [f"w{i}" for i in range(n_words)]
+    y = x @ (rng.randn(x.shape[1]) * 0.3) + rng.randn(n_videos)
+    return x, columns, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 4])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    x, columns, y = create_design(args.videos, args.words)
+    ols = SparseOLS(x, columns)
+    result = ols.fit(y)[0]
+    print(f"{args.resamples} replicates, {args.videos} videos x {len(columns) + 1} columns, "
+          f"chunk size {args.chunk_size}, cpu_count={os.cpu_count()}")
+    print(f"{'method':<12} {'workers':>7} {'seconds':>8}")
+    for method in ResamplingTest.METHODS:
+        for n_workers in args.workers:
+            test = ResamplingTest(ols, n_resamples=args.resamples, seed=0, n_workers=n_workers,
+                                  chunk_size=args.chunk_size)
+            begin = perf_counter()
+            test.run(y, result, method)
+            print(f"{method:<12} {n_workers:>7} {perf_counter() - begin:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Startup time of each subcommand: from the interpreter start through argument parsing, loading the config
+and importing the command module, up to the call of its start().
+
+    python benchmark/bench_startup.py [--commands crawl pre ana batch index] [--repeat N]
+
+Each run is a new process of src/youtube_stat/run.py that exits when the command would start.
+"python" is the bare interpreter (python -c pass) for comparison. "command import" is the time spent
+in importlib.import_module of youtube_stat.command.<name>, measured inside the process.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_PY = os.path.join(ROOT_DIR, "src", "youtube_stat", "run.py")
+
+COMMAND_ARGS = {
+    "crawl": ["crawl", "{config}"],
+    "pre": ["pre", "{config}"],
+    "ana": ["ana", "{config}"],
+    "batch": ["batch", "{config}"],
+    "index": ["index", "top"],
+}
+
+
+def child(system_dir, run_args):
+    """(in the child process) run run.py as __main__ and exit just before the command starts"""
+    import runpy
+    from pathlib import Path
+    sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+    import youtube_stat.config
+    youtube_stat.config._system_dir = lambda: Path(system_dir)  # keep log/ and cache/ out of the repository
+    from youtube_stat import manager
+
+    def import_then_exit(name):
+        begin = perf_counter()
+        original_import_module(name)
+        sys.stdout.write(json.dumps(dict(import_sec=perf_counter() - begin)) + "\n")
+        sys.stdout.flush()
+        os._exit(0)
+
+    original_import_module = manager.import_module
+    manager.import_module = import_then_exit
+    sys.argv = [RUN_PY] + run_args
+    runpy.run_path(RUN_PY, run_name="__main__")
+
+
+def run_once(args, env):
+    begin = perf_counter()
+    out = subprocess.run(args, env=env, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    elapsed = perf_counter() - begin
+    lines = out.decode().strip().splitlines()
+    return elapsed, json.loads(lines[-1])["import_sec"] if lines else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", nargs="*", default=list(COMMAND_ARGS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1:])
+        return
+
+    env = dict(os.environ, LC_ALL="C.UTF-8", LANG="C.UTF-8")
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as system_dir:
+        config_path = os.path.join(system_dir, "config.yml")
+        with open(config_path, "wt") as f:
+            f.write("data:\n  channel_id: UCbenchmark\n")
+        runs = [("python", [sys.executable, "-c", "pass"])]
+        for command in args.commands:
+            run_args = [a.format(config=config_path) for a in COMMAND_ARGS[command]]
+            runs.append((command, [sys.executable, __file__, "--child", system_dir] + run_args))
+
+        print(f"median of {args.repeat} runs, milliseconds")
+        print(f"{'command':<8} {'total':>8} {'command import':>15}")
+        for name, cmd in runs:
+            run_once(cmd, env)  # warm up the page cache and __pycache__
+            times = [run_once(cmd, env) for _ in range(args.repeat)]
+            total, import_sec = [statistics.median(t) for t in zip(*times)]
+            print(f"{name:<8} {total * 1000:>8.0f} {import_sec * 1000:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark of the tokenizers on synthetic titles: sequential vs workers, cold vs warm token cache.
+
+    python benchmark/bench_tokenizer.py [--titles N] [--workers N ...] [--yahoo-titles N] [--latency SEC]
+
+Janome (declared in Pipfile) runs in worker processes. The Yahoo API backend runs in worker threads against
+a local stub server (tests/stub_server.py) which answers every request after a fixed latency, without the
+client side rate limit unless --yahoo-rate-limit is given. Runs offline.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+from xml.sax.saxutils import escape
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+sys.path.insert(0, ROOT_DIR)
+
+from synthetic import generate_titles  # noqa: E402
+from tests.stub_server import StubServer, stub_response  # noqa: E402
+from youtube_stat.config import Config  # noqa: E402
+from youtube_stat.lib.japanese_parser import create_japanese_parser, _janome_parse_texts  # noqa: E402
+from youtube_stat.lib.token_cache import TokenizationCache  # noqa: E402
+
+
+def yahoo_stub(latency):
+    """answers the words of the sentence separated by spaces, as Yahoo MAService does, after `latency` seconds"""
+    def responder(request):
+        words = "".join(f"<word><count>1</count><surface>{escape(w)}</surface><pos>名詞</pos></word>"
+                        for w in request.params["sentence"].split(" "))
+        body = (f'<?xml version="1.0" encoding="UTF-8" ?><ResultSet xmlns="urn:yahoo:jp:jlp">'
+                f'<uniq_result><word_list>{words}</word_list></uniq_result></ResultSet>')
+        return stub_response(200, body.encode(), {"Content-Type": "text/xml"}, delay=latency)
+    return responder
+
+
+def parse(texts, n_workers, cache=None, backend='janome', url=None, rate_limit=None):
+    config = Config()
+    rc = config.resource
+    rc.japanese_parser = backend
+    rc.japanese_parser_workers = n_workers
+    if backend == 'yahoo':
+        rc.yahoo_api_url = f"{url}/MAService/V1/parse"
+        rc.yahoo_api_client_id = "benchmark"
+        rc.yahoo_api_rate_limit = rate_limit
+    parser = create_japanese_parser(config, cache=cache)
+    begin = perf_counter()
+    results = parser.parse_japanese_batch(texts)
+    elapsed = perf_counter() - begin
+    parser.close()
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--yahoo-titles", type=int, default=500)
+    parser.add_argument("--yahoo-workers", type=int, nargs="*", default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stub server takes per request")
+    parser.add_argument("--yahoo-rate-limit", type=float, help="requests per second (default: unlimited)")
+    args = parser.parse_args()
+
+    texts = generate_titles(args.titles)
+    _janome_parse_texts(["辞書の読み込み"])  # load the dictionary outside of the measurement
+    rows = []
+    expected = None
+    for n_workers in args.workers:
+        elapsed, results = parse(texts, n_workers)
+        expected = expected or results
+        assert results == expected, f"results differ with {n_workers} workers"
+        rows.append((f"workers={n_workers}, no cache", elapsed))
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_tokenizer_")
+    try:
+        with TokenizationCache(f"{cache_dir}/tokens.sqlite3") as cache:
+            rows.append(("workers=1, cold cache", parse(texts, 1, cache)[0]))
+            elapsed, results = parse(texts, 1, cache)
+            assert results == expected
+            rows.append(("workers=1, warm cache", elapsed))
+            print(f"cache hits={cache.hits} misses={cache.misses}", file=sys.stderr)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"Janome on {len(texts)} synthetic titles ({len(set(texts))} unique), cpu_count={os.cpu_count()}")
+    print_rows(rows, len(texts))
+
+    texts = texts[:args.yahoo_titles]
+    rows = []
+    expected = None
+    with StubServer(yahoo_stub(args.latency)) as server:
+        kwargs = dict(backend='yahoo', url=server.url, rate_limit=args.yahoo_rate_limit)
+        for n_workers in args.yahoo_workers:
+            elapsed, results = parse(texts, n_workers, **kwargs)
+            expected = expected or results
+            assert results == expected, f"results differ with {n_workers} workers"
+            rows.append((f"workers={n_workers}, no cache", elapsed))
+
+        n_workers = max(args.yahoo_workers)
+        cache_dir = tempfile.mkdtemp(prefix="bench_tokenizer_")
+        try:
+            with TokenizationCache(f"{cache_dir}/tokens.sqlite3") as cache:
+                rows.append((f"workers={n_workers}, cold cache", parse(texts, n_workers, cache, **kwargs)[0]))
+                n_requests = len(server.requests)
+                elapsed, results = parse(texts, n_workers, cache, **kwargs)
+                assert results == expected and len(server.requests) == n_requests
+                rows.append((f"workers={n_workers}, warm cache", elapsed))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"Yahoo API (stub server, {args.latency * 1000:.0f} ms per request, rate limit "
+          f"{args.yahoo_rate_limit or 'none'}) on {len(texts)} titles ({len(set(texts))} unique)")
+    print_rows(rows, len(texts))
+
+
+def print_rows(rows, n_texts):
+    print(f"{'setting':<24} {'seconds':>8} {'titles/sec':>11}")
+    for name, elapsed in rows:
+        print(f"{name:<24} {elapsed:>8.2f} {n_texts / elapsed:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Peak memory of convert_to_training_data on a synthetic channel, by dataset format and training_chunk_size.
+
+    python benchmark/bench_training_memory.py [--videos N] [--formats tsv feather parquet] [--chunk-sizes 0 20000]
+    python benchmark/bench_training_memory.py --storage [--videos N]
+
+--storage compares the training data as the sparse train.npz with the dense train.csv (the format used before
+train.npz): writing it (convert_to_training_data, with export_training_csv for csv) and loading it for the
+analysis (load_training_data, or pandas.read_csv of train.csv), on the tsv dataset without chunks.
+
+Chunk size 0 means unchunked (training_chunk_size None). Each measurement runs in a fresh process and reports
+its peak RSS during convert_to_training_data above the RSS before the call (after imports).
+The dataset is created in a process of its own too, as the peak RSS (ru_maxrss) is inherited by forked processes.
+feather and parquet need pyarrow and are skipped without it. Runs offline.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from synthetic import generate_channel  # noqa: E402
+from youtube_stat.config import Config  # noqa: E402
+from youtube_stat.data.processor import DataProcessor  # noqa: E402
+
+CHANNEL_ID = "UCbenchmark"
+
+
+def create_config(system_dir, fmt, chunk_size=None):
+    config = Config()
+    rc = config.resource
+    rc.system_dir = Path(system_dir)
+    rc.log_dir = rc.system_dir / "log"
+    rc.cache_dir = rc.system_dir / "cache"
+    rc.dataset_format = fmt
+    rc.training_chunk_size = chunk_size or None
+    config.data.channel_id = CHANNEL_ID
+    config.data.min_word_occur = 3
+    config.data.before_date = "2018-08-27"
+    return config
+
+
+def prepare(system_dir, fmt, n_videos):
+    """crawler output with parsed titles -> vocabulary and dataset file of `fmt`"""
+    config = create_config(system_dir, fmt)
+    generate_channel(config.resource.crawler_data_dir, n_videos)
+    config.resource.create_base_dirs()
+    config.resource.migrate_legacy_files()
+    dp = DataProcessor(config)
+    dp.parse_text()
+    dp.create_dataset()
+
+
+def measure(system_dir, fmt, chunk_size):
+    """(in the child process) run convert_to_training_data, print the result as JSON"""
+    dp = DataProcessor(create_config(system_dir, fmt, chunk_size))
+    result, td = measure_call(dp.convert_to_training_data)
+    print(json.dumps(dict(result, rows=len(td.ids), columns=len(td.columns),
+                          npz_bytes=os.path.getsize(dp.training_data_path))))
+
+
+def measure_storage(system_dir, step):
+    """(in the child process) write-sparse, write-csv, load-sparse or load-csv; print the result as JSON"""
+    config = create_config(system_dir, "tsv")
+    config.resource.export_training_csv = step == "write-csv"
+    dp = DataProcessor(config)
+    if step.startswith("write"):
+        result, _ = measure_call(dp.convert_to_training_data)
+    elif step == "load-sparse":
+        result, _ = measure_call(dp.load_training_data)
+    else:
+        import pandas as pd
+        result, _ = measure_call(lambda: pd.read_csv(dp.training_csv_path))
+    path = dp.training_csv_path if step.endswith("csv") else dp.training_data_path
+    print(json.dumps(dict(result, file_bytes=os.path.getsize(path))))
+
+
+def measure_call(func):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    begin = perf_counter()
+    ret = func()
+    elapsed = perf_counter() - begin
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return dict(seconds=elapsed, before_mb=before / 1024, peak_mb=peak / 1024), ret
+
+
+def run_child(env, *args):
+    """run `--child *args` in a new process (a fresh ru_maxrss), return its JSON output if any"""
+    out = subprocess.run([sys.executable, __file__, "--child"] + [str(x) for x in args],
+                         env=env, check=True, stdout=subprocess.PIPE).stdout
+    lines = out.decode().strip().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def compare_storage(n_videos, env):
+    system_dir = tempfile.mkdtemp(prefix="bench_training_memory_")
+    rows = []
+    try:
+        run_child(env, "prepare", system_dir, "tsv", n_videos)
+        for step in ["write-sparse", "write-csv", "load-sparse", "load-csv"]:
+            rows.append((step, run_child(env, "storage", system_dir, step, 0)))
+            print(f"{step}: {rows[-1][1]}", file=sys.stderr)
+    finally:
+        shutil.rmtree(system_dir, ignore_errors=True)
+
+    print(f"training data as sparse train.npz vs dense train.csv, {n_videos} synthetic videos")
+    print(f"{'step':<14} {'seconds':>8} {'peak RSS MB':>12} {'above start MB':>15} {'file MB':>8}")
+    for step, r in rows:
+        print(f"{step:<14} {r['seconds']:>8.2f} {r['peak_mb']:>12.0f} {r['peak_mb'] - r['before_mb']:>15.0f} "
+              f"{r['file_bytes'] / 1024 ** 2:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=300000)
+    parser.add_argument("--formats", nargs="*", default=["tsv", "feather", "parquet"])
+    parser.add_argument("--chunk-sizes", type=int, nargs="*", default=[0, 20000])
+    parser.add_argument("--storage", action="store_true", help="compare sparse train.npz with dense train.csv")
+    parser.add_argument("--child", nargs=4, metavar=("COMMAND", "DIR", "ARG", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    env = dict(os.environ, LC_ALL="C.UTF-8", LANG="C.UTF-8")
+    if args.child:
+        command, system_dir, arg, n = args.child
+        if command == "prepare":
+            prepare(system_dir, arg, int(n))
+        elif command == "storage":
+            measure_storage(system_dir, arg)
+        else:
+            measure(system_dir, arg, int(n))
+        return
+    if args.storage:
+        compare_storage(args.videos, env)
+        return
+
+    formats = [f for f in args.formats if f == "tsv" or importlib.util.find_spec("pyarrow")]
+    if formats != args.formats:
+        print(f"pyarrow is not installed; skip {sorted(set(args.formats) - set(formats))}", file=sys.stderr)
+    rows = []
+    for fmt in formats:
+        system_dir = tempfile.mkdtemp(prefix="bench_training_memory_")
+        try:
+            run_child(env, "prepare", system_dir, fmt, args.videos)
+            for chunk_size in args.chunk_sizes:
+                result = run_child(env, "measure", system_dir, fmt, chunk_size)
+                rows.append((fmt, chunk_size or "-", result))
+                print(f"{fmt} {chunk_size}: {result}", file=sys.stderr)
+        finally:
+            shutil.rmtree(system_dir, ignore_errors=True)
+
+    print(f"convert_to_training_data on {args.videos} synthetic videos")
+    print(f"{'format':<8} {'chunk':>6} {'seconds':>8} {'peak RSS MB':>12} {'above start MB':>15} {'train.npz':>10}")
+    for fmt, chunk_size, r in rows:
+        print(f"{fmt:<8} {chunk_size:>6} {r['seconds']:>8.2f} {r['peak_mb']:>12.0f} "
+              f"{r['peak_mb'] - r['before_mb']:>15.0f} {r['npz_bytes']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""synthetic channel data for the benchmarks (no API calls are needed to process it)"""
+import json
+import os
+import random
+
+WORDS = [
+    "ゲーム", "実況", "初見", "攻略", "最強", "最新", "検証", "解説", "ランキング", "まとめ", "神回", "爆笑", "衝撃",
+    "料理", "簡単", "レシピ", "旅行", "東京", "大阪", "北海道", "猫", "犬", "子供", "先生", "学校", "夏休み", "新作",
+    "発売", "開封", "レビュー", "比較", "紹介", "挑戦", "失敗", "成功", "本気", "全力", "最後", "一日", "生活",
+]
+PARTICLES = ["の", "を", "で", "に", "が", "と"]
+VERBS = ["やってみた", "食べる", "作る", "遊ぶ", "行く", "見る"]
+
+
+def generate_titles(n_titles, seed=0):
+    """Japanese-like titles made of common words, e.g. for tokenizer benchmarks"""
+    rnd = random.Random(seed)
+    titles = []
+    for i in range(n_titles):
+        parts = []
+        for _ in range(rnd.randint(2, 5)):
+            parts += [rnd.choice(WORDS), rnd.choice(PARTICLES)]
+        parts.append(rnd.choice(VERBS))
+        titles.append("".join(parts) + f" #{i % 1000}")
+    return titles
+
+
+def generate_channel(crawler_dir, n_videos, n_vocab=300, seed=0):
+    """video_list.json and video_detail_list.json with parsed titles, as the crawler and parse_text leave them
+
+    The legacy JSON format is written so that every revision can read it (newer ones migrate it to JSON Lines).
+    """
+    rnd = random.Random(seed)
+    vocab = [f"語{i}" for i in range(n_vocab)] + ["game", "live", "123"]
+    pos_list = ['名詞', '動詞', '形容詞', '助詞']
+    video_list = []
+    detail_list = []
+    for i in range(n_videos):
+        video_id = f"vid{i:07d}"
+        words = rnd.sample(vocab, rnd.randint(2, 8))
+        published_at = (f"{2016 + rnd.randint(0, 2)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+                        f"T{rnd.randint(0, 23):02d}:00:00.000Z")
+        view = rnd.randint(100, 1000000)
+        video_list.append(dict(id=dict(kind="youtube#video", videoId=video_id),
+                               snippet=dict(title=" ".join(words), publishedAt=published_at)))
+        detail_list.append(dict(
+            id=video_id,
+            snippet=dict(title=" ".join(words), publishedAt=published_at),
+            statistics=dict(viewCount=str(view), likeCount=str(view // rnd.randint(10, 100)),
+                            dislikeCount=str(rnd.randint(0, 100)), commentCount=str(rnd.randint(0, 1000))),
+            parsed_title=[dict(surface=w, pos=_pick_pos(rnd, w, pos_list), count="1") for w in words],
+        ))
+    os.makedirs(crawler_dir, exist_ok=True)
+    for name, data in [("video_list.json", video_list), ("video_detail_list.json", detail_list)]:
+        with open(f"{crawler_dir}/{name}", "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def _pick_pos(rnd, word, pos_list):
+    # some words are not used as features
+    if word.startswith("語") and int(word[1:]) % 7 == 0:
+        return rnd.choice(pos_list)
+    return '名詞'
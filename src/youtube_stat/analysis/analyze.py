@@ -1,17 +1,18 @@
 import re
 from logging import getLogger
+from time import time
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
 
+from youtube_stat.analysis.ols import SparseOLS, OlsResult, fit_statsmodels_ols, compare_ols_results
+from youtube_stat.analysis.resample import ResamplingTest
+from youtube_stat.analysis.rolling import RollingOLS
 from youtube_stat.config import Config
-from youtube_stat.data.processor import DataProcessor
-from youtube_stat.lib.datetime_util import parse_date_str
-from youtube_stat.lib.file_util import load_json_from_file
+from youtube_stat.lib.util import peak_rss_mb
+from youtube_stat.data.processor import DataProcessor, TrainingData, word_column_names
+from youtube_stat.lib.file_util import save_json_to_file
+from youtube_stat.lib.stage_cache import StageCache
 
 logger = getLogger(__name__)
 
@@ -20,83 +21,197 @@ class Analyser:
     def __init__(self, config: Config):
         self.config = config
 
+    GROUP_GRAPH_NAMES = ["view_by_month.png", "view_by_weekday.png", "like_rate_by_month.png"]
+    TARGET_NAMES = ["log_view", "like_rate"]
+    X_COLUMN_RE = re.compile(r"^([0-9]{4}-[0-9]{2}|Mon|Tue|Wed|Thr|Fri|Sat|Sun|w)")
+    # month columns are left out: a window covers only a few months, whose level the weekday columns absorb
+    ROLLING_X_COLUMN_RE = re.compile(r"^(Mon|Tue|Wed|Thr|Fri|Sat|Sun|w)")
+
     def start(self):
+        begin_time = time()
+        rc = self.config.resource
         dp = DataProcessor(self.config)
-        df = dp.load_training_data()
-
-        words = load_json_from_file(dp.word_index_path)
-        for w, i in list(words.items()):
-            words[f"w{i:03d}"] = w
-
-        self.plot_distribution(df)
-        self.plot_group_distribution(dp)
-        self.analyze("log_view", df, np.log(df.view), words)
-        self.analyze("like_rate", df, df.like / df.view, words)
+        stages = StageCache(rc.stage_state_path, enable=rc.use_stage_cache, force=rc.force_stages)
+        training_files = [dp.training_data_path, dp.training_meta_path, dp.training_targets_path, dp.word_index_path,
+                          rc.vocabulary_path]
+        td = None
+
+        def load_training_data():
+            nonlocal td
+            td = td or self.config.runtime.training_data or dp.load_training_data()
+            return td
+
+        stages.run("plot_distribution", lambda: self.plot_distribution(load_training_data().targets),
+                   inputs=training_files,
+                   outputs=[f"{rc.working_dir}/{x}" for x in [rc.summary_dist_graph_name, rc.target_dist_graph_name]])
+        stages.run("plot_group_distribution", lambda: self.plot_group_distribution(dp),
+                   inputs=[dp.dataset_path], outputs=[f"{rc.working_dir}/{x}" for x in self.GROUP_GRAPH_NAMES])
+        stages.run("analyze", lambda: self.analyze_all(load_training_data()),
+                   inputs=training_files + [rc.resource_dir / rc.summary_template_name],
+                   outputs=[f"{rc.working_dir}/{x}_summary.html" for x in self.TARGET_NAMES] +
+                           [f"{rc.working_dir}/{rc.word_effects_name}"],
+                   params=self.analyze_params())
+        if self.config.model.rolling_window_days:
+            stages.run("analyze_rolling", lambda: self.analyze_rolling(dp, load_training_data()),
+                       inputs=training_files + [dp.dataset_path],
+                       outputs=[f"{rc.working_dir}/{rc.rolling_coef_name}"], params=self.rolling_params())
+
+        rss, children_rss = peak_rss_mb()
+        logger.info(f"analysis of {self.config.data.channel_id} finished in {time() - begin_time:.1f} sec "
+                    f"(peak RSS: {rss} MB, worker processes: {children_rss} MB)")
+
+    def analyze_params(self):
+        mc = self.config.model
+        return dict(ols_engine=mc.ols_engine, significance=mc.significance, n_resamples=mc.n_resamples,
+                    resample_seed=mc.resample_seed, resample_chunk_size=mc.resample_chunk_size)
+
+    def rolling_params(self):
+        mc = self.config.model
+        return dict(window_days=mc.rolling_window_days, step_days=mc.rolling_step_days,
+                    half_life_days=mc.rolling_half_life_days, ridge=mc.rolling_ridge,
+                    min_word_occur=self.config.data.min_word_occur)
+
+    def column_words(self, td: TrainingData):
+        """column name -> word"""
+        surfaces = DataProcessor(self.config).vocabulary.surfaces.lookup(td.word_ids)
+        return dict(zip(word_column_names(len(td.word_ids)), surfaces))
+
+    @staticmethod
+    def create_targets(df):
+        return [("log_view", np.log(df.view)), ("like_rate", df.like / df.view)]
+
+    def analyze_all(self, td: TrainingData):
+        words = self.column_words(td)
+
+        x_index = [i for i, x in enumerate(td.columns) if self.X_COLUMN_RE.search(x)]
+        x = td.x[:, x_index]
+        x_cols = [td.columns[i] for i in x_index]
+        occur = dict(zip(x_cols, np.asarray(x.sum(axis=0)).ravel()))
+        targets = self.create_targets(td.targets)
+
+        mc = self.config.model
+        engine = mc.ols_engine
+        sparse_ols = SparseOLS(x, x_cols) if engine == 'sparse' or mc.significance != 'ols' else None
+        if engine == 'sparse':
+            results = sparse_ols.fit([y for _, y in targets])
+        elif engine == 'statsmodels':
+            results = [fit_statsmodels_ols(x, x_cols, y) for _, y in targets]
+        else:
+            raise ValueError(f"unknown ols engine: {engine}")
+
+        if self.config.model.ols_cross_check:
+            sparse_results = SparseOLS(x, x_cols).fit([y for _, y in targets])
+            for (name, y), result in zip(targets, sparse_results):
+                diff = compare_ols_results(result, fit_statsmodels_ols(x, x_cols, y))
+                logger.info(f"{name}: max abs diff between sparse and statsmodels OLS: {diff}")
+
+        resample_dfs = [None] * len(targets)
+        if mc.significance != 'ols':
+            test = ResamplingTest(sparse_ols, n_resamples=mc.n_resamples, seed=mc.resample_seed,
+                                  n_workers=mc.resample_workers, chunk_size=mc.resample_chunk_size)
+            sparse_results = results if engine == 'sparse' else sparse_ols.fit([y for _, y in targets])
+            begin_time = time()
+            resample_dfs = [test.run(y, result, method=mc.significance)
+                            for (_, y), result in zip(targets, sparse_results)]
+            logger.info(f"{mc.significance} test with {mc.n_resamples} replicates: {time() - begin_time:.1f} sec")
+
+        word_effects = {}
+        for (name, _), result, resample_df in zip(targets, results, resample_dfs):
+            word_effects[name] = self.analyze(name, result, words, occur, resample_df)
+        save_json_to_file(f"{self.config.resource.working_dir}/{self.config.resource.word_effects_name}",
+                          word_effects)
+
+    def analyze_rolling(self, dp: DataProcessor, td: TrainingData):
+        """coefficients of the words in every window, one row per (window, word) occurring min_word_occur times"""
+        mc = self.config.model
+        words = self.column_words(td)
+        frame = dp.load_basic_frame(["id", "date"])
+        dates = pd.Series(frame.date.values, index=frame.id).reindex(td.ids).values.astype('datetime64[D]')
+        targets = self.create_targets(td.targets)
+        use = np.logical_and.reduce([np.isfinite(y.values) for _, y in targets])
+
+        x_index = [i for i, x in enumerate(td.columns) if self.ROLLING_X_COLUMN_RE.search(x)]
+        x_cols = [td.columns[i] for i in x_index]
+        begin_time = time()
+        rolling = RollingOLS(td.x[use][:, x_index], dates[use], mc.rolling_window_days, mc.rolling_step_days,
+                             half_life_days=mc.rolling_half_life_days, ridge=mc.rolling_ridge)
+        windows, coefs, occurs = rolling.fit([y[use] for _, y in targets])
+        logger.info(f"rolling OLS of {len(windows)} windows: {time() - begin_time:.2f} sec "
+                    f"({rolling.n_iterations} conjugate gradient iterations)")
+
+        word_index = np.array([i for i, c in enumerate(x_cols) if c in words], dtype=np.int64)
+        win_i, col_i = np.nonzero(occurs[:, word_index] >= max(self.config.data.min_word_occur, 1))
+        col_i = word_index[col_i]
+        df = pd.DataFrame({
+            "window_begin": [windows[i].begin for i in win_i],
+            "window_end": [windows[i].end for i in win_i],
+            "n_obs": [windows[i].n_obs for i in win_i],
+            "word": [words[x_cols[i]] for i in col_i],
+            "occur": occurs[win_i, col_i],
+        })
+        for t, (name, _) in enumerate(targets):
+            df[name] = coefs[win_i, col_i, t]
+        df.to_csv(f"{self.config.resource.working_dir}/{self.config.resource.rolling_coef_name}", index=False)
 
     def plot_distribution(self, df):
-        fig, axes = plt.subplots(nrows=2, ncols=2, figsize=(12, 6))
-
-        sns.distplot(df.view, kde=False, ax=axes[0, 0])
-        axes[0, 0].set_title("View Count Distribution")
-
-        sns.distplot(df.like, kde=False, ax=axes[0, 1])
-        axes[0, 1].set_title("Like Count Distribution")
-
-        sns.distplot(df.dislike, kde=False, ax=axes[1, 0])
-        axes[1, 0].set_title("Dislike Count Distribution")
-
-        sns.distplot(df.comment, kde=False, ax=axes[1, 1])
-        axes[1, 1].set_title("Comment Count Distribution")
-
-        plt.subplots_adjust(hspace=0.4)
-
-        fig.savefig(f"{self.config.resource.working_dir}/{self.config.resource.summary_dist_graph_name}")
-
-        ###
-        fig, axes = plt.subplots(nrows=1, ncols=2, figsize=(12, 3))
-
-        sns.distplot(np.log(df.view), kde=False, ax=axes[0])
-        axes[0].set_title("Log(View Count) Distribution")
-
-        sns.distplot(df.like / df.view, kde=False, ax=axes[1])
-        axes[1].set_title("Like/View Rate Distribution")
-        fig.savefig(f"{self.config.resource.working_dir}/{self.config.resource.target_dist_graph_name}")
+        from youtube_stat.analysis.plot import Panel, FigureSpec, compute_histogram, render_figures
+
+        rc = self.config.resource
+        specs = [
+            FigureSpec(path=f"{rc.working_dir}/{rc.summary_dist_graph_name}", nrows=2, ncols=2, figsize=(12, 6),
+                       hspace=0.4, panels=[
+                           Panel('hist', "View Count Distribution", compute_histogram(df.view), "view"),
+                           Panel('hist', "Like Count Distribution", compute_histogram(df.like), "like"),
+                           Panel('hist', "Dislike Count Distribution", compute_histogram(df.dislike), "dislike"),
+                           Panel('hist', "Comment Count Distribution", compute_histogram(df.comment), "comment"),
+                       ]),
+            FigureSpec(path=f"{rc.working_dir}/{rc.target_dist_graph_name}", nrows=1, ncols=2, figsize=(12, 3),
+                       hspace=None, panels=[
+                           Panel('hist', "Log(View Count) Distribution", compute_histogram(np.log(df.view)), "view"),
+                           Panel('hist', "Like/View Rate Distribution", compute_histogram(df.like / df.view), None),
+                       ]),
+        ]
+        render_figures(specs, max_workers=rc.plot_max_workers)
 
     def plot_group_distribution(self, dp: DataProcessor):
-        bdf = dp.load_basic_data()
-        bdf['month'] = bdf.apply(lambda r: parse_date_str(r.date).strftime("%Y-%m"), axis=1)
-
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 5))
-        sns.boxplot(bdf.month, bdf.view, order=sorted(bdf.month.unique()), ax=ax)
-        ax.set_title("view by month")
-        fig.savefig(f"{self.config.resource.working_dir}/view_by_month.png")
-
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 5))
-        sns.boxplot(bdf.wday, bdf.view, order=sorted(bdf.wday.unique()), ax=ax)
-        ax.set_title("view by weekday(0=Mon ~ 6=Sun")
-        fig.savefig(f"{self.config.resource.working_dir}/view_by_weekday.png")
-
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 5))
-        sns.boxplot(bdf.month, bdf.like / bdf.view, order=sorted(bdf.month.unique()), ax=ax)
-        ax.set_title("like rate by month")
-        fig.savefig(f"{self.config.resource.working_dir}/like_rate_by_month.png")
-
-    def analyze(self, name, df, df_y, words):
+        from youtube_stat.analysis.plot import Panel, FigureSpec, compute_box_stats, render_figures
+
+        rc = self.config.resource
+        dataset = self.config.runtime.basic_dataset
+        if dataset is not None:
+            bdf = dataset.to_frame()
+        else:
+            bdf = dp.load_basic_frame(["date", "wday", "view", "like"])
+        bdf['month'] = bdf.date.dt.strftime("%Y-%m")
+        bdf['like_rate'] = bdf.like / bdf.view
+
+        def box_figure(name, title, group_col, value_col):
+            panel = Panel('box', title, compute_box_stats(bdf, group_col, value_col), group_col)
+            return FigureSpec(path=f"{rc.working_dir}/{name}", nrows=1, ncols=1, figsize=(15, 5), hspace=None,
+                              panels=[panel])
+
+        view_by_month, view_by_weekday, like_rate_by_month = self.GROUP_GRAPH_NAMES
+        specs = [
+            box_figure(view_by_month, "view by month", "month", "view"),
+            box_figure(view_by_weekday, "view by weekday(0=Mon ~ 6=Sun", "wday", "view"),
+            box_figure(like_rate_by_month, "like rate by month", "month", "like_rate"),
+        ]
+        render_figures(specs, max_workers=rc.plot_max_workers)
+
+    def analyze(self, name, result: OlsResult, words, occur, resample_df=None):
+        """write the summary html of the target and return its word effects for the cross-channel index"""
         template = open(self.config.resource.resource_dir / self.config.resource.summary_template_name, "rt").read()
-        params = {"name": name}
-
-        x_cols = [x for x in df.columns if re.search(r"^(201|Mon|Tue|Wed|Thr|Fri|Sat|Sun|w)", x)]
+        params = {"name": name, "significance": self.config.model.significance}
 
-        df_x = df.loc[:, x_cols]
-        df_x = sm.add_constant(df_x, prepend=False)
-        model = smf.OLS(df_y, df_x, hasconst=True)
-        result = model.fit()
-        summary = result.summary2()
-        params["stat1"] = summary.tables[0].to_html(header=False, index=False)
-        params["stat2"] = summary.tables[2].to_html(header=False, index=False)
+        params["stat1"] = result.info_table.to_html(header=False, index=False)
+        params["stat2"] = result.diag_table.to_html(header=False, index=False)
 
-        coef_df = summary.tables[1]
-        cf = coef_df[coef_df['P>|t|'] < 0.1].loc[:, "Coef."]
+        coef_df = result.coef_table.copy()
+        p_column = 'P>|t|'
+        if resample_df is not None:
+            coef_df = coef_df.join(resample_df)
+            p_column = resample_df.columns[0]
+        cf = coef_df[coef_df[p_column] < 0.1].loc[:, "Coef."]
 
         wdf = {}
         ddf = {}
@@ -105,8 +220,11 @@ class Analyser:
                 wdf[words[k]] = v
             else:
                 ddf[k] = v
-        import_vars = pd.DataFrame(list(sorted([[k, v] for k, v in wdf.items()], key=lambda x: x[1])))
-        import_vars.columns = ["word", "Coef"]
+        import_vars = pd.DataFrame(list(sorted([[k, v] for k, v in wdf.items()], key=lambda x: x[1])),
+                                   columns=["word", "Coef"])
+        word_effects = [dict(word=words[k], coef=float(row["Coef."]), p_value=float(row[p_column]),
+                             occur=int(occur.get(k, 0)))
+                        for k, row in coef_df.iterrows() if k in words]
         coef_df.index = [words.get(x, x) for x in coef_df.index]
 
         params['coef_table'] = coef_df.round(3).to_html()
@@ -114,3 +232,4 @@ class Analyser:
 
         with open(f"{self.config.resource.working_dir}/{name}_summary.html", "wt") as f:
             f.write(template % params)
+        return word_effects
@@ -0,0 +1,139 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+# info_table/diag_table: 2 column (name, value) DataFrames,
+# coef_table: DataFrame indexed by column name with the same columns as statsmodels' summary2().tables[1]
+OlsResult = namedtuple('OlsResult', 'info_table coef_table diag_table coef resid')
+COEF_COLUMNS = ['Coef.', 'Std.Err.', 't', 'P>|t|', '[0.025', '0.975]']
+
+
+class SparseOLS:
+    """OLS for several targets sharing one (sparse) design matrix.
+
+    X'X is factorized once by an eigen decomposition. Like statsmodels' pinv method, rank deficient
+    designs (e.g. month and weekday one-hot columns plus a constant) get the minimum norm solution.
+    """
+
+    def __init__(self, x, columns, add_const=True):
+        x = sparse.csr_matrix(x, dtype=np.float64)
+        columns = list(columns)
+        if add_const:
+            x = sparse.hstack([x, np.ones((x.shape[0], 1))], format='csr')
+            columns.append('const')
+        self.x = x
+        self.columns = columns
+        self.n_obs, self.n_cols = x.shape
+
+        xtx = (x.T @ x).toarray()
+        eig_values, eig_vectors = np.linalg.eigh(xtx)
+        tol = eig_values.max() * max(self.n_obs, self.n_cols) * np.finfo(np.float64).eps
+        keep = eig_values > tol
+        self.rank = int(keep.sum())
+        self.eig_values = eig_values
+        # pinv(X'X), i.e. normalized covariance of the coefficients
+        self.xtx_pinv = (eig_vectors[:, keep] / eig_values[keep]) @ eig_vectors[:, keep].T
+
+    @property
+    def condition_number(self):
+        with np.errstate(over='ignore'):
+            return float(np.sqrt(self.eig_values.max() / max(self.eig_values.min(), np.finfo(np.float64).tiny)))
+
+    def fit(self, ys):
+        """
+        :param ys: array like of shape (n_obs, n_targets) or list of target vectors
+        :rtype: list[OlsResult]
+        """
+        y = np.asarray(ys, dtype=np.float64)
+        if y.ndim == 1:
+            y = y[:, None]
+        elif y.shape[0] != self.n_obs:
+            y = y.T
+        coef = self.xtx_pinv @ np.asarray(self.x.T @ y)
+        resid = y - np.asarray(self.x @ coef)
+        return [self._create_result(coef[:, i], resid[:, i], y[:, i]) for i in range(y.shape[1])]
+
+    def _create_result(self, coef, resid, y):
+        n = self.n_obs
+        df_model = self.rank - 1
+        df_resid = n - self.rank
+        ssr = float(resid @ resid)
+        centered_tss = float(((y - y.mean()) ** 2).sum())
+        # no degrees of freedom left (n == rank): nan like statsmodels, instead of ZeroDivisionError
+        scale = ssr / df_resid if df_resid > 0 else np.nan
+
+        std_err = np.sqrt(np.diag(self.xtx_pinv) * scale)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_values = coef / std_err
+        p_values = 2 * stats.t.sf(np.abs(t_values), df_resid)
+        q = stats.t.ppf(0.975, df_resid)
+        coef_table = pd.DataFrame(np.column_stack([coef, std_err, t_values, p_values,
+                                                   coef - q * std_err, coef + q * std_err]),
+                                  index=self.columns, columns=COEF_COLUMNS)
+
+        r2 = 1 - ssr / centered_tss if centered_tss > 0 else np.nan
+        f_value = ((centered_tss - ssr) / df_model) / scale if df_model > 0 else np.nan
+        adj_r2 = 1 - (n - 1) / df_resid * (1 - r2) if df_resid > 0 else np.nan
+        llf = -n / 2 * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+        info_table = pd.DataFrame([
+            ["Model:", "OLS (sparse)"],
+            ["No. Observations:", n],
+            ["Df Model:", df_model],
+            ["Df Residuals:", df_resid],
+            ["R-squared:", round(r2, 3)],
+            ["Adj. R-squared:", round(adj_r2, 3)],
+            ["F-statistic:", round(f_value, 3)],
+            ["Prob (F-statistic):", stats.f.sf(f_value, df_model, df_resid)],
+            ["Log-Likelihood:", round(llf, 1)],
+            ["AIC:", round(-2 * llf + 2 * self.rank, 4)],
+            ["BIC:", round(-2 * llf + np.log(n) * self.rank, 4)],
+            ["Scale:", round(scale, 4)],
+        ])
+
+        omnibus, omnibus_p = stats.normaltest(resid)
+        jb, jb_p = stats.jarque_bera(resid)
+        diag_table = pd.DataFrame([
+            ["Omnibus:", round(omnibus, 3)],
+            ["Prob(Omnibus):", round(omnibus_p, 3)],
+            ["Skew:", round(stats.skew(resid), 3)],
+            ["Kurtosis:", round(stats.kurtosis(resid, fisher=False), 3)],
+            ["Durbin-Watson:", round(float(np.sum(np.diff(resid) ** 2)) / ssr, 3) if ssr > 0 else np.nan],
+            ["Jarque-Bera (JB):", round(jb, 3)],
+            ["Prob(JB):", round(jb_p, 3)],
+            ["Condition No.:", _round_finite(self.condition_number)],
+        ])
+        return OlsResult(info_table=info_table, coef_table=coef_table, diag_table=diag_table,
+                         coef=coef, resid=resid)
+
+
+def _round_finite(value):
+    return round(value) if np.isfinite(value) else value
+
+
+def fit_statsmodels_ols(x, columns, y):
+    """the reference implementation: statsmodels OLS on a dense copy of x
+
+    :rtype: OlsResult
+    """
+    import statsmodels.api as sm
+    import statsmodels.formula.api as smf
+
+    df_x = pd.DataFrame(x.toarray() if sparse.issparse(x) else x, columns=columns)
+    df_x = sm.add_constant(df_x, prepend=False)
+    result = smf.OLS(np.asarray(y, dtype=np.float64), df_x, hasconst=True).fit()
+    summary = result.summary2()
+    return OlsResult(info_table=summary.tables[0], coef_table=summary.tables[1], diag_table=summary.tables[2],
+                     coef=np.asarray(result.params), resid=np.asarray(result.resid))
+
+
+def compare_ols_results(a: OlsResult, b: OlsResult):
+    """max absolute differences of fitted values and of the coefficient table columns
+
+    Coefficients of a rank deficient design are not identifiable, so fitted values are compared as well.
+    """
+    diff = {"resid": float(np.max(np.abs(a.resid - b.resid)))}
+    for col in COEF_COLUMNS:
+        diff[col] = float(np.nanmax(np.abs(a.coef_table[col].values - b.coef_table[col].values)))
+    return diff
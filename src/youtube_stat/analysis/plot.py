@@ -0,0 +1,90 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+
+import matplotlib
+
+matplotlib.use("Agg")  # headless; must be selected before pyplot is imported
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from youtube_stat.lib.util import can_start_worker_processes  # noqa: E402
+
+logger = getLogger(__name__)
+
+# kind: 'hist' (data: (counts, edges)) or 'box' (data: list of Axes.bxp stats)
+Panel = namedtuple('Panel', 'kind title data xlabel')
+FigureSpec = namedtuple('FigureSpec', 'path nrows ncols figsize panels hspace')
+
+
+def compute_histogram(values, max_bins=50):
+    """histogram with Freedman-Diaconis bins capped at max_bins (as seaborn's distplot), ignoring inf and nan"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.zeros(0), np.zeros(1)
+    counts, edges = np.histogram(values, bins='fd')
+    if len(edges) - 1 > max_bins:
+        return np.histogram(values, bins=max_bins)
+    return counts, edges
+
+
+def compute_box_stats(df: pd.DataFrame, group_col, value_col, order=None):
+    """Axes.bxp stats (quartiles, 1.5 IQR whiskers and fliers) of each group, computed by groupby at once"""
+    df = df[[group_col, value_col]]
+    df = df[np.isfinite(df[value_col])]
+    order = order if order is not None else sorted(df[group_col].unique())
+    values = df[value_col]
+    groups = df[group_col]
+
+    q = values.groupby(groups).quantile([0.25, 0.5, 0.75]).unstack()
+    iqr = q[0.75] - q[0.25]
+    low = groups.map(q[0.25] - 1.5 * iqr)
+    high = groups.map(q[0.75] + 1.5 * iqr)
+    inside = (values >= low) & (values <= high)
+    whislo = values[inside].groupby(groups[inside]).min()
+    whishi = values[inside].groupby(groups[inside]).max()
+    fliers = values[~inside].groupby(groups[~inside]).apply(np.asarray)
+
+    stats = []
+    for key in order:
+        if key not in q.index:
+            continue
+        stats.append(dict(
+            label=str(key), q1=q.at[key, 0.25], med=q.at[key, 0.5], q3=q.at[key, 0.75],
+            whislo=whislo.get(key, q.at[key, 0.25]), whishi=whishi.get(key, q.at[key, 0.75]),
+            fliers=fliers.get(key, np.zeros(0)),
+        ))
+    return stats
+
+
+def render_figure(spec: FigureSpec):
+    fig, axes = plt.subplots(nrows=spec.nrows, ncols=spec.ncols, figsize=spec.figsize, squeeze=False)
+    try:
+        for ax, panel in zip(axes.flatten(), spec.panels):
+            if panel.kind == 'hist':
+                counts, edges = panel.data
+                ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', alpha=0.6, edgecolor='white')
+            elif panel.kind == 'box':
+                ax.bxp(panel.data, flierprops=dict(marker='d', markersize=3))
+            else:
+                raise ValueError(f"unknown panel kind: {panel.kind}")
+            ax.set_title(panel.title)
+            if panel.xlabel:
+                ax.set_xlabel(panel.xlabel)
+        if spec.hspace is not None:
+            fig.subplots_adjust(hspace=spec.hspace)
+        fig.savefig(spec.path)
+    finally:
+        plt.close(fig)
+    return spec.path
+
+
+def render_figures(specs, max_workers=None):
+    """render figures concurrently in worker processes (or inline when max_workers <= 1)"""
+    if not max_workers or max_workers <= 1 or len(specs) <= 1 or not can_start_worker_processes():
+        return [render_figure(spec) for spec in specs]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(specs))) as executor:
+        return list(executor.map(render_figure, specs))
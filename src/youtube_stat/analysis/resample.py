@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from youtube_stat.analysis.ols import SparseOLS, OlsResult
+
+
+class ResamplingTest:
+    """Bootstrap confidence intervals and bootstrap/permutation p-values of OLS coefficients.
+
+    Every replicate is a linear map of a resampled target through the projection P = pinv(X'X) X',
+    which is computed once from the SparseOLS decomposition. Replicates are processed in chunks of
+    (k x n) @ (n x chunk) matrix products, spread over threads (NumPy releases the GIL there).
+    """
+
+    METHODS = ('bootstrap', 'permutation')
+
+    def __init__(self, ols: SparseOLS, n_resamples=1000, seed=None, n_workers=1, chunk_size=500):
+        self.ols = ols
+        self.n_resamples = n_resamples
+        self.seed = seed
+        self.n_workers = n_workers or 1
+        self.chunk_size = chunk_size
+        self.projection = np.asarray(ols.x @ ols.xtx_pinv).T  # (k, n)
+
+    def run(self, y, result: OlsResult, method='bootstrap'):
+        """
+        :param y: target vector the result was fitted on
+        :param result: result of self.ols.fit()
+        :return: DataFrame indexed by column name with p-value and 95% bootstrap confidence interval
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"unknown resampling method: {method}")
+        y = np.asarray(y, dtype=np.float64)
+        coef = result.coef
+        resid = result.resid
+
+        # residual bootstrap: y* = X b + e*, so b* = b + P e*
+        boot = self._run_chunks(lambda rngs: coef[:, None] + self.projection @ _bootstrap(rngs, resid), seed_offset=0)
+        ci_low, ci_high = np.percentile(boot, [2.5, 97.5], axis=1)
+        if method == 'bootstrap':
+            p_values = np.minimum(1.0, 2 * np.minimum((boot <= 0).mean(axis=1), (boot >= 0).mean(axis=1)))
+        else:
+            perm = self._run_chunks(lambda rngs: self.projection @ _permute(rngs, y), seed_offset=1)
+            n_extreme = (np.abs(perm) >= np.abs(coef)[:, None]).sum(axis=1)
+            p_values = (n_extreme + 1) / (self.n_resamples + 1)
+
+        return pd.DataFrame({
+            f'P ({method})': p_values,
+            '[0.025 boot': ci_low,
+            '0.975 boot]': ci_high,
+        }, index=self.ols.columns)
+
+    def _run_chunks(self, func, seed_offset):
+        seed = np.random.randint(2 ** 31) if self.seed is None else self.seed
+
+        def run(begin):
+            # one stream per replicate, so that the result does not depend on the chunk size or the workers
+            end = min(begin + self.chunk_size, self.n_resamples)
+            return func([np.random.RandomState([seed, seed_offset, j]) for j in range(begin, end)])
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            return np.hstack(list(executor.map(run, range(0, self.n_resamples, self.chunk_size))))
+
+
+def _bootstrap(rngs, resid):
+    return np.column_stack([resid[rng.randint(0, len(resid), size=len(resid))] for rng in rngs])
+
+
+def _permute(rngs, y):
+    return np.column_stack([rng.permutation(y) for rng in rngs])
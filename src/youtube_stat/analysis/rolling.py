@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+# begin <= date < end of the rows in the window (datetime64[D]); n_obs: number of the rows
+RollingWindow = namedtuple('RollingWindow', 'begin end n_obs')
+
+
+class RollingOLS:
+    """OLS refitted on every window of `window_days` days, sliding by `step_days` days.
+
+    X'X and X'y are not recomputed for each window: the rows which leave the window are subtracted and the
+    rows which enter it are added. With `half_life_days`, a row is weighted by 0.5 ** (age / half_life_days)
+    at the end of the window, which only rescales the statistics of the previous window.
+    Each window is solved by conjugate gradient starting from the coefficients of the previous window, which
+    changes little between overlapping windows. A small ridge keeps the normal equations positive definite
+    (words which always occur together in a window, or a design without a constant column like weekday one-hot).
+    """
+
+    def __init__(self, x, dates, window_days, step_days, half_life_days=None, ridge=1e-3, tol=1e-8):
+        """
+        :param x: (n_obs, n_cols) sparse design matrix without a constant column
+        :param dates: datetime64[D] array of the date of each row
+        """
+        order = np.argsort(dates, kind='mergesort')
+        self.x = sparse.csr_matrix(x, dtype=np.float64)[order]
+        self.dates = np.asarray(dates, dtype='datetime64[D]')[order]
+        self.order = order
+        self.window = np.timedelta64(int(window_days), 'D')
+        self.step = np.timedelta64(int(step_days), 'D')
+        self.decay = np.log(2) / half_life_days if half_life_days else 0.0
+        self.ridge = ridge
+        self.tol = tol
+        self.n_cols = self.x.shape[1]
+        self.n_iterations = 0  # conjugate gradient iterations of the last fit
+
+    def windows(self):
+        """:return: array of the (exclusive) end dates of the windows; the last one covers the last row
+                    unless step_days > window_days"""
+        if not len(self.dates):
+            return np.zeros(0, dtype='datetime64[D]')
+        ends = np.arange(self.dates[0] + self.window, self.dates[-1] + self.step + 1, self.step)
+        return ends if len(ends) else np.array([self.dates[0] + self.window])
+
+    def fit(self, ys):
+        """
+        :param ys: list of target vectors in the order of the rows of x
+        :return: list of RollingWindow, coefficients of shape (n_windows, n_cols, n_targets) (NaN for the columns
+                 which do not occur in the window) and occurrences of each column of shape (n_windows, n_cols)
+        """
+        y = np.column_stack([np.asarray(v, dtype=np.float64) for v in ys])[self.order]
+        ends = self.windows()
+        lows = np.searchsorted(self.dates, ends - self.window)
+        highs = np.searchsorted(self.dates, ends)
+
+        xtx = np.zeros((self.n_cols, self.n_cols))
+        xty = np.zeros((self.n_cols, y.shape[1]))
+        occur = np.zeros(self.n_cols, dtype=np.int64)
+        coef = np.zeros((self.n_cols, y.shape[1]))
+        coefs = np.full((len(ends), self.n_cols, y.shape[1]), np.nan)
+        occurs = np.zeros((len(ends), self.n_cols), dtype=np.int64)
+        lo = hi = 0
+        prev_end = None
+        self.n_iterations = 0
+        for i, (end, new_lo, new_hi) in enumerate(zip(ends, lows, highs)):
+            if self.decay and prev_end is not None:
+                factor = np.exp(-self.decay * (end - prev_end).astype(np.int64))
+                xtx *= factor
+                xty *= factor
+            # rows leaving the window, then rows entering it
+            for begin, stop, sign in [(lo, min(new_lo, hi), -1), (max(hi, new_lo), new_hi, 1)]:
+                if begin >= stop:
+                    continue
+                rows = self.x[begin:stop]
+                w = sign * self._weights(self.dates[begin:stop], end)
+                xtx += (rows.T @ rows.multiply(w[:, None])).toarray()
+                xty += rows.T @ (w[:, None] * y[begin:stop])
+                occur += sign * np.asarray((rows != 0).sum(axis=0)).ravel()
+            lo, hi, prev_end = new_lo, new_hi, end
+
+            active = np.flatnonzero(occur > 0)
+            occurs[i] = occur
+            if not len(active):
+                continue
+            a = xtx[np.ix_(active, active)] + self.ridge * np.eye(len(active))
+            coef[active], n_iter = conjugate_gradient(a, xty[active], coef[active], tol=self.tol)
+            self.n_iterations += n_iter
+            coefs[i, active] = coef[active]
+
+        windows = [RollingWindow(begin=end - self.window, end=end, n_obs=int(h - l))
+                   for end, l, h in zip(ends, lows, highs)]
+        return windows, coefs, occurs
+
+    def _weights(self, dates, end):
+        if not self.decay:
+            return np.ones(len(dates))
+        return np.exp(-self.decay * (end - dates).astype(np.int64))
+
+
+def conjugate_gradient(a, b, x0, tol=1e-8, max_iter=None):
+    """Jacobi preconditioned conjugate gradient for each column of b (a is symmetric positive definite)
+
+    :return: solution and the number of iterations
+    """
+    d = np.diag(a).copy()
+    d[d <= 0] = 1.0
+    x = x0.copy()
+    r = b - a @ x
+    z = r / d[:, None]
+    p = z.copy()
+    rz = (r * z).sum(axis=0)
+    threshold = tol * np.maximum(np.linalg.norm(b, axis=0), np.finfo(np.float64).tiny)
+    max_iter = max_iter or 10 * len(b)
+    for n_iter in range(max_iter):
+        if (np.linalg.norm(r, axis=0) <= threshold).all():
+            return x, n_iter
+        ap = a @ p
+        pap = (p * ap).sum(axis=0)
+        alpha = np.divide(rz, pap, out=np.zeros_like(rz), where=pap > 0)
+        x += alpha * p
+        r -= alpha * ap
+        z = r / d[:, None]
+        rz_new = (r * z).sum(axis=0)
+        beta = np.divide(rz_new, rz, out=np.zeros_like(rz), where=rz > 0)
+        p = z + beta * p
+        rz = rz_new
+    return x, max_iter
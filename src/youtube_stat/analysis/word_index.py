@@ -0,0 +1,117 @@
+import glob
+import os
+import sqlite3
+from collections import namedtuple
+from logging import getLogger
+
+from youtube_stat.lib.file_util import load_json_from_file
+
+logger = getLogger(__name__)
+
+WordEffect = namedtuple('WordEffect', 'word target channel_id coef p_value occur')
+WordSummary = namedtuple('WordSummary', 'word target n_channels n_significant mean_coef total_occur')
+
+
+class WordEffectIndex:
+    """Cross-channel index of fitted word coefficients (word -> per channel coef, p-value and occurrence).
+
+    It is built from word_effects.json which the analyser writes into each channel's working dir.
+    Per-word aggregates are materialized at build time, so queries are simple index lookups.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS effect (
+                    word TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    channel_id TEXT NOT NULL,
+                    coef REAL,
+                    p_value REAL,
+                    occur INTEGER,
+                    PRIMARY KEY (word, target, channel_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS effect_channel ON effect (channel_id);
+                CREATE TABLE IF NOT EXISTS word_summary (
+                    word TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    n_channels INTEGER,
+                    n_significant INTEGER,
+                    mean_coef REAL,
+                    total_occur INTEGER,
+                    PRIMARY KEY (target, word)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS word_summary_coef ON word_summary (target, mean_coef);
+            """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def build(self, working_root_dir, file_name, max_p_value=0.1):
+        """(re)load every `working_root_dir/<channel_id>/file_name` and refresh the aggregates"""
+        paths = sorted(glob.glob(f"{working_root_dir}/*/{file_name}"))
+        with self.conn:
+            for path in paths:
+                channel_id = os.path.basename(os.path.dirname(path))
+                self.add_channel(channel_id, load_json_from_file(path))
+            self.update_summary(max_p_value)
+        logger.info(f"indexed word effects of {len(paths)} channels")
+        return len(paths)
+
+    def add_channel(self, channel_id, word_effects):
+        """
+        :param dict[str, list[dict]] word_effects: target -> [{word, coef, p_value, occur}]
+        """
+        self.conn.execute("DELETE FROM effect WHERE channel_id = ?", (channel_id,))
+        rows = [(x['word'], target, channel_id, x['coef'], x['p_value'], x['occur'])
+                for target, effects in word_effects.items() for x in effects]
+        self.conn.executemany("INSERT OR REPLACE INTO effect VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def update_summary(self, max_p_value=0.1):
+        self.conn.execute("DELETE FROM word_summary")
+        self.conn.execute("""
+            INSERT INTO word_summary
+            SELECT word, target, COUNT(*), SUM(p_value < ?), AVG(coef), SUM(occur)
+            FROM effect GROUP BY word, target""", (max_p_value,))
+
+    def query(self, word, target=None):
+        """per channel effects of `word`
+
+        :rtype: list[WordEffect]
+        """
+        sql = "SELECT word, target, channel_id, coef, p_value, occur FROM effect WHERE word = ?"
+        params = [word]
+        if target:
+            sql += " AND target = ?"
+            params.append(target)
+        sql += " ORDER BY target, coef DESC"
+        return [WordEffect(*r) for r in self.conn.execute(sql, params)]
+
+    def summary(self, word, target=None):
+        """
+        :rtype: list[WordSummary]
+        """
+        sql = "SELECT * FROM word_summary WHERE word = ?"
+        params = [word]
+        if target:
+            sql += " AND target = ?"
+            params.append(target)
+        return [WordSummary(*r) for r in self.conn.execute(sql, params)]
+
+    def top(self, target, limit=20, min_channels=1, ascending=False):
+        """words with the largest (or smallest) mean coefficient across channels
+
+        :rtype: list[WordSummary]
+        """
+        order = "ASC" if ascending else "DESC"
+        sql = f"""SELECT * FROM word_summary WHERE target = ? AND n_channels >= ?
+                  ORDER BY mean_coef {order} LIMIT ?"""
+        return [WordSummary(*r) for r in self.conn.execute(sql, (target, min_channels, limit))]
@@ -1,12 +1,13 @@
 from logging import getLogger
 
-from youtube_stat.command import crawl, pre, analysis
 from youtube_stat.config import Config
 
 logger = getLogger(__name__)
 
 
 def start(config: Config):
+    # each stage imports only what it needs when it starts
+    from youtube_stat.command import crawl, pre, analysis
     crawl.start(config)
     pre.start(config)
     analysis.start(config)
@@ -1,8 +1,6 @@
 from logging import getLogger
 
-from youtube_stat.analysis.analyze import Analyser
 from youtube_stat.config import Config
-from youtube_stat.data.processor import DataProcessor
 
 logger = getLogger(__name__)
 
@@ -17,5 +15,6 @@ class AnalysisCommand:
         self.config = config
 
     def start(self):
+        from youtube_stat.analysis.analyze import Analyser
         az = Analyser(self.config)
         az.start()
@@ -0,0 +1,92 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from time import time
+
+from moke_config import create_config
+
+# imported here so that forked workers share the already loaded scientific stack
+import youtube_stat.analysis.analyze  # noqa: F401
+import youtube_stat.analysis.plot  # noqa: F401
+import youtube_stat.data.processor  # noqa: F401
+from youtube_stat.command import all as all_command
+from youtube_stat.config import Config
+from youtube_stat.lib.file_util import load_yaml_from_file
+from youtube_stat.lib.logger import setup_logger
+from youtube_stat.lib.metrics import setup_metrics
+
+logger = getLogger(__name__)
+
+
+def start(config: Config):
+    logger.info(f"start batch")
+    BatchCommand(config).start()
+
+
+class BatchCommand:
+    def __init__(self, config: Config):
+        self.config = config
+
+    def start(self):
+        args = self.config.runtime.args
+        targets = [(t, self.create_config_dict(t, args.base_config)) for t in args.targets]
+        for _, config_dict in targets:
+            if args.force:
+                config_dict.setdefault("resource", {})["force_stages"] = True
+            if args.metrics:
+                config_dict.setdefault("resource", {})["metrics_enabled"] = True
+        max_workers = args.workers or self.config.resource.batch_max_workers
+
+        results = []
+        log_args = (str(self.config.resource.main_log_path), args.log_level or 'info')
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(target, executor.submit(_run_channel, config_dict, *log_args))
+                       for target, config_dict in targets]
+            for target, future in futures:
+                try:
+                    results.append((target,) + future.result())
+                except Exception as e:  # e.g. the worker process died
+                    results.append((target, None, False, 0, repr(e)))
+
+        self.report(results)
+        n_failed = len([r for r in results if not r[2]])
+        if n_failed:
+            raise RuntimeError(f"{n_failed} of {len(results)} channels failed")
+
+    @staticmethod
+    def create_config_dict(target, base_config=None):
+        if os.path.isfile(target):
+            return load_yaml_from_file(target)
+        config_dict = load_yaml_from_file(base_config) if base_config else {}
+        config_dict.setdefault("data", {})["channel_id"] = target
+        return config_dict
+
+    @staticmethod
+    def report(results):
+        logger.info(f"batch summary: {len(results)} channels")
+        for target, channel_id, ok, elapsed, error in results:
+            status = "OK" if ok else "FAILED"
+            logger.info(f"  {status:6s} {target} (channel_id={channel_id}, {elapsed:.1f} sec)")
+            if error:
+                logger.error(f"  {target}: {error}")
+
+
+def _run_channel(config_dict, log_path, log_level):
+    if not getLogger().handlers:  # not forked from the main process
+        setup_logger(log_path, level=log_level)
+    begin = time()
+    channel_id = None
+    try:
+        config = create_config(Config, config_dict)  # type: Config
+        channel_id = config.data.channel_id
+        config.resource.create_base_dirs()
+        config.resource.migrate_legacy_files()
+        setup_metrics(config.resource.metrics_enabled)
+        try:
+            all_command.start(config)
+        finally:
+            config.resource.save_metrics()
+        return channel_id, True, time() - begin, None
+    except Exception:
+        return channel_id, False, time() - begin, traceback.format_exc()
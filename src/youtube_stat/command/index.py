@@ -0,0 +1,38 @@
+from logging import getLogger
+
+from youtube_stat.analysis.word_index import WordEffectIndex
+from youtube_stat.config import Config
+
+logger = getLogger(__name__)
+
+
+def start(config: Config):
+    logger.info(f"start index")
+    IndexCommand(config).start()
+
+
+class IndexCommand:
+    def __init__(self, config: Config):
+        self.config = config
+
+    def start(self):
+        rc = self.config.resource
+        args = self.config.runtime.args
+        with WordEffectIndex(rc.word_effect_index_path) as index:
+            if args.action == 'build':
+                index.build(rc.working_root_dir, rc.word_effects_name, max_p_value=rc.word_effect_max_p_value)
+            elif args.action == 'query':
+                for word in args.words:
+                    self.print_summary(index.summary(word, args.target))
+                    for e in index.query(word, args.target):
+                        print(f"  {e.target:10s} {e.channel_id:26s} coef={e.coef:8.3f} p={e.p_value:.3f} "
+                              f"occur={e.occur}")
+            elif args.action == 'top':
+                self.print_summary(index.top(args.target or "log_view", limit=args.limit,
+                                             min_channels=args.min_channels, ascending=args.ascending))
+
+    @staticmethod
+    def print_summary(summaries):
+        for s in summaries:
+            print(f"{s.word}\t{s.target}\tmean_coef={s.mean_coef:.3f}\tchannels={s.n_channels}\t"
+                  f"significant={s.n_significant}\toccur={s.total_occur}")
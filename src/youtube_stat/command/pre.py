@@ -2,6 +2,7 @@ from logging import getLogger
 
 from youtube_stat.config import Config
 from youtube_stat.data.processor import DataProcessor
+from youtube_stat.lib.stage_cache import StageCache
 
 logger = getLogger(__name__)
 
@@ -16,7 +17,27 @@ class PreprocessCommand:
         self.config = config
 
     def start(self):
+        rc = self.config.resource
+        dc = self.config.data
         dp = DataProcessor(self.config)
+        stages = StageCache(rc.stage_state_path, enable=rc.use_stage_cache, force=rc.force_stages)
+
         dp.parse_text()
-        dp.create_dataset()
-        dp.convert_to_training_data()
+
+        inputs = [rc.video_detail_list_path, rc.vocabulary_path]
+        if dc.as_of_date:
+            inputs.append(rc.snapshot_db_path)
+        outputs = [dp.dataset_path]
+        if rc.export_dataset_tsv:
+            outputs.append(dp.dataset_tsv_path)
+        stages.run("create_dataset", dp.create_dataset, inputs=inputs, outputs=outputs, params=dict(
+            key_parsed_title=dc.key_parsed_title, ignore_title_list=dc.ignore_title_list,
+            ignore_word_list=dc.ignore_word_list, as_of_date=dc.as_of_date, use_pos=sorted(dp.USE_POS_SET),
+        ))
+
+        outputs = [dp.training_data_path, dp.training_meta_path, dp.training_targets_path, dp.word_index_path]
+        if rc.export_training_csv:
+            outputs.append(dp.training_csv_path)
+        stages.run("convert_to_training_data", dp.convert_to_training_data,
+                   inputs=[dp.dataset_path, rc.vocabulary_path], outputs=outputs,
+                   params=dict(min_word_occur=dc.min_word_occur, before_date=dc.before_date))
@@ -1,8 +1,14 @@
 import os
+from logging import getLogger
 from pathlib import Path
 
 from moke_config import ConfigBase
 
+from youtube_stat.lib.file_util import migrate_json_to_jsonl
+from youtube_stat.lib.metrics import get_metrics
+
+logger = getLogger(__name__)
+
 
 def _system_dir():
     return Path(__file__).parent.parent.parent
@@ -20,6 +26,9 @@ class Config(ConfigBase):
 class RuntimeConfig(ConfigBase):
     def __init__(self):
         self.args = None
+        # datasets created in this process; later stages use them instead of reading the files back
+        self.basic_dataset = None  # type: youtube_stat.data.dataset.BasicDataset
+        self.training_data = None  # type: youtube_stat.data.processor.TrainingData
 
 
 class ResourceConfig(ConfigBase):
@@ -32,45 +41,159 @@ class ResourceConfig(ConfigBase):
         self.tensorboard_dir = self.log_dir / "tensorboard"
         self.main_log_path = self.log_dir / "main.log"
         self.resource_dir = self.system_dir / "resource"
+        self.cache_dir = self.system_dir / "cache"
+
+        # http (shared by the crawler and the yahoo parser)
+        self.http_timeout = 30  # seconds to connect or to wait for a response
+        self.http_max_retry = 5  # attempts per request, including the first one
+        self.http_backoff_base = 1.0  # the n-th retry waits about base * 2^n seconds (with jitter)
+        self.http_backoff_max = 60
+        self.http_max_retry_after = 300  # upper limit to follow Retry-After header
+        self.http_circuit_failure_threshold = 5  # consecutive failures to fail fast for the host
+        self.http_circuit_reset_seconds = 60
+        self.http_cache_enabled = True
+        self.http_cache_name = 'http_cache.sqlite3'
+        self.http_cache_max_bytes = 512 * 1024 * 1024
+        # endpoint -> seconds to reuse a response without asking; after that it is revalidated by ETag
+        self.http_cache_ttls = {"youtube.search": 3600, "youtube.videos": 0}
 
         # crawler
         self.crawler_dir_name = 'crawler'
         self.youtube_api_key = os.environ.get('YOUTUBE_API_KEY')
-        self.video_list_name = 'video_list.json'
-        self.video_detail_list_name = 'video_detail_list.json'
+        # JSON Lines, gzipped if the name ends with .gz
+        self.video_list_name = 'video_list.jsonl'
+        self.video_detail_list_name = 'video_detail_list.jsonl'
+        self.legacy_video_list_name = 'video_list.json'
+        self.legacy_video_detail_list_name = 'video_detail_list.json'
+        self.youtube_api_base_url = 'https://www.googleapis.com/youtube/v3'
+        self.crawler_max_workers = 4
+        self.crawler_rate_limit = 10  # requests per second (None means unlimited)
+        self.crawler_refresh = False  # fetch new uploads and refresh old statistics
+        self.statistics_ttl_hours = 24
+        self.snapshot_db_name = 'statistics.sqlite3'
 
         # preprocess text
         self.yahoo_api_client_id = os.environ.get('YAHOO_API_CLIENT_ID')
+        self.japanese_parser = 'yahoo'  # yahoo or janome(offline)
+        self.japanese_parser_workers = 1
+        self.yahoo_api_url = 'https://jlp.yahooapis.jp/MAService/V1/parse'
+        self.yahoo_api_rate_limit = 5  # requests per second (None means unlimited)
+        self.parse_checkpoint_interval = 500  # save parsed titles every N titles
+        self.token_cache_name = 'tokens.sqlite3'
+        self.token_cache_max_entries = 500000
+        self.vocabulary_name = 'vocabulary.npz'  # parsed titles as ids of words, grows with each run
 
         # dataset
-        self.basic_dataset_name = 'dataset.tsv'
-        self.training_dataset_name = 'train.csv'
+        self.stage_state_name = '.stage_state.json'
+        self.use_stage_cache = True  # skip stages whose inputs and params are unchanged
+        self.force_stages = False  # run every stage, renewing its cached state (--force)
+        # tsv, or feather / parquet (opt-in: need pyarrow >= 3.0, not in Pipfile; tsv is used without it)
+        self.dataset_format = 'tsv'
+        self.basic_dataset_name = 'dataset'  # + extension of dataset_format
+        self.export_dataset_tsv = False  # write dataset.tsv as well
+        self.training_dataset_name = 'train.npz'
+        self.training_meta_name = 'train_meta.json'
+        self.training_targets_name = 'train_targets'  # ids and targets, + extension of dataset_format
+        self.training_csv_name = 'train.csv'
+        self.export_training_csv = False
+        # convert_to_training_data reads the dataset file in chunks of this many rows (None: all at once)
+        self.training_chunk_size = None
         self.word_index_name = "words.json"
 
+        # instrumentation
+        self.metrics_enabled = False  # record HTTP requests per endpoint and write run reports
+        self.metrics_report_name = 'metrics.json'
+        self.metrics_prometheus_name = 'metrics.prom'
+
+        # batch
+        self.batch_max_workers = 2
+
         # analyze
         self.summary_dist_graph_name = 'summary_dist.png'
         self.target_dist_graph_name = 'target_dist.png'
         self.summary_template_name = 'summary.html'
+        self.plot_max_workers = 4
+        self.word_effects_name = 'word_effects.json'
+        self.rolling_coef_name = 'rolling_coef.csv'
+
+        # cross-channel index
+        self.word_effect_index_name = 'word_effects.sqlite3'
+        self.word_effect_max_p_value = 0.1  # counted as significant in the per-word summary
 
     @property
     def working_dir(self):
-        return f"{self.system_dir}/working/{self._config.data.channel_id}"
+        return f"{self.working_root_dir}/{self._config.data.channel_id}"
+
+    @property
+    def working_root_dir(self):
+        return f"{self.system_dir}/working"
+
+    @property
+    def word_effect_index_path(self):
+        return f"{self.working_root_dir}/{self.word_effect_index_name}"
 
     @property
     def crawler_data_dir(self):
         return f"{self.working_dir}/{self.crawler_dir_name}"
 
+    @property
+    def video_list_path(self):
+        return f"{self.crawler_data_dir}/{self.video_list_name}"
+
+    @property
+    def video_detail_list_path(self):
+        return f"{self.crawler_data_dir}/{self.video_detail_list_name}"
+
+    @property
+    def snapshot_db_path(self):
+        return f"{self.crawler_data_dir}/{self.snapshot_db_name}"
+
+    @property
+    def vocabulary_path(self):
+        return f"{self.working_dir}/{self.vocabulary_name}"
+
+    @property
+    def stage_state_path(self):
+        return f"{self.working_dir}/{self.stage_state_name}"
+
+    @property
+    def metrics_dir(self):
+        return self.working_dir if self._config.data.channel_id else str(self.log_dir)
+
+    def save_metrics(self):
+        get_metrics().save(f"{self.metrics_dir}/{self.metrics_report_name}",
+                           f"{self.metrics_dir}/{self.metrics_prometheus_name}")
+
+    @property
+    def http_cache_path(self):
+        return f"{self.cache_dir}/{self.http_cache_name}"
+
+    @property
+    def token_cache_path(self):
+        return f"{self.cache_dir}/{self.token_cache_name}"
+
     def create_base_dirs(self):
-        dirs = [self.log_dir, self.working_dir, self.crawler_data_dir]
+        dirs = [self.log_dir, self.cache_dir, self.working_root_dir]
+        if self._config.data.channel_id:
+            dirs += [self.working_dir, self.crawler_data_dir]
 
         for d in dirs:
             os.makedirs(d, exist_ok=True)
 
+    def migrate_legacy_files(self):
+        if not self._config.data.channel_id:
+            return
+        for legacy_name, path in [(self.legacy_video_list_name, self.video_list_path),
+                                  (self.legacy_video_detail_list_name, self.video_detail_list_path)]:
+            if migrate_json_to_jsonl(f"{self.crawler_data_dir}/{legacy_name}", path):
+                logger.info(f"migrated {legacy_name} to {path}")
+
 
 class DataConfig(ConfigBase):
     def __init__(self):
         self.channel_id = None
         self.key_parsed_title = 'parsed_title'
+        self.key_fetched_at = 'fetched_at'
         self.ignore_title_list = [
             # r"""^([-!0-9a-zA-Z|"'’:?.,\[\]【】]|\s)+$""",
         ]
@@ -79,10 +202,23 @@ class DataConfig(ConfigBase):
         ]
         self.min_word_occur = 5
         self.before_date = None
+        self.as_of_date = None  # use the statistics snapshots fetched at or before this date (the whole day)
 
 
 class ModelConfig(ConfigBase):
     def __init__(self):
+        self.ols_engine = 'statsmodels'  # statsmodels or sparse
+        self.ols_cross_check = False  # log the differences from statsmodels
+        self.significance = 'ols'  # ols, bootstrap or permutation
+        self.n_resamples = 1000
+        self.resample_seed = None
+        self.resample_workers = 4
+        self.resample_chunk_size = 500
+        # rolling analysis: refit on windows of this many days sliding by rolling_step_days (None: off)
+        self.rolling_window_days = None
+        self.rolling_step_days = 30
+        self.rolling_half_life_days = None  # weight videos by 0.5 ** (age / half life) in a window (None: equally)
+        self.rolling_ridge = 1e-3
         self.n_bins = 256
         self.n_levels = 2  # 4
         self.n_depth = 1   # 32
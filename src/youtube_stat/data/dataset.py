@@ -0,0 +1,202 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from youtube_stat.lib.datetime_util import parse_date_series
+from youtube_stat.lib.file_util import open_file
+from youtube_stat.lib.table_io import read_arrow_table, write_arrow_table
+
+DataRecord = namedtuple('DataRecord', 'id date wday title view like dislike comment words')
+TARGET_COLUMNS = ("view", "like", "dislike", "comment")
+DELI = "\t"
+WORD_DELI = "|"
+
+
+class BasicDataset:
+    """Typed in-memory form of the basic dataset, one row per video.
+
+    The words of video i are `words[word_offsets[i]:word_offsets[i+1]]`, as ids of the vocabulary of the channel.
+    Within one process the stages pass this object around; the dataset file (feather, parquet or tsv) is
+    only its export. Only tsv files have the words as strings, so they need the vocabulary to be read or written.
+    """
+
+    def __init__(self, ids, dates, titles, stats, words, word_offsets):
+        """
+        :param ids: object array of video ids
+        :param dates: datetime64[D] array of published dates
+        :param titles: object array of titles
+        :param stats: int64 array of shape (n, 4) in the order of TARGET_COLUMNS
+        :param words: int32 array of the word ids of all videos
+        :param word_offsets: int64 array of length n+1
+        """
+        self.ids = np.asarray(ids, dtype=object)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.titles = np.asarray(titles, dtype=object)
+        self.stats = np.asarray(stats, dtype=np.int64).reshape(-1, len(TARGET_COLUMNS))
+        self.words = np.asarray(words, dtype=np.int32)
+        self.word_offsets = np.asarray(word_offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def wdays(self):
+        """0=Mon ~ 6=Sun (1970-01-01 was Thursday)"""
+        return (self.dates.astype(np.int64) + 3) % 7
+
+    @property
+    def word_rows(self):
+        """row index of each element of `words`"""
+        return np.repeat(np.arange(len(self)), np.diff(self.word_offsets))
+
+    def words_of(self, i):
+        return self.words[self.word_offsets[i]:self.word_offsets[i + 1]]
+
+    def slice(self, begin, end):
+        """rows [begin, end) sharing the arrays with this dataset where possible"""
+        w_begin, w_end = self.word_offsets[begin], self.word_offsets[min(end, len(self))]
+        return BasicDataset(self.ids[begin:end], self.dates[begin:end], self.titles[begin:end],
+                            self.stats[begin:end], self.words[w_begin:w_end],
+                            self.word_offsets[begin:end + 1] - w_begin)
+
+    def iter_chunks(self, chunk_size):
+        for begin in range(0, len(self), chunk_size):
+            yield self.slice(begin, begin + chunk_size)
+
+    @classmethod
+    def iter_file(cls, path, chunk_size, vocabulary=None):
+        """read a dataset file at most `chunk_size` rows at a time
+
+        :param Vocabulary vocabulary: needed for tsv
+        """
+        if path.endswith(".tsv"):
+            with open_file(path, "rt") as f:
+                f.readline()  # skip headers
+                records = []
+                for line in f:
+                    records.append(cls._parse_tsv_line(line))
+                    if len(records) >= chunk_size:
+                        yield cls.from_records(records, vocabulary)
+                        records = []
+                if records:
+                    yield cls.from_records(records, vocabulary)
+        elif path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # one row group at a time (ParquetFile.iter_batches needs pyarrow 3.0, which needs numpy 1.16)
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            for i in range(parquet_file.num_row_groups):
+                for batch in parquet_file.read_row_group(i).to_batches(max_chunksize=chunk_size):
+                    yield cls.from_arrow(pa.Table.from_batches([batch]))
+        else:
+            import pyarrow as pa
+            # uncompressed feather is memory-mapped, so only the pages of the current chunk are read
+            for batch in read_arrow_table(path).to_batches(max_chunksize=chunk_size):
+                yield cls.from_arrow(pa.Table.from_batches([batch]))
+
+    @classmethod
+    def from_records(cls, records, vocabulary):
+        """
+        :param list[DataRecord] records: date is datetime.date or "%Y/%m/%d" and words is a list of words
+        :param Vocabulary vocabulary: words which are not in it are added
+        """
+        word_lists = [rec.words for rec in records]
+        return cls(
+            ids=[rec.id for rec in records],
+            dates=[str(rec.date).replace("/", "-") for rec in records],
+            titles=[rec.title for rec in records],
+            stats=[[int(rec.view), int(rec.like), int(rec.dislike), int(rec.comment)] for rec in records],
+            words=vocabulary.intern_all([w for ws in word_lists for w in ws]),
+            word_offsets=np.cumsum([0] + [len(ws) for ws in word_lists]),
+        )
+
+    @classmethod
+    def load(cls, path, vocabulary=None):
+        if path.endswith(".tsv"):
+            return cls.load_tsv(path, vocabulary)
+        return cls.from_arrow(read_arrow_table(path))
+
+    def save(self, path, vocabulary=None):
+        if path.endswith(".tsv"):
+            self.save_tsv(path, vocabulary)
+        else:
+            write_arrow_table(self.to_arrow(), path)
+
+    @classmethod
+    def from_arrow(cls, table):
+        import pyarrow as pa
+        words = table.column("words")
+        words = pa.concat_arrays(words.chunks) if words.num_chunks else pa.array([], type=words.type)
+        offsets = words.offsets.to_numpy().astype(np.int64)
+        return cls(
+            ids=table.column("id").to_numpy(),
+            dates=table.column("date").to_numpy(),
+            titles=table.column("title").to_numpy(),
+            stats=np.column_stack([table.column(col).to_numpy() for col in TARGET_COLUMNS]),
+            words=words.flatten().to_numpy(),
+            word_offsets=offsets - offsets[0],
+        )
+
+    def to_arrow(self):
+        import pyarrow as pa
+        columns = dict(
+            id=pa.array(self.ids, type=pa.string()),
+            date=pa.array(self.dates, type=pa.date32()),
+            wday=pa.array(self.wdays, type=pa.int8()),
+            title=pa.array(self.titles, type=pa.string()),
+        )
+        for i, col in enumerate(TARGET_COLUMNS):
+            columns[col] = pa.array(self.stats[:, i], type=pa.int64())
+        columns["words"] = pa.ListArray.from_arrays(pa.array(self.word_offsets, type=pa.int32()),
+                                                    pa.array(self.words, type=pa.int32()))
+        return pa.table(columns)
+
+    @classmethod
+    def load_tsv(cls, path, vocabulary):
+        with open_file(path, "rt") as f:
+            f.readline()  # skip headers
+            records = [cls._parse_tsv_line(line) for line in f]
+        return cls.from_records(records, vocabulary)
+
+    @staticmethod
+    def _parse_tsv_line(line):
+        rec = DataRecord(*line.rstrip("\n").split(DELI))
+        return rec._replace(words=[w for w in rec.words.split(WORD_DELI) if w])
+
+    def save_tsv(self, path, vocabulary):
+        dates = pd.Series(self.dates).dt.strftime("%Y/%m/%d")
+        with open_file(path, "wt") as f:
+            f.write(DELI.join(DataRecord._fields) + "\n")
+            for i, (video_id, date, wday, title) in enumerate(zip(self.ids, dates, self.wdays, self.titles)):
+                words = WORD_DELI.join(vocabulary.lookup(self.words_of(i)))
+                values = [video_id, date, wday, title] + list(self.stats[i]) + [words]
+                f.write(DELI.join([str(x) for x in values]) + "\n")
+
+    def to_frame(self):
+        """DataFrame of id, date (datetime64), wday, title and the statistics"""
+        df = pd.DataFrame({"id": self.ids, "date": self.dates, "wday": self.wdays, "title": self.titles})
+        for i, col in enumerate(TARGET_COLUMNS):
+            df[col] = self.stats[:, i]
+        return df
+
+
+def read_frame(path, columns=None):
+    """read only `columns` of a table file (a dataset or a training target table) as a DataFrame
+
+    Feather and parquet files are memory-mapped; dates come as datetime64.
+    """
+    if path.endswith(".tsv"):
+        df = pd.read_csv(path, sep=DELI, quoting=3, usecols=columns)
+        if "date" in df:
+            df["date"] = parse_date_series(df.date, fmt="%Y/%m/%d")
+        return df
+    return read_arrow_table(path, columns).to_pandas(date_as_object=False)
+
+
+def save_frame(df: pd.DataFrame, path):
+    if path.endswith(".tsv"):
+        df.to_csv(path, sep=DELI, index=False)
+    else:
+        import pyarrow as pa
+        write_arrow_table(pa.Table.from_pandas(df, preserve_index=False), path)
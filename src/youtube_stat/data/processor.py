@@ -1,183 +1,394 @@
 import re
-from collections import namedtuple, Counter
+from collections import namedtuple
+from datetime import timedelta
 from logging import getLogger
-from typing import List
+from time import time
 
 from youtube_stat.config import Config
-from youtube_stat.lib.datetime_util import parse_date_str
-from youtube_stat.lib.file_util import load_json_from_file, save_json_to_file
-from youtube_stat.lib.japanese_parser import JapaneseParserByYahooAPI
+from youtube_stat.data.dataset import BasicDataset, TARGET_COLUMNS, read_frame, save_frame
+from youtube_stat.data.snapshot_store import StatisticsSnapshotStore
+from youtube_stat.data.vocabulary import VocabularyIndex
+from youtube_stat.lib.datetime_util import parse_date_str, UTC
+from youtube_stat.lib.file_util import load_json_from_file, save_json_to_file, iter_jsonl_from_file, \
+    save_jsonl_to_file
+from youtube_stat.lib.japanese_parser import create_japanese_parser
+from youtube_stat.lib.table_io import resolve_format
+from youtube_stat.lib.token_cache import TokenizationCache
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
 logger = getLogger(__name__)
 
-DataRecord = namedtuple('DataRecord', 'id date wday title view like dislike comment words')
-DELI = "\t"
-WORD_DELI = "|"
+VideoSummary = namedtuple('VideoSummary', 'id title published_at stat')
+# x: scipy.sparse.csr_matrix of one-hot features, targets: pd.DataFrame of TARGET_COLUMNS,
+# word_ids: vocabulary id of the word of each word column (w0, w1, ...)
+TrainingData = namedtuple('TrainingData', 'ids targets x columns word_ids')
+
+
+def word_column_names(n_words):
+    return [f"w{i}" for i in range(n_words)]
+
+
+def compile_alternation(patterns):
+    """single regex which matches (by search) where any of `patterns` matches, or None for no patterns"""
+    if not patterns:
+        return None
+    return re.compile("|".join([f"(?:{x})" for x in patterns]))
 
 
 class DataProcessor:
     USE_POS_SET = {'名詞', '動詞', '形容動詞', '形容詞', '副詞'}
+    ENGLISH_WORD_RE = re.compile("^[a-zA-Z0-9'’]+$")
 
     def __init__(self, config: Config):
         self.config = config
+        self._vocabulary = None
 
     def parse_text(self):
+        """parse the titles which are not parsed yet and add them to the vocabulary index"""
         logger.info("start parse text")
-        detail_path = f"{self.config.resource.crawler_data_dir}/{self.config.resource.video_detail_list_name}"
-        video_detail_list = load_json_from_file(detail_path)
-        parser = JapaneseParserByYahooAPI(self.config)
+        detail_path = self.config.resource.video_detail_list_path
         kp = self.config.data.key_parsed_title
-        updated = False
+        vocabulary = self.vocabulary
 
-        for video_info in video_detail_list:
+        target_list = []  # [(video_id, title)]
+        for video_info in iter_jsonl_from_file(detail_path):
             title = video_info.get("snippet", {}).get("title")
             if title and not video_info.get(kp):
-                result = parser.parse_japanese(title)
-                video_info[kp] = result
-                updated = True
+                target_list.append((video_info.get("id"), title))
+            elif video_info.get(kp) and video_info.get("id") not in vocabulary:
+                vocabulary.add(video_info.get("id"), video_info[kp])  # parsed before the index existed
 
-        if updated:
-            save_json_to_file(detail_path, video_detail_list)
-        else:
+        if not target_list:
             logger.info("skip parse text")
+            if vocabulary.modified:
+                vocabulary.save()
+            return
+
+        def apply_results(video_info):
+            if video_info.get("id") in result_dict and not video_info.get(kp):
+                video_info[kp] = result_dict[video_info.get("id")]
+            return video_info
+
+        interval = self.config.resource.parse_checkpoint_interval or len(target_list)
+        begin_time = time()
+        with TokenizationCache(self.config.resource.token_cache_path,
+                               self.config.resource.token_cache_max_entries) as cache:
+            parser = create_japanese_parser(self.config, cache=cache)
+            try:
+                for i in range(0, len(target_list), interval):
+                    chunk = target_list[i:i+interval]
+                    result_list = parser.parse_japanese_batch([title for _, title in chunk])
+                    result_dict = dict(zip([video_id for video_id, _ in chunk], result_list))
+                    # checkpoint: parsed records are skipped when parse_text is resumed
+                    save_jsonl_to_file(detail_path, (apply_results(x) for x in iter_jsonl_from_file(detail_path)))
+                    for video_id, tokens in result_dict.items():
+                        vocabulary.add(video_id, tokens)
+                    n_done = i + len(chunk)
+                    elapsed = time() - begin_time
+                    logger.info(f"parsed {n_done}/{len(target_list)} titles "
+                                f"({n_done / max(elapsed, 1e-6):.1f} titles/sec)")
+            finally:
+                parser.close()
+                # saved once (also on error); if the process is killed, the next run adds the checkpointed titles
+                vocabulary.save()
+            logger.info(cache.stats())
 
     def create_dataset(self):
+        """
+        :rtype: BasicDataset
+        """
         logger.info("start create_dataset")
-        detail_path = f"{self.config.resource.crawler_data_dir}/{self.config.resource.video_detail_list_name}"
-        video_detail_list = load_json_from_file(detail_path)
-
-        data = []
-        word_set = self.pickup_words(video_detail_list)
-        ignore_title_list = [re.compile(x) for x in self.config.data.ignore_title_list]
-
-        for vi in video_detail_list:
+        snapshot_dict = self.load_snapshots_as_of(self.config.data.as_of_date)
+        video_list = self.load_video_table(snapshot_dict)
+        vocabulary = self.vocabulary
+        token_df = vocabulary.token_table([v.id for v in video_list])
+        word_mask = self.pickup_words(token_df)
+
+        # videos which have both snippet and statistics and whose title is not ignored
+        target = pd.Series([v.title is not None and bool(v.stat) for v in video_list], dtype=bool)
+        ignore_title_re = compile_alternation(self.config.data.ignore_title_list)
+        if ignore_title_re:
+            target &= ~pd.Series([v.title for v in video_list], dtype=object).fillna("").str.contains(ignore_title_re)
+
+        # words of each video, excluding videos which have only English words (or no words)
+        use_df = token_df[word_mask[token_df.surface] & target.values[token_df.vidx]]
+        english_mask = np.zeros(len(vocabulary.surfaces), dtype=bool)
+        word_ids = np.flatnonzero(word_mask)
+        english_mask[word_ids] = vocabulary.surfaces.contains(word_ids, self.ENGLISH_WORD_RE)
+        not_english = pd.Series(~english_mask[use_df.surface], index=use_df.index)
+        use_df = use_df[not_english.groupby(use_df.vidx).transform("any")]
+        # each word once per video, in the order of the title (tokens are sorted by vidx)
+        use_df = use_df.drop_duplicates(["vidx", "surface"])
+        word_vidx = use_df.vidx.values
+        vidx_list = np.unique(word_vidx)
+
+        videos = [video_list[i] for i in vidx_list]
+        dates = [parse_date_str(v.published_at).date() for v in videos]
+        dataset = BasicDataset(
+            ids=[v.id for v in videos],
+            dates=dates,
+            titles=[v.title for v in videos],
+            stats=[[int(v.stat['viewCount']), int(v.stat.get('likeCount', 0)), int(v.stat.get('dislikeCount', 0)),
+                    int(v.stat['commentCount'])] for v in videos],
+            words=use_df.surface.values.astype(np.int32),
+            word_offsets=np.append(np.searchsorted(word_vidx, vidx_list), len(word_vidx)),
+        )
+        dataset.save(self.dataset_path, vocabulary.surfaces)
+        if self.config.resource.export_dataset_tsv and self.dataset_path != self.dataset_tsv_path:
+            dataset.save_tsv(self.dataset_tsv_path, vocabulary.surfaces)
+        self.config.runtime.basic_dataset = dataset
+        return dataset
+
+    def load_video_table(self, snapshot_dict=None):
+        """read the crawled records in one streaming pass, keeping only what create_dataset uses
+
+        :return: list of VideoSummary (the words of the titles are in the vocabulary index)
+        """
+        video_list = []
+        for vi in iter_jsonl_from_file(self.config.resource.video_detail_list_path):
             sp = vi.get("snippet")
-            stat = vi.get("statistics")
-            if not sp or not stat:
-                continue
-            if not all([reg.search(sp['title']) is None for reg in ignore_title_list]):
-                continue
-
-            dt = parse_date_str(sp['publishedAt'])
-            words = vi[self.config.data.key_parsed_title]
-
-            use_words = set()
-            for w in words:
-                if w['surface'] in word_set:
-                    use_words.add(w['surface'])
-
-            if all([re.search("^[a-zA-Z0-9'’]+$", x) for x in use_words]):
-                continue
-
-            record = DataRecord(
-                id=vi['id'],
-                date=dt.strftime("%Y/%m/%d"),
-                wday=dt.weekday(),
-                title=sp['title'],
-                view=stat['viewCount'],
-                like=stat.get('likeCount', 0),
-                dislike=stat.get('dislikeCount', 0),
-                comment=stat['commentCount'],
-                words=WORD_DELI.join(use_words),
-            )
-            if record.words:
-                data.append(record)
-
-        with open(self.dataset_path, "wt") as f:
-            f.write(DELI.join(DataRecord._fields)+"\n")
-            for rec in data:
-                f.write(DELI.join([str(x) for x in rec]) + "\n")
-
-    def pickup_words(self, video_detail_list):
-        ignore_word_list = [re.compile(x) for x in self.config.data.ignore_word_list]
-        word_set = set()
-        for vi in video_detail_list:
-            words = vi[self.config.data.key_parsed_title]
-            for word in words:
-                if word['pos'] in self.USE_POS_SET:
-                    text = word['surface']
-                    if all([reg.search(text) is None for reg in ignore_word_list]):
-                        word_set.add(text)
-        return word_set
-
-    def convert_to_training_data(self):
-        with open(self.dataset_path, "rt") as f:
-            f.readline()  # skip headers
-            data = [DataRecord(*l.strip().split(DELI)) for l in f]
-
-        word_index_dict, month_index_dict, wday_index_dict = self.collect_one_hot_info(data)
-
-        train_data = []
-        before_date = self.config.data.before_date and parse_date_str(self.config.data.before_date)
-        for rec in data:
-            date = parse_date_str(rec.date)
-            if before_date and before_date < date:
-                continue
-
-            row = [rec.id]
-            row += [rec.view, rec.like, rec.dislike, rec.comment]
-            row += self.to_one_hot(month_index_dict, (date.year, date.month))
-            row += self.to_one_hot(wday_index_dict, date.weekday())
-
-            words = [w for w in rec.words.split(WORD_DELI) if w in word_index_dict]
-            row += self.to_one_hot(word_index_dict, words)
-            train_data.append(row)
-
-        columns = ["id"]
-        columns += ["view", "like", "dislike", "comment"]
-        columns += ["%d-%02d" % x for x in sorted(month_index_dict.keys())]
-        columns += "Mon Tue Wed Thr Fri Sat Sun".split(" ")
-        columns += ["w%03d" % i for i in range(len(word_index_dict))]
-
-        with open(self.training_data_path, "wt") as f:
-            f.write(",".join(columns) + "\n")
-            for d in train_data:
-                f.write(",".join([str(x) for x in d])+"\n")
+            stat = vi.get("statistics") if snapshot_dict is None else snapshot_dict.get(vi.get('id'))
+            video_list.append(VideoSummary(id=vi.get('id'), title=sp.get('title') if sp else None,
+                                           published_at=sp and sp.get('publishedAt'), stat=stat))
+        return video_list
+
+    def load_snapshots_as_of(self, date):
+        """statistics dict of each video as of `date` in the same form as the crawled 'statistics'
+
+        A date without time includes the snapshots fetched during that day. A date without timezone is in UTC,
+        like fetched_at and DataConfig.before_date.
+        """
+        if not date:
+            return None
+        as_of = parse_date_str(date)
+        if as_of.tzinfo is None:
+            as_of = as_of.replace(tzinfo=UTC)  # not the local time of this machine
+        if (as_of.hour, as_of.minute, as_of.second, as_of.microsecond) == (0, 0, 0, 0):
+            as_of += timedelta(days=1, seconds=-1)  # fetched_at is in whole seconds
+        with StatisticsSnapshotStore(self.config.resource.snapshot_db_path) as store:
+            snapshot_dict = store.as_of(as_of)
+        logger.info(f"use {len(snapshot_dict)} statistics snapshots as of {date}")
+        return dict((video_id, dict(
+            viewCount=str(s.view or 0),
+            likeCount=str(s.like or 0),
+            dislikeCount=str(s.dislike or 0),
+            commentCount=str(s.comment or 0),
+        )) for video_id, s in snapshot_dict.items())
+
+    def pickup_words(self, token_df):
+        """
+        :param token_df: token_table of the vocabulary index
+        :return: bool array over the word ids, True for the words used as features
+        """
+        vocabulary = self.vocabulary
+        word_mask = np.zeros(len(vocabulary.surfaces), dtype=bool)
+        word_mask[token_df.surface[token_df.pos.isin(vocabulary.pos.ids(self.USE_POS_SET))]] = True
+        ignore_word_re = compile_alternation(self.config.data.ignore_word_list)
+        if ignore_word_re:
+            word_ids = np.flatnonzero(word_mask)
+            word_mask[word_ids[vocabulary.surfaces.contains(word_ids, ignore_word_re)]] = False
+        return word_mask
+
+    def convert_to_training_data(self, dataset: BasicDataset = None):
+        """
+        Two passes over the dataset: collect_one_hot_info, then the rows are converted chunk by chunk
+        (ResourceConfig.training_chunk_size rows), so that only a chunk and the compact sparse result are in memory.
+
+        :param dataset: the dataset file is loaded unless given or created by create_dataset in this process
+        :rtype: TrainingData
+        """
+        chunk_size = self.config.resource.training_chunk_size
+        if dataset is None:
+            dataset = self.config.runtime.basic_dataset
+        if dataset is None and not chunk_size:
+            dataset = self.load_basic_data()
+        if dataset is not None:
+            def iter_chunks():
+                return dataset.iter_chunks(chunk_size or len(dataset) or 1)
+        else:
+            def iter_chunks():
+                return BasicDataset.iter_file(self.dataset_path, chunk_size, self.vocabulary.surfaces)
 
-        save_json_to_file(self.word_index_path, word_index_dict)
+        word_ids, month_index_dict, wday_index_dict = self.collect_one_hot_info(iter_chunks())
+        columns = ["%d-%02d" % x for x in sorted(month_index_dict.keys())]
+        columns += "Mon Tue Wed Thr Fri Sat Sun".split(" ")
+        columns += word_column_names(len(word_ids))
+        # word id -> index of its word column, -1 for the words which are not used
+        word_columns = np.full(word_ids.max() + 1 if len(word_ids) else 0, -1, dtype=np.int64)
+        word_columns[word_ids] = np.arange(len(word_ids))
+
+        x_list, id_list, target_list = [], [], []
+        for chunk in iter_chunks():
+            x, keep = self.convert_chunk(chunk, word_columns, month_index_dict, wday_index_dict, len(columns))
+            x_list.append(x)
+            id_list += chunk.ids[keep].tolist()
+            target_list.append(chunk.stats[keep])
+        x = sparse.vstack(x_list, format='csr') if x_list else sparse.csr_matrix((0, len(columns)), dtype=np.int8)
+        ids = id_list
+        targets = np.vstack(target_list) if target_list else np.zeros((0, len(TARGET_COLUMNS)), dtype=np.int64)
+
+        sparse.save_npz(self.training_data_path, x)
+        target_df = pd.DataFrame(targets, columns=list(TARGET_COLUMNS))
+        save_frame(pd.concat([pd.DataFrame({"id": ids}), target_df], axis=1), self.training_targets_path)
+        save_json_to_file(self.training_meta_path, dict(columns=columns, target_columns=list(TARGET_COLUMNS),
+                                                        word_ids=word_ids.tolist()), indent=None)
+        # for people: word -> index of its word column
+        save_json_to_file(self.word_index_path, dict(zip(self.vocabulary.surfaces.lookup(word_ids).tolist(),
+                                                         range(len(word_ids)))))
+
+        td = TrainingData(ids=ids, targets=target_df, x=x, columns=columns, word_ids=word_ids)
+        if self.config.resource.export_training_csv:
+            self.export_training_csv(td)
+        self.config.runtime.training_data = td
+        return td
+
+    def convert_chunk(self, chunk: BasicDataset, word_columns, month_index_dict, wday_index_dict, n_columns):
+        """one-hot rows of the videos on or before before_date
+
+        :param word_columns: int array, word id -> index of its word column or -1
+        :return: int8 csr_matrix of the kept rows and the mask of kept rows
+        """
+        month_offset = 0
+        wday_offset = month_offset + len(month_index_dict)
+        word_offset = wday_offset + len(wday_index_dict)
+
+        keep = self.before_date_mask(chunk.dates)
+        new_rows = np.cumsum(keep) - 1
+        kept = np.flatnonzero(keep)
+        month_keys = [(d.year, d.month) for d in chunk.dates[kept].astype('datetime64[M]').tolist()]
+
+        # month and weekday columns of the kept rows
+        rows = [new_rows[kept], new_rows[kept]]
+        cols = [month_offset + np.array([month_index_dict[k] for k in month_keys], dtype=np.int64),
+                wday_offset + np.array([wday_index_dict[w] for w in chunk.wdays[kept]], dtype=np.int64)]
+        # word columns
+        word_cols = np.full(len(chunk.words), -1, dtype=np.int64)
+        known = chunk.words < len(word_columns)
+        word_cols[known] = word_columns[chunk.words[known]]
+        word_rows = chunk.word_rows
+        use = keep[word_rows] & (word_cols >= 0)
+        rows.append(new_rows[word_rows[use]])
+        cols.append(word_offset + word_cols[use])
+
+        rows = np.concatenate(rows)
+        x = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, np.concatenate(cols))),
+                              shape=(len(kept), n_columns))
+        x.data[:] = 1  # a word counts once per video
+        return x, keep
+
+    def export_training_csv(self, td: "TrainingData"):
+        chunk_size = self.config.resource.training_chunk_size or max(len(td.ids), 1)
+        with open(self.training_csv_path, "wt") as f:
+            for begin in range(0, max(len(td.ids), 1), chunk_size):
+                end = begin + chunk_size
+                df = pd.concat([
+                    pd.DataFrame({"id": td.ids[begin:end]}),
+                    td.targets.iloc[begin:end].reset_index(drop=True),
+                    pd.DataFrame(td.x[begin:end].toarray(), columns=td.columns),
+                ], axis=1)
+                df.to_csv(f, index=False, header=begin == 0)
 
     def load_training_data(self):
-        return pd.read_csv(self.training_data_path)
+        """
+        :rtype: TrainingData
+        """
+        meta = load_json_from_file(self.training_meta_path)
+        target_df = read_frame(self.training_targets_path)
+        return TrainingData(ids=target_df.id.tolist(), targets=target_df[meta['target_columns']],
+                            x=sparse.load_npz(self.training_data_path).tocsr(),
+                            columns=meta['columns'], word_ids=np.array(meta['word_ids'], dtype=np.int32))
 
     def load_basic_data(self):
-        return pd.read_csv(self.dataset_path, sep=DELI, quoting=3)
-
-    def collect_one_hot_info(self, data: List[DataRecord]):
-        word_counter = Counter()
+        """
+        :rtype: BasicDataset
+        """
+        return BasicDataset.load(self.dataset_path, self.vocabulary.surfaces)
+
+    def load_basic_frame(self, columns=None):
+        """only `columns` of the dataset file as a DataFrame"""
+        return read_frame(self.dataset_path, columns)
+
+    def before_date_mask(self, dates):
+        """True for the dates on or before DataConfig.before_date (all True if it is not specified)"""
+        if not self.config.data.before_date:
+            return np.ones(len(dates), dtype=bool)
+        before_date = parse_date_str(self.config.data.before_date)
+        if before_date.tzinfo:
+            before_date = before_date.astimezone(UTC).replace(tzinfo=None)
+        return dates.astype('datetime64[s]') <= np.datetime64(before_date, 's')
+
+    def collect_one_hot_info(self, chunks):
+        """
+        :param chunks: BasicDataset or iterable of BasicDataset
+        :return: ids of the words which occur min_word_occur times or more (the most frequent first),
+                 month index dict and weekday index dict
+        """
+        if isinstance(chunks, BasicDataset):
+            chunks = [chunks]
+        word_counts = np.zeros(0, dtype=np.int64)
+        first_seen = np.zeros(0, dtype=np.int64)  # position where each word id appeared first
+        n_seen = 0
         month_set = set()
-        before_date = self.config.data.before_date and parse_date_str(self.config.data.before_date)
-
-        for rec in data:
-            word_counter.update(rec.words.split(WORD_DELI))
-            date = parse_date_str(rec.date)
-            if date <= before_date:
-                month_set.add((date.year, date.month))
-
-        word_list = list([w for w, c in word_counter.most_common() if c >= self.config.data.min_word_occur])
+        for chunk in chunks:
+            counts = np.bincount(chunk.words, minlength=len(word_counts))
+            if len(counts) > len(word_counts):
+                word_counts = np.append(word_counts, np.zeros(len(counts) - len(word_counts), dtype=np.int64))
+                first_seen = np.append(first_seen, np.full(len(counts) - len(first_seen), np.iinfo(np.int64).max))
+            word_counts += counts
+            ids, first = np.unique(chunk.words, return_index=True)
+            first_seen[ids] = np.minimum(first_seen[ids], n_seen + first)
+            n_seen += len(chunk.words)
+            months = np.unique(chunk.dates[self.before_date_mask(chunk.dates)].astype('datetime64[M]'))
+            month_set.update([(d.year, d.month) for d in months.tolist()])
+
+        # the most frequent first, ties in the order of appearance
+        word_ids = np.flatnonzero(word_counts >= max(self.config.data.min_word_occur, 1))
+        word_ids = word_ids[np.lexsort((first_seen[word_ids], -word_counts[word_ids]))].astype(np.int32)
         month_list = list(sorted(month_set))
-        word_index_dict = dict([w, i] for i, w in enumerate(word_list))
         month_index_dict = dict([w, i] for i, w in enumerate(month_list))
         wday_index_dict = dict([i, i] for i in range(7))
-        return word_index_dict, month_index_dict, wday_index_dict
+        return word_ids, month_index_dict, wday_index_dict
 
-    @staticmethod
-    def to_one_hot(index_dict, items):
-        if not isinstance(items, list):
-            items = [items]
-        ret = [0] * len(index_dict)
-        for item in items:
-            ret[index_dict[item]] = 1
-        return ret
+    @property
+    def dataset_format(self):
+        return resolve_format(self.config.resource.dataset_format)
 
     @property
     def dataset_path(self):
-        return f"{self.config.resource.working_dir}/{self.config.resource.basic_dataset_name}"
+        return f"{self.config.resource.working_dir}/{self.config.resource.basic_dataset_name}.{self.dataset_format}"
+
+    @property
+    def dataset_tsv_path(self):
+        return f"{self.config.resource.working_dir}/{self.config.resource.basic_dataset_name}.tsv"
+
+    @property
+    def training_targets_path(self):
+        rc = self.config.resource
+        return f"{rc.working_dir}/{rc.training_targets_name}.{self.dataset_format}"
 
     @property
     def training_data_path(self):
         return f"{self.config.resource.working_dir}/{self.config.resource.training_dataset_name}"
 
+    @property
+    def training_meta_path(self):
+        return f"{self.config.resource.working_dir}/{self.config.resource.training_meta_name}"
+
+    @property
+    def training_csv_path(self):
+        return f"{self.config.resource.working_dir}/{self.config.resource.training_csv_name}"
+
     @property
     def word_index_path(self):
         return f"{self.config.resource.working_dir}/{self.config.resource.word_index_name}"
+
+    @property
+    def vocabulary(self):
+        """
+        :rtype: VocabularyIndex
+        """
+        if self._vocabulary is None:
+            self._vocabulary = VocabularyIndex(self.config.resource.vocabulary_path)
+        return self._vocabulary
@@ -0,0 +1,97 @@
+import sqlite3
+from collections import namedtuple
+from logging import getLogger
+
+from youtube_stat.lib.datetime_util import to_unixtime
+
+logger = getLogger(__name__)
+
+Snapshot = namedtuple('Snapshot', 'video_id fetched_at view like dislike comment')
+
+
+class StatisticsSnapshotStore:
+    """Append-only store of per-video statistics keyed by (video_id, fetched_at).
+
+    fetched_at is kept as unixtime. Snapshots are never updated, so the view growth history is preserved.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot (
+                video_id TEXT NOT NULL,
+                fetched_at INTEGER NOT NULL,
+                view INTEGER,
+                like INTEGER,
+                dislike INTEGER,
+                comment INTEGER,
+                PRIMARY KEY (video_id, fetched_at)
+            ) WITHOUT ROWID""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS snapshot_fetched_at ON snapshot (fetched_at)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def append(self, video_detail_list, key_fetched_at):
+        rows = []
+        for vi in video_detail_list:
+            stat = vi.get("statistics")
+            if not stat or not vi.get(key_fetched_at):
+                continue
+            rows.append((
+                vi['id'], to_unixtime(vi[key_fetched_at]),
+                _to_int(stat.get('viewCount')), _to_int(stat.get('likeCount')),
+                _to_int(stat.get('dislikeCount')), _to_int(stat.get('commentCount')),
+            ))
+        with self.conn:
+            cur = self.conn.executemany("INSERT OR IGNORE INTO snapshot VALUES (?, ?, ?, ?, ?, ?)", rows)
+        logger.info(f"appended {cur.rowcount} statistics snapshots")
+        return cur.rowcount
+
+    def read_by_video(self, video_id, start=None, end=None):
+        sql = "SELECT * FROM snapshot WHERE video_id = ?"
+        where, params = self._range_condition(start, end)
+        sql += where + " ORDER BY fetched_at"
+        return [Snapshot(*r) for r in self.conn.execute(sql, [video_id] + params)]
+
+    def read_by_date(self, start=None, end=None):
+        sql = "SELECT * FROM snapshot WHERE 1 = 1"
+        where, params = self._range_condition(start, end)
+        sql += where + " ORDER BY fetched_at, video_id"
+        for r in self.conn.execute(sql, params):
+            yield Snapshot(*r)
+
+    def as_of(self, date):
+        """latest snapshot of each video fetched at or before `date`
+
+        :rtype: dict[str, Snapshot]
+        """
+        sql = """
+            SELECT s.* FROM snapshot s
+            JOIN (SELECT video_id, MAX(fetched_at) AS fetched_at FROM snapshot
+                  WHERE fetched_at <= ? GROUP BY video_id) m
+            ON s.video_id = m.video_id AND s.fetched_at = m.fetched_at"""
+        return dict((r[0], Snapshot(*r)) for r in self.conn.execute(sql, [to_unixtime(date)]))
+
+    @staticmethod
+    def _range_condition(start, end):
+        where = ""
+        params = []
+        if start is not None:
+            where += " AND fetched_at >= ?"
+            params.append(to_unixtime(start))
+        if end is not None:
+            where += " AND fetched_at <= ?"
+            params.append(to_unixtime(end))
+        return where, params
+
+
+def _to_int(value):
+    return None if value is None else int(value)
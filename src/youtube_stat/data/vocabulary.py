@@ -0,0 +1,134 @@
+import os
+from logging import getLogger
+
+import numpy as np
+import pandas as pd
+
+logger = getLogger(__name__)
+
+
+class Vocabulary:
+    """Append-only mapping of strings to int32 ids; an id never changes once it is assigned."""
+
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.index = dict((s, i) for i, s in enumerate(self.items))
+        self._array = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def intern(self, s):
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.items)
+            self.items.append(s)
+            self._array = None
+        return i
+
+    def intern_all(self, strings):
+        return np.array([self.intern(s) for s in strings], dtype=np.int32)
+
+    def ids(self, strings):
+        """ids of the known strings (unknown ones are dropped)"""
+        return np.array([self.index[s] for s in strings if s in self.index], dtype=np.int32)
+
+    def lookup(self, ids):
+        """object array of the strings of `ids`"""
+        if self._array is None:
+            self._array = np.array(self.items, dtype=object)
+        return self._array[np.asarray(ids, dtype=np.int64)]
+
+    def contains(self, ids, pattern):
+        """bool array: whether the string of each id matches (by search) the compiled regex `pattern`"""
+        return pd.Series(self.lookup(ids), dtype=object).str.contains(pattern).values.astype(bool)
+
+
+class VocabularyIndex:
+    """Parsed title tokens of a channel as int32 ids of word surfaces and parts of speech.
+
+    The tokens of `video_ids[i]` are `surface_ids[offsets[i]:offsets[i+1]]` (and `pos_ids` likewise).
+    Titles parsed by later runs are appended, so the vocabulary and the ids saved before stay valid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.surfaces = Vocabulary()
+        self.pos = Vocabulary()
+        self.video_ids = []
+        self._video_set = set()
+        self._offsets = [np.zeros(1, dtype=np.int64)]
+        self._surface_ids = []
+        self._pos_ids = []
+        self._n_tokens = 0
+        self.modified = False
+        if os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __contains__(self, video_id):
+        return video_id in self._video_set
+
+    def add(self, video_id, tokens):
+        """
+        :param list[dict] tokens: parse result of the title, e.g. [{"surface": "猫", "pos": "名詞"}, ...]
+        """
+        if video_id in self._video_set:
+            return
+        self.video_ids.append(video_id)
+        self._video_set.add(video_id)
+        self._surface_ids.append(self.surfaces.intern_all([t['surface'] for t in tokens]))
+        self._pos_ids.append(self.pos.intern_all([t['pos'] for t in tokens]))
+        self._n_tokens += len(tokens)
+        self._offsets.append(np.array([self._n_tokens], dtype=np.int64))
+        self.modified = True
+
+    @property
+    def offsets(self):
+        self._offsets = [np.concatenate(self._offsets)]
+        return self._offsets[0]
+
+    @property
+    def surface_ids(self):
+        self._surface_ids = [np.concatenate(self._surface_ids or [np.zeros(0, dtype=np.int32)])]
+        return self._surface_ids[0]
+
+    @property
+    def pos_ids(self):
+        self._pos_ids = [np.concatenate(self._pos_ids or [np.zeros(0, dtype=np.int32)])]
+        return self._pos_ids[0]
+
+    def token_table(self, video_ids):
+        """tokens of `video_ids` in the order of the list and of each title
+
+        :return: DataFrame of vidx (index of `video_ids`), surface and pos (int32 ids)
+        """
+        vidx_dict = dict((video_id, i) for i, video_id in enumerate(video_ids))
+        vidx = pd.Series(self.video_ids, dtype=object).map(vidx_dict).fillna(-1).values.astype(np.int64)
+        token_vidx = np.repeat(vidx, np.diff(self.offsets))
+        use = np.flatnonzero(token_vidx >= 0)
+        use = use[np.argsort(token_vidx[use], kind='mergesort')]
+        return pd.DataFrame({"vidx": token_vidx[use], "surface": self.surface_ids[use], "pos": self.pos_ids[use]})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, surfaces=np.array(self.surfaces.items, dtype=str), pos=np.array(self.pos.items, dtype=str),
+                     video_ids=np.array(self.video_ids, dtype=str), offsets=self.offsets,
+                     surface_ids=self.surface_ids, pos_ids=self.pos_ids)
+        os.replace(tmp_path, self.path)
+        self.modified = False
+        logger.info(f"saved vocabulary of {len(self.surfaces)} words from {len(self)} titles to {self.path}")
+
+    def _load(self):
+        with np.load(self.path) as data:
+            self.surfaces = Vocabulary(data['surfaces'].tolist())
+            self.pos = Vocabulary(data['pos'].tolist())
+            self.video_ids = data['video_ids'].tolist()
+            self._offsets = [data['offsets'].astype(np.int64)]
+            self._surface_ids = [data['surface_ids'].astype(np.int32)]
+            self._pos_ids = [data['pos_ids'].astype(np.int32)]
+        self._video_set = set(self.video_ids)
+        self._n_tokens = int(self._offsets[0][-1])
@@ -1,39 +1,74 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
+from datetime import datetime, timedelta
 from logging import getLogger
 from os.path import exists
 from typing import List
 
 from youtube_stat.config import Config
-from youtube_stat.lib.file_util import save_json_to_file, load_json_from_file
-from youtube_stat.lib.http_lib import http_get
+from youtube_stat.data.snapshot_store import StatisticsSnapshotStore
+from youtube_stat.lib.datetime_util import parse_date_str, UTC
+from youtube_stat.lib.file_util import iter_jsonl_from_file, save_jsonl_to_file, append_jsonl_to_file
+from youtube_stat.lib.http_cache import HttpResponseCache
+from youtube_stat.lib.http_lib import create_http_client
 
 logger = getLogger()
 
 
 class YoutubeCrawler:
+    # quota units per request of YouTube Data API v3
+    QUOTA_COSTS = {"search": 100, "videos": 1}
+
     def __init__(self, config: Config):
         self.config = config
+        rc = config.resource
+        self.http_cache = None
+        if rc.http_cache_enabled:
+            self.http_cache = HttpResponseCache(rc.http_cache_path, rc.http_cache_ttls, rc.http_cache_max_bytes)
+        self.http_client = create_http_client(rc, rc.crawler_rate_limit, cache=self.http_cache)
 
     def start(self):
         assert self.config.data.channel_id, "channel_id is not specified"
         assert self.config.resource.youtube_api_key, "API Key is not specified"
 
-        video_list = self.fetch_video_list()
-        self.fetch_video_detail(video_list)
+        try:
+            video_list = self.fetch_video_list()
+            self.fetch_video_detail(video_list)
+        finally:
+            self.http_client.close()
+            if self.http_cache:
+                self.http_cache.close()
 
     def fetch_video_list(self):
-        video_list_path = f'{self.config.resource.crawler_data_dir}/{self.config.resource.video_list_name}'
+        video_list_path = self.config.resource.video_list_path
         if not exists(video_list_path):
             video_list = self.call_fetch_video_list()
-            save_json_to_file(video_list_path, video_list)
+            save_jsonl_to_file(video_list_path, video_list)
         else:
             logger.info("loading video list from cache")
-            video_list = load_json_from_file(video_list_path)
+            video_list = list(iter_jsonl_from_file(video_list_path))
+            if self.config.resource.crawler_refresh:
+                new_video_list = self.fetch_new_video_list(video_list)
+                if new_video_list:
+                    video_list = new_video_list + video_list
+                    save_jsonl_to_file(video_list_path, video_list)
         return video_list
 
-    def call_fetch_video_list(self):
-        url = 'https://www.googleapis.com/youtube/v3/search'
+    def fetch_new_video_list(self, video_list):
+        published_list = [x['snippet']['publishedAt'] for x in video_list if x.get('snippet', {}).get('publishedAt')]
+        if not published_list:
+            return self.call_fetch_video_list()
+        published_after = max(published_list, key=parse_date_str)
+        existing_video_set = set([x['id'].get('videoId') for x in video_list])
+        # publishedAfter is inclusive, so the latest known video comes back again
+        new_video_list = [x for x in self.call_fetch_video_list(published_after=published_after)
+                          if x['id'].get('videoId') not in existing_video_set]
+        logger.info(f"found {len(new_video_list)} new videos published after {published_after}")
+        return new_video_list
+
+    def call_fetch_video_list(self, published_after=None):
+        url = f'{self.config.resource.youtube_api_base_url}/search'
         base_params = dict(
             part="snippet,id",
             channelId=self.config.data.channel_id,
@@ -41,13 +76,15 @@ class YoutubeCrawler:
             key=self.config.resource.youtube_api_key,
             maxResults=50,
         )
+        if published_after:
+            base_params['publishedAfter'] = published_after
         page_token = None
         video_list = []
         while True:
             params = copy(base_params)
             if page_token:
                 params['pageToken'] = page_token
-            ret = json.loads(http_get(url, params))
+            ret = json.loads(self.call_api("search", url, params))
             page_token = ret.get('nextPageToken')
             if ret.get("items"):
                 video_list += ret.get("items")
@@ -58,39 +95,82 @@ class YoutubeCrawler:
         return video_list
 
     def fetch_video_detail(self, video_list):
-        fetch_video_detail_list = []
-        detail_path = f'{self.config.resource.crawler_data_dir}/{self.config.resource.video_detail_list_name}'
+        detail_path = self.config.resource.video_detail_list_path
+        kf = self.config.data.key_fetched_at
+        expire_time = datetime.now(UTC) - timedelta(hours=self.config.resource.statistics_ttl_hours)
 
+        existing_video_set = set()
+        stale_video_list = []
         if exists(detail_path):
-            with open(detail_path, "rt") as f:
-                video_detail_list = json.load(f)
-        else:
-            video_detail_list = []
-        existing_video_set = set([x.get("id") for x in video_detail_list])
+            for video_info in iter_jsonl_from_file(detail_path):
+                existing_video_set.add(video_info.get("id"))
+                if not video_info.get(kf) or parse_date_str(video_info[kf]) < expire_time:
+                    stale_video_list.append(video_info.get("id"))
 
+        fetch_video_detail_list = []
         for video_info in video_list:
             video_id = video_info['id'].get('videoId')
             if video_id and video_id not in existing_video_set:
                 fetch_video_detail_list.append(video_id)
+                existing_video_set.add(video_id)
 
+        updated_list = []
         if fetch_video_detail_list:
-            video_detail_list += self.call_fetch_video_detail(fetch_video_detail_list)
-            save_json_to_file(detail_path, video_detail_list)
+            new_detail_list = self.stamp_fetched_at(self.call_fetch_video_detail(fetch_video_detail_list))
+            append_jsonl_to_file(detail_path, new_detail_list)
+            updated_list += new_detail_list
+        if self.config.resource.crawler_refresh and stale_video_list:
+            updated_list += self.refresh_statistics(stale_video_list)
+
+        if updated_list:
+            with StatisticsSnapshotStore(self.config.resource.snapshot_db_path) as store:
+                store.append(updated_list, kf)
         else:
             logger.info("skip fetch video details")
+
+    def refresh_statistics(self, video_id_list):
+        logger.info(f"refresh statistics of {len(video_id_list)} videos")
+        kf = self.config.data.key_fetched_at
+        stat_list = self.stamp_fetched_at(self.call_fetch_video_detail(video_id_list, part='statistics'))
+        stat_dict = dict([(x['id'], x) for x in stat_list if x.get('statistics')])
+
+        def update(video_info):
+            stat = stat_dict.get(video_info.get('id'))
+            if stat:
+                video_info['statistics'] = stat['statistics']
+                video_info[kf] = stat[kf]
+            return video_info
+
+        detail_path = self.config.resource.video_detail_list_path
+        save_jsonl_to_file(detail_path, (update(x) for x in iter_jsonl_from_file(detail_path)))
+        return list(stat_dict.values())
+
+    def stamp_fetched_at(self, video_detail_list):
+        now = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for video_info in video_detail_list:
+            video_info[self.config.data.key_fetched_at] = now
         return video_detail_list
 
-    def call_fetch_video_detail(self, video_list: List[str]):
-        video_detail_list = []
-        url = 'https://www.googleapis.com/youtube/v3/videos'
+    def call_api(self, name, url, params):
+        # every request sent consumes quota, even if it fails or gets 304
+        return self.http_client.get(url, params, endpoint=f"youtube.{name}", quota=self.QUOTA_COSTS.get(name, 1))
 
-        for i in range(0, len(video_list), 50):
+    def call_fetch_video_detail(self, video_list: List[str], part='snippet,statistics'):
+        url = f'{self.config.resource.youtube_api_base_url}/videos'
+
+        def fetch(ids):
             params = dict(
-                part='snippet,statistics',
-                id=",".join(video_list[i:min(len(video_list), i+50)]),
+                part=part,
+                id=",".join(ids),
                 key=self.config.resource.youtube_api_key,
             )
-            response = json.loads(http_get(url, params))
-            video_detail_list += response['items']
+            return json.loads(self.call_api("videos", url, params))['items']
+
+        batches = [video_list[i:i+50] for i in range(0, len(video_list), 50)]
+        video_detail_list = []
+        with ThreadPoolExecutor(max_workers=self.config.resource.crawler_max_workers or 1) as executor:
+            # map() keeps the order of batches, so the result is the same as fetching them one by one
+            for items in executor.map(fetch, batches):
+                video_detail_list += items
         return video_detail_list
 
@@ -1,9 +1,10 @@
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+from functools import lru_cache
 
-import dateparser
 import pytz
 from dateutil import parser as dateutil_parser
+from dateutil.tz import tzutc
 
 JST = pytz.timezone("Asia/Tokyo")
 UTC = pytz.utc
@@ -36,6 +37,12 @@ def to_unixtime(date_str):
         return int(day.timestamp())
 
 
+# 2018-06-28T09:00:01.000Z (publishedAt of YouTube API)
+ISO_UTC_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z$')
+# 2018/06/28 (dataset) or 2018-06-28
+YMD_RE = re.compile(r'^(\d{4})[-/](\d{2})[-/](\d{2})$')
+
+
 def parse_date_str(s):
     """
 
@@ -44,11 +51,40 @@ def parse_date_str(s):
     """
     if isinstance(s, datetime):
         return s
+    if isinstance(s, date):
+        return datetime(s.year, s.month, s.day)
+    return _parse_date_str(str(s))
+
+
+@lru_cache(maxsize=65536)
+def _parse_date_str(s):
+    try:
+        m = ISO_UTC_RE.match(s)
+        if m:
+            y, mo, d, h, mi, sec, frac = m.groups()
+            return datetime(int(y), int(mo), int(d), int(h), int(mi), int(sec),
+                            int(frac.ljust(6, '0')) if frac else 0, tzinfo=tzutc())
+        m = YMD_RE.match(s)
+        if m:
+            return datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    except ValueError:
+        pass  # matched but not a real date (e.g. 2019/13/45): left to the slow path, as before the fast path
     try:
-        re.sub('([0-9]{4})([0-9]{2})([0-9]{2})', r'\1-\2-\3', str(s))
         return dateutil_parser.parse(s)
-    except (ValueError, TypeError):
-        return dateparser.parse(str(s))
+    except (ValueError, TypeError, OverflowError):
+        import dateparser  # slow to import, so only when needed
+        return dateparser.parse(s)
+
+
+def parse_date_series(values, fmt=None):
+    """vectorized parse_date_str for a whole column
+
+    :param values: pd.Series or array like of date strings
+    :param str fmt: strptime format of all values (e.g. "%Y/%m/%d"). None means to infer it.
+    :rtype: pd.Series
+    """
+    import pandas as pd
+    return pd.Series(pd.to_datetime(values, format=fmt))
 
 
 def from_unixtime_to_datetime(unixtime, tz=UTC):
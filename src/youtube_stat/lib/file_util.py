@@ -1,6 +1,7 @@
 import gzip
 import json
 import os
+import shutil
 
 import yaml
 
@@ -11,11 +12,11 @@ def create_basedir(file_path):
         os.makedirs(dir_name)
 
 
-def open_file(filename, mode='rt'):
+def open_file(filename, mode='rt', encoding=None):
     if filename.endswith('.gz'):
-        in_file = gzip.open(filename, mode)
+        in_file = gzip.open(filename, mode, encoding=encoding)
     else:
-        in_file = open(filename, mode)
+        in_file = open(filename, mode, encoding=encoding)
     return in_file
 
 
@@ -38,5 +39,61 @@ def save_json_to_file(filepath, data, indent=2, ensure_ascii=False):
 
 
 def load_json_from_file(filepath):
-    with open(filepath, "rt") as f:
+    with open(filepath, "rt", encoding='utf8') as f:
         return json.load(f)
+
+
+def iter_jsonl_from_file(filepath):
+    """yield records of a JSON Lines file (gzipped if the name ends with .gz) one by one"""
+    with open_file(filepath, "rt", encoding='utf8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def save_jsonl_to_file(filepath, records, ensure_ascii=False):
+    """write records (any iterable) to a temporary file and rename it to filepath atomically
+
+    records may be read lazily from filepath itself.
+    """
+    tmp_path = _tmp_path(filepath)
+    try:
+        with open_file(tmp_path, "wt", encoding='utf8') as f:
+            _write_jsonl(f, records, ensure_ascii)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def append_jsonl_to_file(filepath, records, ensure_ascii=False):
+    """append records to a copy of filepath and rename it to filepath atomically"""
+    tmp_path = _tmp_path(filepath)
+    try:
+        if os.path.exists(filepath):
+            shutil.copyfile(filepath, tmp_path)  # concatenated gzip members are a valid gzip file
+        with open_file(tmp_path, "at", encoding='utf8') as f:
+            _write_jsonl(f, records, ensure_ascii)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def migrate_json_to_jsonl(json_path, jsonl_path):
+    """convert a legacy JSON list file into JSON Lines once; returns True if converted"""
+    if not os.path.exists(json_path) or os.path.exists(jsonl_path):
+        return False
+    save_jsonl_to_file(jsonl_path, load_json_from_file(json_path))
+    return True
+
+
+def _write_jsonl(f, records, ensure_ascii):
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=ensure_ascii))
+        f.write("\n")
+
+
+def _tmp_path(filepath):
+    dir_name, base_name = os.path.split(filepath)
+    return os.path.join(dir_name, f".{base_name}.tmp" + (".gz" if filepath.endswith(".gz") else ""))
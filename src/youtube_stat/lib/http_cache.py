@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+from collections import namedtuple
+from logging import getLogger
+from time import time
+from urllib import parse
+
+logger = getLogger(__name__)
+
+CachedResponse = namedtuple('CachedResponse', 'etag body fetched_at')
+
+
+class HttpResponseCache:
+    """On-disk LRU cache of GET responses, bounded by the total size of bodies.
+
+    :param dict[str, float] ttls: endpoint -> seconds a response is used without asking the server.
+        Older responses are revalidated by If-None-Match when they have an ETag. Endpoints which are
+        not in `ttls` are not cached.
+    """
+
+    EVICT_CHECK_INTERVAL = 100
+    IGNORE_PARAMS = ('key', 'appid')  # credentials must not be a part of keys
+
+    def __init__(self, db_path, ttls, max_bytes=None):
+        self.db_path = db_path
+        self.ttls = ttls or {}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._n_put = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS http_cache_last_access ON http_cache (last_access)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self.conn.close()
+        logger.info(self.stats())
+
+    def cacheable(self, endpoint):
+        return endpoint in self.ttls
+
+    def is_fresh(self, endpoint, response: CachedResponse):
+        return time() - response.fetched_at < self.ttls.get(endpoint, 0)
+
+    @classmethod
+    def create_key(cls, url, params=None):
+        u = parse.urlsplit(url)
+        query = parse.parse_qsl(u.query) + list((params or {}).items())
+        query = sorted([(k, str(v)) for k, v in query if k not in cls.IGNORE_PARAMS])
+        return parse.urlunsplit((u.scheme, u.netloc.lower(), u.path, parse.urlencode(query), ''))
+
+    def get(self, key):
+        """
+        :rtype: CachedResponse
+        """
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT etag, body, fetched_at FROM http_cache WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE http_cache SET last_access = ? WHERE url = ?", (time(), key))
+        return CachedResponse(*row)
+
+    def put(self, key, etag, body):
+        now = time()
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?)",
+                              (key, etag, sqlite3.Binary(body), len(body), now, now))
+            self._n_put += 1
+            if self._n_put % self.EVICT_CHECK_INTERVAL == 0:
+                self._evict()
+
+    def count(self, kind):
+        """count a request answered by kind: hits, revalidated or misses"""
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def touch(self, key):
+        """the server answered 304 Not Modified"""
+        now = time()
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE http_cache SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, key))
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        keys = []
+        for key, size in self.conn.execute("SELECT url, size FROM http_cache ORDER BY last_access"):
+            keys.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        with self.conn:
+            self.conn.executemany("DELETE FROM http_cache WHERE url = ?", keys)
+        logger.debug(f"evicted {len(keys)} responses from http cache")
+
+    @property
+    def hit_rate(self):
+        """fraction of requests answered without downloading the body (fresh hits and 304)"""
+        total = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / total if total else 0.0
+
+    def stats(self):
+        return (f"http cache: hits={self.hits} not_modified={self.revalidated} misses={self.misses} "
+                f"hit_rate={self.hit_rate:.1%}")
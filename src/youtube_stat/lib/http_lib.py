@@ -1,27 +1,277 @@
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from http import client
 from logging import getLogger
-from time import sleep
-from urllib import request, parse
+from time import sleep, monotonic, perf_counter, time
+from urllib import parse
 from urllib.error import HTTPError
 
+from youtube_stat.lib.http_cache import HttpResponseCache
+from youtube_stat.lib.metrics import get_metrics
+
 logger = getLogger()
 
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def create_http_client(rc, rate_limit=None, cache: HttpResponseCache = None):
+    """HttpClient configured by the http_* settings of ResourceConfig"""
+    return HttpClient(RateLimiter(rate_limit), max_retry=rc.http_max_retry, timeout=rc.http_timeout,
+                      backoff=Backoff(rc.http_backoff_base, rc.http_backoff_max, rc.http_max_retry_after),
+                      failure_threshold=rc.http_circuit_failure_threshold,
+                      reset_timeout=rc.http_circuit_reset_seconds, cache=cache)
+
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+class RateLimiter:
+    """Client side limiter which allows at most `rate` calls per second across threads."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_time = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            sleep(wait_time)
+
+
+class Backoff:
+    """Exponential backoff with jitter; honors Retry-After up to `max_retry_after` seconds."""
+
+    def __init__(self, base=1.0, max_delay=60.0, max_retry_after=300.0):
+        self.base = base
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, retry_after=None):
+        """
+        :param int attempt: 0 for the first retry
+        :param str retry_after: value of Retry-After header (seconds or HTTP date)
+        """
+        d = min(self.max_delay, self.base * 2 ** attempt)
+        d = d / 2 + random.uniform(0, d / 2)
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            d = max(d, min(server_delay, self.max_retry_after))
+        return d
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive failures until `reset_timeout` seconds passed.
+
+    Then one trial request is let through (half open); its success closes the circuit again.
+    """
 
-def http_get(url, params=None, max_retry=5):
-    req_url = '{}?{}'.format(url, parse.urlencode(params))
-    logger.debug(f"GET {req_url}")
-    body = None
-    last_error = None
-    for i in range(max_retry):
-        try:
-            req = request.Request(req_url)
-            with request.urlopen(req) as res:
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and monotonic() - self.opened_at >= self.reset_timeout:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def cancel(self):
+        """the request ended without telling if the host is healthy (e.g. interrupted); allow another trial"""
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.failure_threshold and self.failures >= self.failure_threshold):
+                if self.opened_at is None or self._trial:
+                    logger.warning(f"circuit opened after {self.failures} consecutive failures")
+                self.opened_at = monotonic()
+                self._trial = False
+
+
+class HttpClient:
+    """Keep-alive HTTP client which holds one connection per (thread, host).
+
+    Server errors, 429, timeouts and connection errors are retried with exponential backoff (and Retry-After);
+    other errors raise HTTPError at once. A circuit breaker per host makes calls fail fast while the host is down.
+    Every attempt is recorded by status per endpoint (host and path unless specified) into `get_metrics()`.
+    With a cache, responses of the endpoints it knows are reused while fresh and revalidated by ETag after that.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter = None, max_retry=5, metrics=None, timeout=30.0,
+                 backoff: Backoff = None, failure_threshold=5, reset_timeout=60.0, cache: HttpResponseCache = None):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retry = max_retry
+        self.metrics = metrics or get_metrics()
+        self.timeout = timeout
+        self.backoff = backoff or Backoff()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = cache
+        self._breakers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all_connections = []
+
+    def get(self, url, params=None, max_retry=None, endpoint=None, quota=0):
+        """
+        :param max_retry: number of attempts (at least one is made): default is `self.max_retry`
+        :param endpoint: name of the API for metrics and the response cache (e.g. youtube.search)
+        :param quota: API quota units every request sent to the server costs (for metrics)
+        """
+        max_retry = max(1, self.max_retry if max_retry is None else max_retry)
+        req_url = '{}?{}'.format(url, parse.urlencode(params)) if params else url
+        logger.debug(f"GET {req_url}")
+        u = parse.urlsplit(url)
+        metrics = self.metrics
+        if metrics.enabled and not endpoint:
+            endpoint = u.netloc + u.path
+
+        cache = self.cache if self.cache and self.cache.cacheable(endpoint) else None
+        cache_key = cached = None
+        headers = {}
+        if cache:
+            cache_key = cache.create_key(url, params)
+            cached = cache.get(cache_key)
+            if cached and cache.is_fresh(endpoint, cached):
+                cache.count('hits')
+                return cached.body
+            if cached and cached.etag:
+                headers["If-None-Match"] = cached.etag
+
+        breaker = self._breaker(u.netloc)
+        last_error = None
+        for i in range(max_retry):
+            if i > 0:
+                metrics.record_retry(endpoint)
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit for {u.netloc} is open") from last_error
+            retry_after = None
+            try:
+                self.rate_limiter.wait()
+                if quota:
+                    metrics.add_quota(endpoint, quota)
+                begin = perf_counter()
+                status, res_headers, body = self._request(req_url, headers)
+                breaker.success()
+                metrics.record_request(endpoint, status, perf_counter() - begin, len(body))
+                if cache and status == 304 and cached:
+                    cache.touch(cache_key)
+                    cache.count('revalidated')
+                    return cached.body
+                if cache:
+                    cache.put(cache_key, res_headers.get("ETag"), body)
+                    cache.count('misses')
+                return body
+            except HTTPError as e:
+                metrics.record_request(endpoint, e.code, perf_counter() - begin)
+                last_error = e
+                if e.code not in RETRY_STATUS and e.code < 500:
+                    breaker.success()  # the host is alive
+                    raise
+                retry_after = e.headers.get("Retry-After") if e.headers else None
+            except (OSError, client.HTTPException) as e:  # timeout, connection refused/reset, DNS failure, ...
+                metrics.record_request(endpoint, type(e).__name__, perf_counter() - begin)
+                last_error = e
+            except BaseException:
+                breaker.cancel()  # otherwise a half open circuit would wait forever for the result of its trial
+                raise
+            breaker.failure()
+            if i + 1 < max_retry:
+                delay = self.backoff.delay(i, retry_after)
+                logger.warning(f"GET {u.netloc}{u.path} failed ({last_error}), retry in {delay:.1f} sec")
+                sleep(delay)
+
+        raise last_error
+
+    def close(self):
+        with self._lock:
+            for conn in self._all_connections:
+                conn.close()
+            self._all_connections = []
+
+    def _breaker(self, netloc):
+        with self._lock:
+            if netloc not in self._breakers:
+                self._breakers[netloc] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[netloc]
+
+    def _request(self, req_url, headers=None):
+        u = parse.urlsplit(req_url)
+        path = u.path or '/'
+        if u.query:
+            path += '?' + u.query
+        for reconnect in (False, True):
+            conn = self._connection(u.scheme, u.netloc, reconnect)
+            try:
+                conn.request("GET", path, headers=dict(headers or {}, Connection="keep-alive"))
+                res = conn.getresponse()
                 body = res.read()
-        except HTTPError as e:
-            last_error = e
-            if e.code < 500:
                 break
-            sleep(i * 2)
+            except (client.RemoteDisconnected, client.CannotSendRequest, BrokenPipeError, ConnectionResetError):
+                # the server closed an idle keep-alive connection
+                conn.close()
+                if reconnect:
+                    raise
+            except (OSError, client.HTTPException):
+                # e.g. timeout; the connection is in an unknown state
+                self._connections().pop((u.scheme, u.netloc), None)
+                conn.close()
+                raise
+        if res.status >= 400:
+            raise HTTPError(req_url, res.status, res.reason, res.headers, None)
+        return res.status, res.headers, body
 
-    if body is None:
-        raise last_error
-    return body
+    def _connections(self):
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def _connection(self, scheme, netloc, reconnect=False):
+        connections = self._connections()
+        key = (scheme, netloc)
+        if reconnect and key in connections:
+            connections.pop(key).close()
+        if key not in connections:
+            if scheme == 'https':
+                connections[key] = client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                connections[key] = client.HTTPConnection(netloc, timeout=self.timeout)
+            with self._lock:
+                self._all_connections.append(connections[key])
+        return connections[key]
@@ -0,0 +1,83 @@
+import atexit
+import builtins
+import importlib
+import sys
+from time import perf_counter
+
+_installed = None  # type: ImportProfiler
+
+
+def import_module(name):
+    """importlib.import_module, recorded by the installed ImportProfiler if any.
+
+    importlib does not call builtins.__import__, so modules imported by name have to be timed here.
+    """
+    if _installed is None:
+        return importlib.import_module(name)
+    return _installed.import_module(name)
+
+
+class ImportProfiler:
+    """Measures the time spent to import each module, like `python -X importtime`.
+
+    Install it as early as possible; the report is written to stderr at exit.
+    """
+
+    def __init__(self, top_n=30, stream=None):
+        self.top_n = top_n
+        self.stream = stream or sys.stderr
+        self.records = []  # [(module name, self sec, cumulative sec, depth)]
+        self._stack = []  # time spent in nested imports of each running import
+        self._original_import = None
+        self._begin = None
+
+    def install(self):
+        global _installed
+        _installed = self
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        self._begin = perf_counter()
+        atexit.register(self.report)
+        return self
+
+    def uninstall(self):
+        global _installed
+        if _installed is self:
+            _installed = None
+        if self._original_import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def import_module(self, name):
+        return self._timed(name, lambda: importlib.import_module(name))
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level > 0 and globals:
+            label = "." * level + name + f" (in {globals.get('__package__')})"
+        else:
+            label = name
+        return self._timed(label, lambda: self._original_import(name, globals, locals, fromlist, level))
+
+    def _timed(self, name, do_import):
+        n_modules = len(sys.modules)
+        self._stack.append(0.0)
+        begin = perf_counter()
+        try:
+            return do_import()
+        finally:
+            elapsed = perf_counter() - begin
+            nested = self._stack.pop()
+            if len(sys.modules) != n_modules:  # something was actually loaded
+                if self._stack:
+                    self._stack[-1] += elapsed
+                self.records.append((name, elapsed - nested, elapsed, len(self._stack)))
+
+    def report(self):
+        self.uninstall()
+        total = perf_counter() - self._begin
+        top_level = sum([r[2] for r in self.records if r[3] == 0])
+        out = self.stream
+        out.write(f"--- import profile: {top_level:.3f} sec in imports / {total:.3f} sec since start ---\n")
+        out.write(f"{'self[ms]':>10} {'cumulative[ms]':>15}  module\n")
+        for name, self_time, cumulative, depth in sorted(self.records, key=lambda r: -r[2])[:self.top_n]:
+            out.write(f"{self_time * 1000:10.1f} {cumulative * 1000:15.1f}  {'  ' * depth}{name}\n")
@@ -1,23 +1,89 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from xml.etree import ElementTree
 
 from youtube_stat.config import Config
-from youtube_stat.lib.http_lib import http_get
+from youtube_stat.lib.http_lib import create_http_client
+from youtube_stat.lib.token_cache import TokenizationCache
+from youtube_stat.lib.util import can_start_worker_processes
 
 
-class JapaneseParserByYahooAPI:  # limit: 50000 req/day
-    def __init__(self, config: Config):
+def create_japanese_parser(config: Config, cache: TokenizationCache = None):
+    name = config.resource.japanese_parser
+    if name == 'yahoo':
+        return JapaneseParserByYahooAPI(config, cache=cache)
+    elif name == 'janome':
+        return JapaneseParserByJanome(config, cache=cache)
+    raise ValueError(f"unknown japanese parser: {name}")
+
+
+class JapaneseParserBase(ABC):
+    """Parser which returns unique words of a text as a list of {count, surface, pos}.
+
+    Subclasses implement `call_parse_japanese` (and `call_parse_japanese_batch` if they can do better than a loop).
+    """
+    options = {}
+
+    def __init__(self, config: Config, cache: TokenizationCache = None):
         self.config = config
+        self.cache = cache
 
     def parse_japanese(self, text: str, use_types=None):
+        return self.parse_japanese_batch([text], use_types=use_types)[0]
+
+    def parse_japanese_batch(self, texts, use_types=None):
+        texts = [str(x) for x in texts]
+        results = [self.cache and self.cache.get(text, self.options) for text in texts]
+        missing = list(OrderedDict.fromkeys([texts[i] for i, r in enumerate(results) if r is None]))
+        if missing:
+            parsed_dict = dict(zip(missing, self.call_parse_japanese_batch(missing)))
+            if self.cache:
+                for text, uniq_list in parsed_dict.items():
+                    self.cache.put(text, self.options, uniq_list)
+            results = [parsed_dict[text] if r is None else r for text, r in zip(texts, results)]
+        if use_types:
+            results = [[d for d in uniq_list if d['pos'] in use_types] for uniq_list in results]
+        return results
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def call_parse_japanese(self, text: str):
+        pass
+
+    def call_parse_japanese_batch(self, texts):
+        return [self.call_parse_japanese(text) for text in texts]
+
+
+class JapaneseParserByYahooAPI(JapaneseParserBase):  # limit: 50000 req/day
+    options = dict(parser='yahoo', results='ma,uniq', uniq_by_baseform='true')
+
+    def __init__(self, config: Config, cache: TokenizationCache = None):
+        super().__init__(config, cache=cache)
+        self.http_client = create_http_client(config.resource, config.resource.yahoo_api_rate_limit)
+
+    def close(self):
+        self.http_client.close()
+
+    def call_parse_japanese_batch(self, texts):
+        n_workers = self.config.resource.japanese_parser_workers or 1
+        if n_workers <= 1 or len(texts) <= 1:
+            return super().call_parse_japanese_batch(texts)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            return list(executor.map(self.call_parse_japanese, texts))
+
+    def call_parse_japanese(self, text: str):
         assert self.config.resource.yahoo_api_client_id, "Please specify Yahoo API Client ID"
-        url = 'https://jlp.yahooapis.jp/MAService/V1/parse'
+        url = self.config.resource.yahoo_api_url
         params = dict(
             appid=self.config.resource.yahoo_api_client_id,
             sentence=str(text),
-            results='ma,uniq',
-            uniq_by_baseform='true',
+            results=self.options['results'],
+            uniq_by_baseform=self.options['uniq_by_baseform'],
         )
-        ret = http_get(url, params)
+        ret = self.http_client.get(url, params, endpoint="yahoo.parse")
         root = ElementTree.fromstring(ret.decode())
         namespaces = {"a": 'urn:yahoo:jp:jlp'}
         # ma_result = root.find("./a:ma_result", namespaces=namespaces)
@@ -28,7 +94,57 @@ class JapaneseParserByYahooAPI:  # limit: 50000 req/day
         uniq_list = []
         for we in word_list:
             d = dict([(x, we.findtext(f"a:{x}", namespaces=namespaces)) for x in tags])
-            if use_types and d['pos'] not in use_types:
-                continue
             uniq_list.append(d)
         return uniq_list
+
+
+class JapaneseParserByJanome(JapaneseParserBase):
+    """Offline parser using Janome (pure python morphological analyzer with IPADIC).
+
+    Part of speech names are converted to the ones Yahoo API uses, and words are unified by base form.
+    """
+    options = dict(parser='janome', uniq_by_baseform='true')
+    MIN_TEXTS_PER_WORKER = 100
+
+    def call_parse_japanese(self, text: str):
+        return _janome_parse_texts([text])[0]
+
+    def call_parse_japanese_batch(self, texts):
+        n_workers = self.config.resource.japanese_parser_workers or 1
+        n_workers = min(n_workers, len(texts) // self.MIN_TEXTS_PER_WORKER)
+        if n_workers <= 1 or not can_start_worker_processes():
+            return _janome_parse_texts(texts)
+
+        chunk_size = (len(texts) + n_workers - 1) // n_workers
+        chunks = [texts[i:i+chunk_size] for i in range(0, len(texts), chunk_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            for chunk_result in executor.map(_janome_parse_texts, chunks):
+                results += chunk_result
+        return results
+
+
+_janome_tokenizer = None
+_JANOME_POS_MAP = {'記号': '特殊', '接頭詞': '接頭辞', 'フィラー': '感動詞', 'その他': '特殊'}
+
+
+def _janome_parse_texts(texts):
+    global _janome_tokenizer
+    if _janome_tokenizer is None:
+        from janome.tokenizer import Tokenizer
+        _janome_tokenizer = Tokenizer()
+    return [_janome_uniq_words(_janome_tokenizer.tokenize(text)) for text in texts]
+
+
+def _janome_uniq_words(tokens):
+    counter = OrderedDict()
+    for token in tokens:
+        pos_list = token.part_of_speech.split(',')
+        pos = _JANOME_POS_MAP.get(pos_list[0], pos_list[0])
+        if pos_list[1] == '形容動詞語幹':
+            pos = '形容動詞'
+        elif pos_list[1] == '接尾':
+            pos = '接尾辞'
+        surface = token.base_form if token.base_form != '*' else token.surface
+        counter[(surface, pos)] = counter.get((surface, pos), 0) + 1
+    return [dict(count=str(c), surface=surface, pos=pos) for (surface, pos), c in counter.items()]
@@ -0,0 +1,152 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from logging import getLogger
+from time import time
+
+from youtube_stat.lib.file_util import save_json_to_file, open_file
+
+logger = getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0  # attempts, including the ones which failed
+        self.statuses = defaultdict(int)  # HTTP status (or exception name without a response) -> count
+        self.retries = 0
+        self.errors = defaultdict(int)  # the failed part of statuses
+        self.bytes = 0
+        self.quota = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # the last one is +Inf
+
+    def to_dict(self):
+        return dict(requests=self.requests, statuses=dict(self.statuses), retries=self.retries,
+                    errors=dict(self.errors), bytes=self.bytes,
+                    quota=self.quota, latency_sum=round(self.latency_sum, 6),
+                    latency_buckets=dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self.latency_buckets)))
+
+
+class Metrics:
+    """Per endpoint request counters of one run: latency histogram, retries, errors, bytes and API quota.
+
+    Components record into the process wide instance returned by `get_metrics()`.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.started_at = time()
+        self.endpoints = defaultdict(EndpointStats)
+        self._lock = threading.Lock()
+
+    def record_request(self, endpoint, status, seconds, n_bytes=0):
+        """one attempt of a request
+
+        :param status: HTTP status code, or the name of the exception when there was no response (e.g. timeout)
+        """
+        status = str(status)
+        with self._lock:
+            s = self.endpoints[endpoint]
+            s.requests += 1
+            s.statuses[status] += 1
+            if not status.isdigit() or int(status) >= 400:
+                s.errors[status] += 1
+            s.bytes += n_bytes
+            s.latency_sum += seconds
+            s.latency_buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self.endpoints[endpoint].retries += 1
+
+    def add_quota(self, endpoint, units):
+        with self._lock:
+            self.endpoints[endpoint].quota += units
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = dict([(k, v.to_dict()) for k, v in sorted(self.endpoints.items())])
+        return dict(started_at=self.started_at, elapsed=round(time() - self.started_at, 3),
+                    total_quota=sum([x['quota'] for x in endpoints.values()]), endpoints=endpoints)
+
+    def to_prometheus(self, prefix="youtube_stat"):
+        with self._lock:
+            items = sorted(self.endpoints.items())
+            lines = []
+
+            def metric(name, kind, help_text, samples, suffix=""):
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} {kind}")
+                add_samples(name + suffix, samples)
+
+            def add_samples(name, samples):
+                for labels, value in samples:
+                    label_str = ",".join([f'{k}="{v}"' for k, v in labels])
+                    lines.append(f"{prefix}_{name}{{{label_str}}} {value}")
+
+            metric("http_requests_total", "counter",
+                   "HTTP requests sent, including retries, by status code (exception name if no response)",
+                   [([("endpoint", e), ("status", c)], n) for e, s in items for c, n in sorted(s.statuses.items())])
+            metric("http_retries_total", "counter", "HTTP requests retried",
+                   [([("endpoint", e)], s.retries) for e, s in items])
+            metric("http_errors_total", "counter",
+                   "failed HTTP requests by status code (exception name if no response)",
+                   [([("endpoint", e), ("code", c)], n) for e, s in items for c, n in sorted(s.errors.items())])
+            metric("http_response_bytes_total", "counter", "bytes of response bodies",
+                   [([("endpoint", e)], s.bytes) for e, s in items])
+            metric("api_quota_units_total", "counter", "API quota units consumed",
+                   [([("endpoint", e)], s.quota) for e, s in items])
+
+            samples = []
+            for e, s in items:
+                cumulative = 0
+                for bound, n in zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], s.latency_buckets):
+                    cumulative += n
+                    samples.append(([("endpoint", e), ("le", bound)], cumulative))
+            metric("http_request_duration_seconds", "histogram", "HTTP request latency, until the failure for errors",
+                   samples, suffix="_bucket")
+            add_samples("http_request_duration_seconds_sum", [([("endpoint", e)], s.latency_sum) for e, s in items])
+            add_samples("http_request_duration_seconds_count", [([("endpoint", e)], s.requests) for e, s in items])
+        return "\n".join(lines) + "\n"
+
+    def save(self, json_path, prometheus_path):
+        save_json_to_file(json_path, self.to_dict())
+        with open_file(prometheus_path, "wt") as f:
+            f.write(self.to_prometheus())
+        for endpoint, s in sorted(self.endpoints.items()):
+            logger.info(f"{endpoint}: {s.requests} requests {dict(s.statuses)}, {s.retries} retries, "
+                        f"{s.bytes} bytes, quota={s.quota}, {s.latency_sum:.1f} sec")
+
+
+class NullMetrics:
+    """Disabled metrics; every call is a no-op."""
+
+    enabled = False
+
+    def record_request(self, endpoint, status, seconds, n_bytes=0):
+        pass
+
+    def record_retry(self, endpoint):
+        pass
+
+    def add_quota(self, endpoint, units):
+        pass
+
+    def save(self, json_path, prometheus_path):
+        pass
+
+
+_metrics = NullMetrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def setup_metrics(enabled):
+    global _metrics
+    _metrics = Metrics() if enabled else NullMetrics()
+    return _metrics
@@ -0,0 +1,66 @@
+import json
+import os
+from logging import getLogger
+
+from youtube_stat.lib.file_util import load_json_from_file, save_json_to_file
+from youtube_stat.lib.util import create_digest
+
+logger = getLogger(__name__)
+
+
+class StageCache:
+    """Skips a pipeline stage when neither its inputs, its params nor its outputs changed since the last run.
+
+    Files are fingerprinted by (size, mtime), so an unchanged run costs a few stat() calls.
+    The state of every stage is kept in one JSON file. With `force`, every stage runs and its state is renewed.
+    """
+
+    def __init__(self, state_path, enable=True, force=False):
+        self.state_path = state_path
+        self.enable = enable
+        self.force = force
+        self.state = load_json_from_file(state_path) if enable and os.path.exists(state_path) else {}
+
+    def run(self, name, func, inputs, outputs, params=None):
+        """call `func()` unless the stage is up to date; returns True if it was called"""
+        if self.force:
+            self.invalidate(name)
+        elif self.is_fresh(name, inputs, outputs, params):
+            logger.info(f"skip {name}: up to date")
+            return False
+        func()
+        self.mark(name, inputs, outputs, params)
+        return True
+
+    def is_fresh(self, name, inputs, outputs, params=None):
+        if not self.enable or name not in self.state:
+            return False
+        if not all([os.path.exists(x) for x in outputs]):
+            return False
+        return self.state[name] == self.fingerprint(inputs, outputs, params)
+
+    def mark(self, name, inputs, outputs, params=None):
+        if not self.enable:
+            return
+        self.state[name] = self.fingerprint(inputs, outputs, params)
+        save_json_to_file(self.state_path, self.state)
+
+    def invalidate(self, name):
+        if self.state.pop(name, None) is not None:
+            save_json_to_file(self.state_path, self.state)
+
+    @staticmethod
+    def fingerprint(inputs, outputs, params=None):
+        def file_stat(path):
+            path = str(path)
+            if not os.path.exists(path):
+                return [path, None, None]
+            st = os.stat(path)
+            return [path, st.st_size, st.st_mtime_ns]
+
+        data = dict(
+            inputs=[file_stat(x) for x in inputs],
+            outputs=[file_stat(x) for x in outputs],
+            params=params,
+        )
+        return create_digest(json.dumps(data, sort_keys=True, default=str).encode())
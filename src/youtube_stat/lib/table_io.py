@@ -0,0 +1,48 @@
+import importlib.util
+import os
+from functools import lru_cache
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+ARROW_FORMATS = ('feather', 'parquet')
+# rows per parquet row group, the unit which can be read without reading the whole file
+PARQUET_ROW_GROUP_SIZE = 65536
+
+
+@lru_cache(maxsize=None)
+def resolve_format(fmt):
+    """the format to use: feather and parquet need pyarrow >= 2.0 (optional), otherwise fall back to tsv
+
+    Only the APIs of pyarrow 2.0 are used, as it is the last release which supports numpy 1.14 of the Pipfile.lock.
+    """
+    if fmt not in ARROW_FORMATS + ('tsv',):
+        raise ValueError(f"unknown table format: {fmt}")
+    if fmt in ARROW_FORMATS and importlib.util.find_spec("pyarrow") is None:
+        logger.warning(f"pyarrow is not installed; use tsv instead of {fmt}")
+        return 'tsv'
+    return fmt
+
+
+def write_arrow_table(table, path):
+    """write a pyarrow.Table as feather (uncompressed, so that it can be memory-mapped) or parquet by extension"""
+    tmp_path = f"{path}.tmp"
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp_path, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    else:
+        from pyarrow import feather
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def read_arrow_table(path, columns=None):
+    """memory-mapped read of only `columns` (all if None)
+
+    :rtype: pyarrow.Table
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, memory_map=True)
+    from pyarrow import feather
+    return feather.read_table(path, columns=columns, memory_map=True)
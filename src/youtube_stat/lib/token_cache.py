@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import threading
+from logging import getLogger
+from time import time
+
+from youtube_stat.lib.util import create_digest
+
+logger = getLogger(__name__)
+
+
+class TokenizationCache:
+    """On-disk LRU cache of parse results, keyed by a digest of the text and the parser options.
+
+    The database file can be shared by every channel and run.
+    """
+
+    EVICT_CHECK_INTERVAL = 1000
+
+    def __init__(self, db_path, max_entries=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._n_put = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS token_cache (
+                    digest TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS token_cache_last_access ON token_cache (last_access)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self.conn.close()
+
+    @staticmethod
+    def create_key(text, options):
+        return create_digest(json.dumps([options, text], sort_keys=True, ensure_ascii=False).encode())
+
+    def get(self, text, options):
+        key = self.create_key(text, options)
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT result FROM token_cache WHERE digest = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE token_cache SET last_access = ? WHERE digest = ?", (time(), key))
+        return json.loads(row[0])
+
+    def put(self, text, options, result):
+        key = self.create_key(text, options)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO token_cache VALUES (?, ?, ?)",
+                              (key, json.dumps(result, ensure_ascii=False), time()))
+            self._n_put += 1
+            if self._n_put % self.EVICT_CHECK_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        n_entries = self.conn.execute("SELECT COUNT(*) FROM token_cache").fetchone()[0]
+        if n_entries > self.max_entries:
+            with self.conn:
+                self.conn.execute("""DELETE FROM token_cache WHERE digest IN (
+                    SELECT digest FROM token_cache ORDER BY last_access LIMIT ?)""", (n_entries - self.max_entries,))
+            logger.debug(f"evicted {n_entries - self.max_entries} entries from token cache")
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return f"token cache: hits={self.hits} misses={self.misses} hit_rate={self.hit_rate:.1%}"
@@ -1,3 +1,4 @@
+import multiprocessing
 from hashlib import sha256
 
 
@@ -6,3 +7,19 @@ def create_digest(data, func=None):
     obj = func()
     obj.update(data)
     return obj.hexdigest()
+
+
+def peak_rss_mb():
+    """peak RSS (MB) of this process and of its finished child processes, or (None, None) if unknown"""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None, None
+    to_mb = 1 / 1024  # ru_maxrss is KB on Linux
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * to_mb, 1),
+            round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * to_mb, 1))
+
+
+def can_start_worker_processes():
+    """daemonic processes (e.g. workers of a pool before Python 3.9) cannot have child processes"""
+    return not multiprocessing.current_process().daemon
@@ -1,12 +1,13 @@
 import argparse
 from logging import getLogger
-import importlib
 
 from moke_config import create_config
 
 from .lib.file_util import load_yaml_from_file
+from .lib.import_profiler import import_module
 from .config import Config
 from .lib.logger import setup_logger
+from .lib.metrics import setup_metrics
 
 logger = getLogger(__name__)
 
@@ -18,6 +19,10 @@ def create_parser():
     def add_common_options(p):
         p.add_argument("--log-level", help="specify Log Level(debug/info/warning/error): default=info",
                        choices=['debug', 'info', 'warning', 'error'])
+        p.add_argument("--force", action="store_true", help="run every stage even if its outputs are up to date")
+        p.add_argument("--profile-startup", action="store_true", help="report import time of each module at exit")
+        p.add_argument("--metrics", action="store_true",
+                       help="record HTTP latency, retries, errors, bytes and API quota per endpoint")
 
     sub_parser = sub.add_parser("crawl")
     sub_parser.add_argument("config", help="specify config file")
@@ -31,6 +36,11 @@ def create_parser():
 
     sub_parser = sub.add_parser("ana")
     sub_parser.add_argument("config", help="specify config file")
+    sub_parser.add_argument("--rolling-window", type=int, metavar="DAYS",
+                            help="also fit every window of DAYS days and write the coefficient time series")
+    sub_parser.add_argument("--rolling-step", type=int, metavar="DAYS", help="days the window slides by")
+    sub_parser.add_argument("--half-life", type=float, metavar="DAYS",
+                            help="weight videos in a window by 0.5 ** (age / DAYS)")
     sub_parser.set_defaults(command='analysis')
     add_common_options(sub_parser)
 
@@ -38,19 +48,49 @@ def create_parser():
     sub_parser.add_argument("config", help="specify config file")
     sub_parser.set_defaults(command='all')
     add_common_options(sub_parser)
+
+    sub_parser = sub.add_parser("batch")
+    sub_parser.add_argument("targets", nargs="+", help="specify config files or channel IDs")
+    sub_parser.add_argument("--base-config", help="specify config file used for targets given by channel ID")
+    sub_parser.add_argument("--workers", type=int, help="specify the number of worker processes")
+    sub_parser.set_defaults(command='batch', config=None)
+    add_common_options(sub_parser)
+
+    sub_parser = sub.add_parser("index", help="build or query the cross-channel word effect index")
+    sub_parser.add_argument("action", choices=['build', 'query', 'top'])
+    sub_parser.add_argument("words", nargs="*", help="words to query")
+    sub_parser.add_argument("--target", help="log_view or like_rate (query: all targets by default)")
+    sub_parser.add_argument("--limit", type=int, default=20, help="number of words for top: default=20")
+    sub_parser.add_argument("--min-channels", type=int, default=1,
+                            help="ignore words found in fewer channels for top: default=1")
+    sub_parser.add_argument("--ascending", action="store_true", help="list words with the smallest effect for top")
+    sub_parser.set_defaults(command='index', config=None)
+    add_common_options(sub_parser)
     return parser
 
 
 def setup(config: Config, args):
     config.resource.create_base_dirs()
     setup_logger(config.resource.main_log_path, level=args.log_level or 'info')
+    config.resource.migrate_legacy_files()
     config.runtime.args = args
+    if args.force:
+        config.resource.force_stages = True
+    if args.metrics:
+        config.resource.metrics_enabled = True
+    if getattr(args, "rolling_window", None):
+        config.model.rolling_window_days = args.rolling_window
+    if getattr(args, "rolling_step", None):
+        config.model.rolling_step_days = args.rolling_step
+    if getattr(args, "half_life", None):
+        config.model.rolling_half_life_days = args.half_life
+    setup_metrics(config.resource.metrics_enabled)
 
 
 def start():
     parser = create_parser()
     args = parser.parse_args()
-    if args.config:
+    if getattr(args, "config", None):
         config_dict = load_yaml_from_file(args.config)
     else:
         config_dict = {}
@@ -59,8 +99,11 @@ def start():
     logger.info(args)
 
     if hasattr(args, "command"):
-        m = importlib.import_module(f'youtube_stat.command.{args.command}')
-        m.start(config)
+        m = import_module(f'youtube_stat.command.{args.command}')
+        try:
+            m.start(config)
+        finally:
+            config.resource.save_metrics()
     else:
         parser.print_help()
         raise RuntimeError(f"unknown command")
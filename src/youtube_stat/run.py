@@ -1,11 +1,6 @@
 import os
 import sys
 
-from dotenv import load_dotenv, find_dotenv
-
-if find_dotenv():
-    load_dotenv(find_dotenv())
-
 _PATH_ = os.path.dirname(os.path.dirname(__file__))
 
 if _PATH_ not in sys.path:
@@ -13,5 +8,14 @@ if _PATH_ not in sys.path:
 
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        from youtube_stat.lib.import_profiler import ImportProfiler
+        ImportProfiler().install()
+
+    from dotenv import load_dotenv, find_dotenv
+
+    if find_dotenv():
+        load_dotenv(find_dotenv())
+
     from youtube_stat import manager
     manager.start()
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib import parse
+
+StubResponse = namedtuple('StubResponse', 'status body headers delay')
+StubRequest = namedtuple('StubRequest', 'time path params headers')
+
+
+def stub_response(status=200, body=b"", headers=None, delay=0):
+    return StubResponse(status, body, headers or {}, delay)
+
+
+class StubServer:
+    """HTTP server on localhost which answers GET by `responder(StubRequest) -> StubResponse`
+
+    Requests are recorded in `requests`. `delay` seconds are slept before answering (e.g. to cause timeouts).
+    """
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.requests = []
+        self._lock = threading.Lock()
+        self.httpd = _ThreadingHTTPServer(("127.0.0.1", 0), _create_handler(self))
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle(self, request: StubRequest):
+        with self._lock:
+            self.requests.append(request)
+        return self.responder(request)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _create_handler(server: StubServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # headers and body are written separately; don't wait for the delayed ACK
+
+        def do_GET(self):
+            u = parse.urlsplit(self.path)
+            request = StubRequest(time.monotonic(), u.path, dict(parse.parse_qsl(u.query)), dict(self.headers))
+            res = server.handle(request)
+            if res.delay:
+                time.sleep(res.delay)
+            try:
+                self.send_response(res.status)
+                for k, v in res.headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(res.body)))
+                self.end_headers()
+                self.wfile.write(res.body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up (timeout)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
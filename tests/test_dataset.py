@@ -0,0 +1,102 @@
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from os.path import join
+from unittest import mock
+
+import numpy as np
+
+from youtube_stat.data.dataset import BasicDataset, read_frame, save_frame
+from youtube_stat.data.vocabulary import Vocabulary
+from youtube_stat.lib import table_io
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def create_dataset(n=25, seed=0):
+    rng = np.random.RandomState(seed)
+    vocabulary = Vocabulary(["猫", "犬", "動画", "散歩", "ゲーム"])
+    word_lists = [rng.randint(0, len(vocabulary), rng.randint(0, 4)) for _ in range(n)]
+    word_lists[3] = np.zeros(0, dtype=np.int64)  # a title without words
+    dataset = BasicDataset(
+        ids=[f"v{i:02d}" for i in range(n)],
+        dates=np.datetime64('2019-06-01') + rng.randint(0, 400, n).astype('timedelta64[D]'),
+        titles=[f"タイトル {i}" for i in range(n)],
+        stats=rng.randint(0, 10 ** 7, (n, 4)),
+        words=np.concatenate(word_lists),
+        word_offsets=np.cumsum([0] + [len(ws) for ws in word_lists]),
+    )
+    return dataset, vocabulary
+
+
+class TestBasicDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assert_same(self, expected: BasicDataset, actual: BasicDataset):
+        self.assertEqual(list(expected.ids), list(actual.ids))
+        np.testing.assert_array_equal(expected.dates, actual.dates)
+        self.assertEqual(list(expected.titles), list(actual.titles))
+        np.testing.assert_array_equal(expected.stats, actual.stats)
+        np.testing.assert_array_equal(expected.words, actual.words)
+        np.testing.assert_array_equal(expected.word_offsets, actual.word_offsets)
+        self.assertEqual(np.dtype('datetime64[D]'), actual.dates.dtype)
+        self.assertEqual(np.int32, actual.words.dtype)
+
+    def assert_round_trip(self, fmt):
+        dataset, vocabulary = create_dataset()
+        path = join(self.tmp_dir, f"dataset.{fmt}")
+        dataset.save(path, vocabulary)
+        self.assert_same(dataset, BasicDataset.load(path, vocabulary))
+        for chunk_size in [1, 7, 25, 100]:
+            begin = 0
+            for chunk in BasicDataset.iter_file(path, chunk_size, vocabulary):
+                self.assertTrue(0 < len(chunk) <= chunk_size)
+                self.assert_same(dataset.slice(begin, begin + len(chunk)), chunk)
+                begin += len(chunk)
+            self.assertEqual(len(dataset), begin)
+
+        df = read_frame(path, ["id", "date", "view"])
+        self.assertEqual(["id", "date", "view"], list(df.columns))
+        self.assertEqual(list(dataset.ids), list(df.id))
+        np.testing.assert_array_equal(dataset.dates, df.date.values.astype('datetime64[D]'))
+        np.testing.assert_array_equal(dataset.stats[:, 0], df.view.values)
+        return path
+
+    def test_tsv(self):
+        self.assert_round_trip("tsv")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_feather(self):
+        self.assert_round_trip("feather")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_parquet(self):
+        with mock.patch.object(table_io, "PARQUET_ROW_GROUP_SIZE", 10):  # chunks are read within a row group
+            path = self.assert_round_trip("parquet")
+        import pyarrow.parquet as pq
+        self.assertEqual(3, pq.ParquetFile(path).num_row_groups)
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_empty(self):
+        dataset, vocabulary = create_dataset()
+        empty = dataset.slice(0, 0)
+        for fmt in ["feather", "parquet"]:
+            path = join(self.tmp_dir, f"empty.{fmt}")
+            empty.save(path, vocabulary)
+            self.assert_same(empty, BasicDataset.load(path))
+
+    def test_frame(self):
+        dataset, _ = create_dataset()
+        df = dataset.to_frame()
+        for fmt in ["tsv", "feather", "parquet"] if HAS_PYARROW else ["tsv"]:
+            path = join(self.tmp_dir, f"frame.{fmt}")
+            save_frame(df, path)
+            actual = read_frame(path)
+            self.assertEqual(list(df.columns), list(actual.columns))
+            self.assertEqual(df.date.dtype, actual.date.dtype)
+            self.assertTrue(df.equals(actual), fmt)
@@ -0,0 +1,19 @@
+import unittest
+from datetime import datetime
+
+from dateutil.tz import tzutc
+
+from youtube_stat.lib.datetime_util import parse_date_str
+
+
+class TestParseDateStr(unittest.TestCase):
+    def test_fast_path(self):
+        self.assertEqual(datetime(2018, 6, 28, 9, 0, 1, 500000, tzinfo=tzutc()),
+                         parse_date_str("2018-06-28T09:00:01.5Z"))
+        self.assertEqual(datetime(2019, 7, 1), parse_date_str("2019/07/01"))
+        self.assertEqual(datetime(2019, 7, 1), parse_date_str("2019-07-01"))
+
+    def test_invalid_date(self):
+        # matches the fast path patterns, but is left to the slow path
+        self.assertIsNone(parse_date_str("2019/13/45"))
+        self.assertIsNone(parse_date_str("2019-02-30T00:00:00Z"))
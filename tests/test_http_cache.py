@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+import time
+import unittest
+from os.path import join
+
+from tests.stub_server import StubServer, stub_response
+from youtube_stat.lib.http_cache import HttpResponseCache
+from youtube_stat.lib.http_lib import HttpClient, Backoff
+
+
+def if_none_match(request):
+    return dict((k.lower(), v) for k, v in request.headers.items()).get("if-none-match")
+
+
+class EtagServer:
+    """answers `body` with ETag `etag`, or 304 when If-None-Match matches"""
+
+    def __init__(self, body=b"v1 body", etag='"v1"'):
+        self.body = body
+        self.etag = etag
+
+    def __call__(self, request):
+        if if_none_match(request) == self.etag:
+            return stub_response(304, headers={"ETag": self.etag})
+        return stub_response(200, self.body, headers={"ETag": self.etag})
+
+
+class TestHttpResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = join(self.tmp_dir, "http_cache.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def get(self, cache, url, params=None, endpoint="api"):
+        client = HttpClient(max_retry=1, timeout=1.0, backoff=Backoff(base=0.01, max_delay=0.05), cache=cache)
+        try:
+            return client.get(url, params, endpoint=endpoint)
+        finally:
+            client.close()
+
+    def test_fresh_hit_skips_network(self):
+        with StubServer(EtagServer()) as server, HttpResponseCache(self.db_path, {"api": 3600}) as cache:
+            self.assertEqual(b"v1 body", self.get(cache, f"{server.url}/api", dict(q="x")))
+            self.assertEqual(b"v1 body", self.get(cache, f"{server.url}/api", dict(q="x")))
+            self.assertEqual(1, len(server.requests))
+            self.assertEqual((1, 0, 1), (cache.hits, cache.revalidated, cache.misses))
+            # other parameters and endpoints which are not in ttls are not served from the cache
+            self.get(cache, f"{server.url}/api", dict(q="y"))
+            self.get(cache, f"{server.url}/api", dict(q="x"), endpoint="other")
+            self.assertEqual(3, len(server.requests))
+
+    def test_expired_entry_is_revalidated(self):
+        stub = EtagServer()
+        with StubServer(stub) as server, HttpResponseCache(self.db_path, {"api": 0}) as cache:
+            self.assertEqual(b"v1 body", self.get(cache, f"{server.url}/api"))
+            self.assertIsNone(if_none_match(server.requests[0]))
+            self.assertEqual(b"v1 body", self.get(cache, f"{server.url}/api"))
+            self.assertEqual('"v1"', if_none_match(server.requests[1]))
+            self.assertEqual((0, 1, 1), (cache.hits, cache.revalidated, cache.misses))
+
+            # a changed resource is downloaded and replaces the cached one
+            stub.body, stub.etag = b"v2 body", '"v2"'
+            self.assertEqual(b"v2 body", self.get(cache, f"{server.url}/api"))
+            self.assertEqual('"v1"', if_none_match(server.requests[2]))
+            self.assertEqual(b"v2 body", self.get(cache, f"{server.url}/api"))
+            self.assertEqual('"v2"', if_none_match(server.requests[3]))
+            self.assertEqual((0, 2, 2), (cache.hits, cache.revalidated, cache.misses))
+
+    def test_key_ignores_credentials(self):
+        key = HttpResponseCache.create_key("http://Example.com/api?b=2", dict(a=1, key="secret", appid="app"))
+        self.assertEqual("http://example.com/api?a=1&b=2", key)
+        self.assertEqual(key, HttpResponseCache.create_key("http://example.com/api", dict(b=2, a="1", key="other")))
+
+        with StubServer(EtagServer()) as server, HttpResponseCache(self.db_path, {"api": 3600}) as cache:
+            self.get(cache, f"{server.url}/api", dict(q="x", key="key1"))
+            self.assertEqual(b"v1 body", self.get(cache, f"{server.url}/api", dict(q="x", key="key2")))
+            self.assertEqual(1, len(server.requests))
+            self.assertEqual("key1", server.requests[0].params["key"])
+            keys = [row[0] for row in cache.conn.execute("SELECT url FROM http_cache")]
+        self.assertEqual([f"{server.url}/api?q=x"], keys)
+
+    def test_evict_least_recently_used(self):
+        cache = HttpResponseCache(self.db_path, {"api": 3600}, max_bytes=250)
+        cache.EVICT_CHECK_INTERVAL = 1
+        try:
+            cache.put("a", None, b"a" * 100)
+            time.sleep(0.01)
+            cache.put("b", None, b"b" * 100)
+            time.sleep(0.01)
+            self.assertIsNotNone(cache.get("a"))  # b is the least recently used now
+            time.sleep(0.01)
+            cache.put("c", None, b"c" * 100)
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(b"a" * 100, cache.get("a").body)
+            self.assertEqual(b"c" * 100, cache.get("c").body)
+        finally:
+            cache.close()
+
+    def test_evict_on_close(self):
+        with HttpResponseCache(self.db_path, {"api": 3600}, max_bytes=250) as cache:
+            for i in range(5):
+                cache.put(str(i), None, bytes(100))
+                time.sleep(0.01)
+        with HttpResponseCache(self.db_path, {"api": 3600}) as cache:
+            keys = [row[0] for row in cache.conn.execute("SELECT url FROM http_cache ORDER BY url")]
+            total = cache.conn.execute("SELECT SUM(size) FROM http_cache").fetchone()[0]
+        self.assertEqual(["3", "4"], keys)
+        self.assertLessEqual(total, 250)
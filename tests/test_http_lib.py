@@ -0,0 +1,222 @@
+import time
+import unittest
+from email.utils import formatdate
+from unittest import mock
+from urllib.error import HTTPError
+
+from tests.stub_server import StubServer, stub_response
+from youtube_stat.lib.http_lib import HttpClient, Backoff, CircuitBreaker, CircuitOpenError, parse_retry_after
+from youtube_stat.lib.metrics import Metrics
+
+
+def create_client(**kwargs):
+    kwargs.setdefault("backoff", Backoff(base=0.01, max_delay=0.05, max_retry_after=1.0))
+    kwargs.setdefault("timeout", 1.0)
+    return HttpClient(**kwargs)
+
+
+def scripted(*responses):
+    """responder which answers by `responses` in order, then repeats the last one"""
+    responses = list(responses)
+
+    def responder(_):
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+    return responder
+
+
+class TestHttpClient(unittest.TestCase):
+    def test_retry_server_errors(self):
+        with StubServer(scripted(stub_response(503), stub_response(500), stub_response(200, b"ok"))) as server:
+            client = create_client(max_retry=5)
+            try:
+                self.assertEqual(b"ok", client.get(f"{server.url}/api", dict(q="x")))
+            finally:
+                client.close()
+        self.assertEqual(3, len(server.requests))
+        self.assertEqual({"q": "x"}, server.requests[-1].params)
+
+    def test_retry_after_seconds(self):
+        with StubServer(scripted(stub_response(429, headers={"Retry-After": "0.3"}),
+                                 stub_response(200, b"ok"))) as server:
+            client = create_client()
+            try:
+                self.assertEqual(b"ok", client.get(f"{server.url}/api"))
+            finally:
+                client.close()
+        self.assertEqual(2, len(server.requests))
+        self.assertGreaterEqual(server.requests[1].time - server.requests[0].time, 0.3)
+
+    def test_retry_after_is_capped(self):
+        with StubServer(scripted(stub_response(503, headers={"Retry-After": "3600"}),
+                                 stub_response(200, b"ok"))) as server:
+            client = create_client(backoff=Backoff(base=0.01, max_delay=0.05, max_retry_after=0.2))
+            try:
+                begin = time.monotonic()
+                self.assertEqual(b"ok", client.get(f"{server.url}/api"))
+                self.assertLess(time.monotonic() - begin, 2.0)
+            finally:
+                client.close()
+
+    def test_retry_timeout(self):
+        with StubServer(scripted(stub_response(200, b"late", delay=1.0), stub_response(200, b"ok"))) as server:
+            client = create_client(timeout=0.2)
+            try:
+                self.assertEqual(b"ok", client.get(f"{server.url}/api"))
+            finally:
+                client.close()
+        self.assertEqual(2, len(server.requests))
+
+    def test_client_error_is_not_retried(self):
+        with StubServer(scripted(stub_response(404))) as server:
+            client = create_client(max_retry=5)
+            try:
+                with self.assertRaises(HTTPError) as cm:
+                    client.get(f"{server.url}/api")
+                self.assertEqual(404, cm.exception.code)
+            finally:
+                client.close()
+        self.assertEqual(1, len(server.requests))
+
+    def test_give_up_after_max_retry(self):
+        with StubServer(scripted(stub_response(503))) as server:
+            client = create_client(max_retry=3, failure_threshold=0)
+            try:
+                with self.assertRaises(HTTPError) as cm:
+                    client.get(f"{server.url}/api")
+                self.assertEqual(503, cm.exception.code)
+            finally:
+                client.close()
+        self.assertEqual(3, len(server.requests))
+
+    def test_at_least_one_attempt(self):
+        with StubServer(scripted(stub_response(503), stub_response(200, b"ok"))) as server:
+            client = create_client(max_retry=0, failure_threshold=0)
+            try:
+                with self.assertRaises(HTTPError) as cm:
+                    client.get(f"{server.url}/api")
+                self.assertEqual(503, cm.exception.code)
+                self.assertEqual(b"ok", client.get(f"{server.url}/api", max_retry=0))
+            finally:
+                client.close()
+        self.assertEqual(2, len(server.requests))
+
+    def test_circuit_breaker(self):
+        healthy = False
+
+        def responder(_):
+            return stub_response(200, b"ok") if healthy else stub_response(503)
+
+        with StubServer(responder) as server:
+            client = create_client(max_retry=2, failure_threshold=2, reset_timeout=0.5)
+            try:
+                with self.assertRaises(HTTPError):
+                    client.get(f"{server.url}/api")
+                self.assertEqual(2, len(server.requests))
+
+                # open: fails fast without a request
+                with self.assertRaises(CircuitOpenError):
+                    client.get(f"{server.url}/api")
+                self.assertEqual(2, len(server.requests))
+
+                # half open after reset_timeout: one trial request, whose failure opens the circuit again
+                time.sleep(0.6)
+                with self.assertRaises(CircuitOpenError):
+                    client.get(f"{server.url}/api")
+                self.assertEqual(3, len(server.requests))
+
+                # a successful trial closes the circuit
+                healthy = True
+                time.sleep(0.6)
+                self.assertEqual(b"ok", client.get(f"{server.url}/api"))
+                self.assertEqual(b"ok", client.get(f"{server.url}/api"))
+                self.assertEqual(5, len(server.requests))
+            finally:
+                client.close()
+
+    def test_interrupted_trial_allows_another(self):
+        with StubServer(scripted(stub_response(503), stub_response(200, b"ok"))) as server:
+            client = create_client(max_retry=1, failure_threshold=1, reset_timeout=0.2)
+            try:
+                with self.assertRaises(HTTPError):
+                    client.get(f"{server.url}/api")
+                time.sleep(0.3)
+                # the trial request fails by something other than the host (e.g. Ctrl-C)
+                with mock.patch.object(client, "_request", side_effect=KeyboardInterrupt):
+                    with self.assertRaises(KeyboardInterrupt):
+                        client.get(f"{server.url}/api")
+                self.assertEqual(b"ok", client.get(f"{server.url}/api"))
+            finally:
+                client.close()
+        self.assertEqual(2, len(server.requests))
+
+
+class TestMetrics(unittest.TestCase):
+    def test_every_attempt_is_recorded(self):
+        metrics = Metrics()
+        with StubServer(scripted(stub_response(503), stub_response(200, b"late", delay=0.5), stub_response(200, b"ok"),
+                                 stub_response(404))) as server:
+            client = create_client(timeout=0.2, metrics=metrics)
+            try:
+                self.assertEqual(b"ok", client.get(f"{server.url}/api", endpoint="api"))
+                with self.assertRaises(HTTPError):
+                    client.get(f"{server.url}/api", endpoint="api")
+            finally:
+                client.close()
+        s = metrics.endpoints["api"]
+        self.assertEqual(4, s.requests)
+        self.assertEqual({"503": 1, "timeout": 1, "200": 1, "404": 1}, dict(s.statuses))
+        self.assertEqual({"503": 1, "timeout": 1, "404": 1}, dict(s.errors))
+        self.assertEqual(2, s.retries)
+        self.assertEqual(2, s.bytes)
+        self.assertEqual(4, sum(s.latency_buckets))
+        self.assertGreaterEqual(s.latency_sum, 0.2)
+
+        text = metrics.to_prometheus()
+        self.assertIn('youtube_stat_http_requests_total{endpoint="api",status="503"} 1', text)
+        self.assertIn('youtube_stat_http_requests_total{endpoint="api",status="timeout"} 1', text)
+        self.assertIn('youtube_stat_http_request_duration_seconds_count{endpoint="api"} 4', text)
+
+
+class TestBackoff(unittest.TestCase):
+    def test_delay(self):
+        backoff = Backoff(base=1.0, max_delay=8.0, max_retry_after=30.0)
+        for attempt, expected in [(0, 1.0), (1, 2.0), (3, 8.0), (10, 8.0)]:
+            for _ in range(20):
+                d = backoff.delay(attempt)
+                self.assertGreaterEqual(d, expected / 2)
+                self.assertLessEqual(d, expected)
+        self.assertGreaterEqual(backoff.delay(0, retry_after="20"), 20.0)
+        self.assertEqual(30.0, backoff.delay(0, retry_after="100"))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(5.0, parse_retry_after("5"))
+        self.assertEqual(0.0, parse_retry_after("-1"))
+        self.assertAlmostEqual(60.0, parse_retry_after(formatdate(time.time() + 60, usegmt=True)), delta=2.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow())  # the trial
+        self.assertFalse(breaker.allow())  # only one at a time
+        breaker.success()
+        self.assertTrue(breaker.allow())
+
+    def test_cancel_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.failure()
+        breaker.cancel()  # no trial: stays open
+        self.assertFalse(breaker.allow())
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.cancel()
+        self.assertTrue(breaker.allow())  # another trial, as the first one ended without a result
+        self.assertFalse(breaker.allow())
@@ -0,0 +1,44 @@
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from youtube_stat.lib import import_profiler
+from youtube_stat.lib.import_profiler import ImportProfiler, import_module
+
+
+class TestImportProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        package = Path(self.tmp.name) / "profiled_pkg"
+        package.mkdir()
+        (package / "__init__.py").write_text("")
+        (package / "inner.py").write_text("VALUE = 1\n")
+        (package / "command.py").write_text("from . import inner\nimport json.tool\n")
+        sys.path.insert(0, self.tmp.name)
+
+    def tearDown(self):
+        sys.path.remove(self.tmp.name)
+        for name in [n for n in sys.modules if n.startswith("profiled_pkg")]:
+            del sys.modules[name]
+        self.tmp.cleanup()
+
+    def test_import_module_is_recorded(self):
+        profiler = ImportProfiler(stream=io.StringIO()).install()
+        try:
+            module = import_module("profiled_pkg.command")
+        finally:
+            profiler.uninstall()
+        self.assertEqual(1, module.inner.VALUE)
+        records = {name: (self_time, cumulative, depth) for name, self_time, cumulative, depth in profiler.records}
+        self.assertEqual(0, records["profiled_pkg.command"][2])
+        nested = [name for name in records if name != "profiled_pkg.command"]
+        self.assertTrue(nested)
+        self.assertTrue(all(records[name][2] >= 1 for name in nested))
+        self.assertGreaterEqual(records["profiled_pkg.command"][1], max(records[name][1] for name in nested))
+        self.assertIsNone(import_profiler._installed)
+
+    def test_import_module_without_profiler(self):
+        self.assertIsNone(import_profiler._installed)
+        self.assertEqual(1, import_module("profiled_pkg.inner").VALUE)
@@ -0,0 +1,62 @@
+import unittest
+import warnings
+
+import numpy as np
+from scipy import sparse
+
+from youtube_stat.analysis.ols import SparseOLS, fit_statsmodels_ols
+
+
+def create_design(n_obs=500, n_months=6, n_words=20, seed=0):
+    """month and weekday one-hot columns plus word columns: rank deficient together with the constant"""
+    rng = np.random.RandomState(seed)
+    month = np.eye(n_months)[rng.randint(0, n_months, n_obs)]
+    wday = np.eye(7)[rng.randint(0, 7, n_obs)]
+    words = (rng.rand(n_obs, n_words) < 0.1).astype(np.float64)
+    x = sparse.csr_matrix(np.column_stack([month, wday, words]))
+    columns = [f"m{i}" for i in range(n_months)] + [f"d{i}" for i in range(7)] + [f"w{i}" for i in range(n_words)]
+    ys = [x @ rng.randn(x.shape[1]) + rng.randn(n_obs) for _ in range(2)]
+    ys.append(np.log1p(rng.randint(100, 1000000, n_obs)))  # like log views
+    return x, columns, ys
+
+
+class TestSparseOLS(unittest.TestCase):
+    def assert_same_as_statsmodels(self, x, columns, ys):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results = SparseOLS(x, columns).fit(ys)
+            for y, result in zip(ys, results):
+                expected = fit_statsmodels_ols(x, columns, y)
+                table, expected_table = result.coef_table, expected.coef_table
+                self.assertEqual(list(expected_table.index), list(table.index))
+                np.testing.assert_allclose(table['Coef.'], expected_table['Coef.'], rtol=1e-8, atol=1e-10)
+                np.testing.assert_allclose(table['Std.Err.'], expected_table['Std.Err.'], rtol=1e-8, atol=1e-12)
+                np.testing.assert_allclose(table['t'], expected_table['t'], rtol=1e-6, atol=1e-8)
+                np.testing.assert_allclose(table['P>|t|'], expected_table['P>|t|'], rtol=1e-6, atol=1e-10)
+                np.testing.assert_allclose(table['[0.025'], expected_table['[0.025'], rtol=1e-8, atol=1e-10)
+                np.testing.assert_allclose(result.resid, expected.resid, rtol=0, atol=1e-9)
+
+    def test_rank_deficient(self):
+        x, columns, ys = create_design()
+        ols = SparseOLS(x, columns)
+        self.assertEqual(x.shape[1] + 1 - 2, ols.rank)  # month, weekday and const are collinear
+        self.assert_same_as_statsmodels(x, columns, ys)
+
+    def test_full_rank(self):
+        x, columns, ys = create_design(seed=1)
+        keep = [i for i, c in enumerate(columns) if c not in ("m0", "d0")]
+        x, columns = x[:, keep], [columns[i] for i in keep]
+        self.assertEqual(x.shape[1] + 1, SparseOLS(x, columns).rank)
+        self.assert_same_as_statsmodels(x, columns, ys)
+
+    def test_no_residual_degrees_of_freedom(self):
+        rng = np.random.RandomState(0)
+        x = rng.randn(10, 9)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            result = SparseOLS(x, [f"c{i}" for i in range(9)]).fit(rng.randn(10))[0]
+        info = dict(result.info_table.values.tolist())
+        self.assertEqual(0, info["Df Residuals:"])
+        self.assertTrue(np.isnan(info["Scale:"]))
+        self.assertTrue(np.isnan(result.coef_table['Std.Err.']).all())
+        self.assertTrue(np.isfinite(result.coef).all())
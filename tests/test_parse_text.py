@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from urllib.error import HTTPError
+from xml.sax.saxutils import escape
+
+from tests.stub_server import StubServer, stub_response
+from youtube_stat.config import Config
+from youtube_stat.data.processor import DataProcessor
+from youtube_stat.data.vocabulary import VocabularyIndex
+from youtube_stat.lib.file_util import save_jsonl_to_file, iter_jsonl_from_file
+
+TITLES = ["猫 動画", "犬 散歩", "料理 簡単", "boom 失敗", "旅行 東京"]
+
+
+def yahoo_response(sentence):
+    """uniq_result of the words separated by spaces, as Yahoo MAService answers"""
+    words = "".join(f"<word><count>1</count><surface>{escape(w)}</surface><pos>名詞</pos></word>"
+                    for w in sentence.split(" "))
+    body = (f'<?xml version="1.0" encoding="UTF-8" ?><ResultSet xmlns="urn:yahoo:jp:jlp">'
+            f'<uniq_result><total_count>1</total_count><filtered_count>1</filtered_count>'
+            f'<word_list>{words}</word_list></uniq_result></ResultSet>')
+    return stub_response(200, body.encode(), {"Content-Type": "text/xml"})
+
+
+class TestParseText(unittest.TestCase):
+    RATE_LIMIT = 10
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fail_words = {"boom"}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def responder(self, request):
+        if self.fail_words & set(request.params.get("sentence", "").split(" ")):
+            return stub_response(400, b"bad request")
+        return yahoo_response(request.params["sentence"])
+
+    def create_config(self, url):
+        config = Config()
+        rc = config.resource
+        rc.system_dir = Path(self.tmp_dir)
+        rc.log_dir = rc.system_dir / "log"
+        rc.cache_dir = rc.system_dir / "cache"
+        config.data.channel_id = "UCtest"
+        rc.japanese_parser = 'yahoo'
+        rc.yahoo_api_url = f"{url}/MAService/V1/parse"
+        rc.yahoo_api_client_id = "test"
+        rc.yahoo_api_rate_limit = self.RATE_LIMIT
+        rc.parse_checkpoint_interval = 2
+        rc.http_backoff_base = 0.01
+        rc.create_base_dirs()
+        save_jsonl_to_file(rc.video_detail_list_path, [dict(id=f"v{i}", snippet=dict(title=title))
+                                                       for i, title in enumerate(TITLES)])
+        return config
+
+    def parsed_titles(self, config):
+        kp = config.data.key_parsed_title
+        return dict((x["id"], [w["surface"] for w in x[kp]])
+                    for x in iter_jsonl_from_file(config.resource.video_detail_list_path) if x.get(kp))
+
+    def test_resume_from_checkpoint(self):
+        with StubServer(self.responder) as server:
+            config = self.create_config(server.url)
+            with self.assertRaises(HTTPError):
+                DataProcessor(config).parse_text()
+            # the first checkpoint (2 titles) is saved; the failed one is not
+            self.assertEqual({"v0": ["猫", "動画"], "v1": ["犬", "散歩"]}, self.parsed_titles(config))
+            # the vocabulary is saved on error too
+            self.assertEqual(["v0", "v1"], VocabularyIndex(config.resource.vocabulary_path).video_ids)
+
+            self.fail_words = set()
+            n_requests = len(server.requests)
+            DataProcessor(config).parse_text()
+            resumed = [x.params["sentence"] for x in server.requests[n_requests:]]
+
+        self.assertEqual(TITLES[2:], resumed)  # the checkpointed titles are not parsed again
+        parsed = self.parsed_titles(config)
+        self.assertEqual(["v0", "v1", "v2", "v3", "v4"], sorted(parsed))
+        self.assertEqual(["旅行", "東京"], parsed["v4"])
+        vocabulary = VocabularyIndex(config.resource.vocabulary_path)
+        self.assertEqual(["v0", "v1", "v2", "v3", "v4"], vocabulary.video_ids)
+        self.assertEqual(["旅行", "東京"], vocabulary.surfaces.lookup(vocabulary.surface_ids[-2:]).tolist())
+
+    def test_skip_parsed(self):
+        with StubServer(self.responder) as server:
+            config = self.create_config(server.url)
+            self.fail_words = set()
+            DataProcessor(config).parse_text()
+            n_requests = len(server.requests)
+            DataProcessor(config).parse_text()
+        self.assertEqual(len(TITLES), n_requests)
+        self.assertEqual(n_requests, len(server.requests))
+
+    def test_rate_limit(self):
+        with StubServer(self.responder) as server:
+            config = self.create_config(server.url)
+            self.fail_words = set()
+            DataProcessor(config).parse_text()
+        times = [x.time for x in server.requests]
+        self.assertEqual(len(TITLES), len(times))
+        # requests are spaced by 1 / rate (allowing for scheduling jitter)
+        for a, b in zip(times, times[1:]):
+            self.assertGreaterEqual(b - a, 0.8 / self.RATE_LIMIT)
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+from scipy import sparse, stats
+
+from youtube_stat.analysis.ols import SparseOLS
+from youtube_stat.analysis.resample import ResamplingTest
+
+
+def create_data(n_obs=300, n_cols=10, effect=0.5, seed=0):
+    """full rank 0/1 design (words) and y = const + X beta + noise"""
+    rng = np.random.RandomState(seed)
+    x = sparse.csr_matrix((rng.rand(n_obs, n_cols) < 0.3).astype(np.float64))
+    beta = rng.randn(n_cols) * effect
+    y = 1.0 + x @ beta + rng.randn(n_obs)
+    return x, [f"w{i}" for i in range(n_cols)], beta, y
+
+
+class TestResamplingTest(unittest.TestCase):
+    def test_reproducible(self):
+        x, columns, _, y = create_data()
+        ols = SparseOLS(x, columns)
+        result = ols.fit(y)[0]
+        for method in ResamplingTest.METHODS:
+            expected = ResamplingTest(ols, n_resamples=200, seed=1, n_workers=1, chunk_size=500).run(y, result, method)
+            for n_workers, chunk_size in [(1, 7), (3, 50), (4, 1)]:
+                df = ResamplingTest(ols, n_resamples=200, seed=1, n_workers=n_workers,
+                                    chunk_size=chunk_size).run(y, result, method)
+                np.testing.assert_allclose(df.values, expected.values, rtol=1e-10, atol=1e-12)
+            other = ResamplingTest(ols, n_resamples=200, seed=2).run(y, result, method)
+            self.assertFalse(np.allclose(other.values, expected.values))
+
+    def test_bootstrap_ci_covers_true_coef(self):
+        covered = []
+        for seed in range(5):
+            x, columns, beta, y = create_data(n_obs=500, seed=seed)
+            ols = SparseOLS(x, columns)
+            df = ResamplingTest(ols, n_resamples=1000, seed=seed).run(y, ols.fit(y)[0], 'bootstrap')
+            low, high = df['[0.025 boot'].values[:-1], df['0.975 boot]'].values[:-1]  # without const
+            covered += ((low <= beta) & (beta <= high)).tolist()
+        # nominal 95% of 50 intervals
+        self.assertGreaterEqual(np.mean(covered), 0.85)
+
+    def test_permutation_p_values_under_null(self):
+        p_values = []
+        for seed in range(10):
+            x, columns, _, y = create_data(n_obs=200, n_cols=20, effect=0, seed=seed)
+            ols = SparseOLS(x, columns)
+            df = ResamplingTest(ols, n_resamples=500, seed=seed).run(y, ols.fit(y)[0], 'permutation')
+            p_values += df['P (permutation)'].values[:-1].tolist()
+        p_values = np.array(p_values)
+        self.assertGreater(stats.kstest(p_values, 'uniform').pvalue, 0.01)
+        self.assertLess(np.mean(p_values <= 0.05), 0.1)
+
+    def test_permutation_detects_effect(self):
+        x, columns, beta, y = create_data(n_obs=500, effect=2.0)
+        ols = SparseOLS(x, columns)
+        df = ResamplingTest(ols, n_resamples=500, seed=0).run(y, ols.fit(y)[0], 'permutation')
+        strong = np.abs(beta) > 1.0
+        self.assertTrue(strong.any())
+        self.assertTrue((df['P (permutation)'].values[:-1][strong] < 0.01).all())
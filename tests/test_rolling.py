@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+from youtube_stat.analysis.rolling import RollingOLS
+
+
+def create_data(n_obs=400, n_words=15, seed=0):
+    """weekday one-hot and word columns over about 150 days (with a gap of 40 days), in random order"""
+    rng = np.random.RandomState(seed)
+    days = np.concatenate([rng.randint(0, 60, n_obs // 2), rng.randint(100, 150, n_obs - n_obs // 2)])
+    dates = np.datetime64('2019-01-01') + days.astype('timedelta64[D]')
+    wday = np.eye(7)[rng.randint(0, 7, n_obs)]
+    words = (rng.rand(n_obs, n_words) < 0.15).astype(np.float64)
+    words[:, -1] = days >= 100  # a word which only occurs after the gap
+    x = np.column_stack([wday, words])
+    ys = [x @ rng.randn(x.shape[1]) + rng.randn(n_obs) for _ in range(2)]
+    return sparse.csr_matrix(x), dates, ys
+
+
+def direct_fit(x, dates, ys, end, window_days, half_life_days, ridge):
+    """weighted ridge regression of the rows in [end - window, end) on the columns which occur in them"""
+    in_window = (dates >= end - np.timedelta64(window_days, 'D')) & (dates < end)
+    xw, y = x[in_window].toarray(), np.column_stack(ys)[in_window]
+    w = np.ones(len(xw))
+    if half_life_days:
+        w = 0.5 ** ((end - dates[in_window]).astype(np.int64) / half_life_days)
+    active = np.flatnonzero((xw != 0).sum(axis=0) > 0)
+    coef = np.full((x.shape[1], y.shape[1]), np.nan)
+    if len(active):
+        xa = xw[:, active]
+        coef[active] = np.linalg.solve(xa.T @ (w[:, None] * xa) + ridge * np.eye(len(active)),
+                                       xa.T @ (w[:, None] * y))
+    return coef, int(in_window.sum())
+
+
+class TestRollingOLS(unittest.TestCase):
+    def assert_same_as_direct_fit(self, window_days, step_days, half_life_days):
+        x, dates, ys = create_data()
+        model = RollingOLS(x, dates, window_days, step_days, half_life_days=half_life_days, ridge=1e-3, tol=1e-12)
+        windows, coefs, occurs = model.fit(ys)
+        self.assertEqual(len(windows), len(coefs))
+        if step_days <= window_days:  # the last window covers the last row
+            self.assertTrue(windows[-1].begin <= dates.max() < windows[-1].end)
+        n_empty = 0
+        for window, coef, occur in zip(windows, coefs, occurs):
+            expected, n_obs = direct_fit(x, dates, ys, window.end, window_days, half_life_days, 1e-3)
+            self.assertEqual(n_obs, window.n_obs)
+            in_window = (dates >= window.begin) & (dates < window.end)
+            np.testing.assert_array_equal((x[in_window] != 0).sum(axis=0).A1, occur)
+            np.testing.assert_array_equal(np.isnan(expected), np.isnan(coef))
+            np.testing.assert_allclose(coef, expected, rtol=1e-7, atol=1e-9, equal_nan=True)
+            n_empty += n_obs == 0
+        return windows, n_empty
+
+    def test_sliding_windows(self):
+        windows, n_empty = self.assert_same_as_direct_fit(window_days=30, step_days=7, half_life_days=None)
+        # the windows overlap, so rows enter and leave the window at most steps; some fall in the gap
+        self.assertGreater(len(windows), 15)
+        self.assertGreater(n_empty, 0)
+
+    def test_half_life(self):
+        self.assert_same_as_direct_fit(window_days=30, step_days=7, half_life_days=10.0)
+        self.assert_same_as_direct_fit(window_days=20, step_days=3, half_life_days=2.0)
+
+    def test_disjoint_windows(self):
+        self.assert_same_as_direct_fit(window_days=10, step_days=25, half_life_days=5.0)
+
+    def test_rows_enter_and_leave(self):
+        x, dates, ys = create_data()
+        windows = RollingOLS(x, dates, 30, 7).windows()
+        rows = [set(np.flatnonzero((dates >= end - np.timedelta64(30, 'D')) & (dates < end))) for end in windows]
+        changes = [(len(b - a), len(a - b)) for a, b in zip(rows, rows[1:])]
+        self.assertTrue(any(entered and left for entered, left in changes))
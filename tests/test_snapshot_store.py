@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import date
+from pathlib import Path
+
+from youtube_stat.config import Config
+from youtube_stat.data.processor import DataProcessor
+from youtube_stat.data.snapshot_store import StatisticsSnapshotStore
+
+
+def video_detail(view, fetched_at):
+    return dict(id="v0", statistics=dict(viewCount=str(view), likeCount="1", dislikeCount="0", commentCount="0"),
+                fetched_at=fetched_at)
+
+
+class TestSnapshotsAsOf(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = Config()
+        rc = self.config.resource
+        rc.system_dir = Path(self.tmp_dir)
+        rc.log_dir = rc.system_dir / "log"
+        rc.cache_dir = rc.system_dir / "cache"
+        self.config.data.channel_id = "UCtest"
+        rc.create_base_dirs()
+        with StatisticsSnapshotStore(rc.snapshot_db_path) as store:
+            store.append([video_detail(100, "2019-06-30T12:00:00Z"), video_detail(200, "2019-07-01T12:00:00Z"),
+                          video_detail(300, "2019-07-02T12:00:00Z")], "fetched_at")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def view_as_of(self, as_of):
+        return DataProcessor(self.config).load_snapshots_as_of(as_of)["v0"]["viewCount"]
+
+    def test_date_includes_the_day(self):
+        self.assertEqual("200", self.view_as_of("2019/07/01"))
+        self.assertEqual("200", self.view_as_of(date(2019, 7, 1)))
+        self.assertEqual("100", self.view_as_of("2019/06/30"))
+
+    def test_date_is_utc(self):
+        with StatisticsSnapshotStore(self.config.resource.snapshot_db_path) as store:
+            store.append([video_detail(250, "2019-07-01T20:00:00Z")], "fetched_at")
+        original_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "Asia/Tokyo"  # 2019-07-01 23:59:59 JST is 14:59:59 UTC
+        time.tzset()
+        try:
+            self.assertEqual("250", self.view_as_of("2019/07/01"))
+            self.assertEqual("250", self.view_as_of(date(2019, 7, 1)))
+            self.assertEqual("200", self.view_as_of("2019-07-01 19:59:59"))
+            self.assertEqual("250", self.view_as_of("2019-07-01 20:00:00"))
+        finally:
+            if original_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = original_tz
+            time.tzset()
+
+    def test_datetime(self):
+        self.assertEqual("100", self.view_as_of("2019-07-01T11:59:59Z"))
+        self.assertEqual("200", self.view_as_of("2019-07-01T12:00:00Z"))
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from youtube_stat.lib.stage_cache import StageCache
+
+
+class TestStageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, "state.json")
+        self.input_path = os.path.join(self.tmp_dir, "input.txt")
+        self.output_path = os.path.join(self.tmp_dir, "output.txt")
+        with open(self.input_path, "wt") as f:
+            f.write("input")
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_stage(self, **kwargs):
+        def func():
+            self.calls += 1
+            with open(self.output_path, "wt") as f:
+                f.write("output")
+        return StageCache(self.state_path, **kwargs).run("stage", func, [self.input_path], [self.output_path],
+                                                          params=dict(n=1))
+
+    def test_skip_fresh(self):
+        self.assertTrue(self.run_stage())
+        self.assertFalse(self.run_stage())
+        self.assertEqual(1, self.calls)
+
+    def test_force(self):
+        self.assertTrue(self.run_stage())
+        self.assertTrue(self.run_stage(force=True))
+        # the forced run renews the state, so the next run is skipped
+        self.assertFalse(self.run_stage())
+        self.assertEqual(2, self.calls)
+
+    def test_disable(self):
+        self.assertTrue(self.run_stage(enable=False))
+        self.assertTrue(self.run_stage(enable=False))
+        self.assertFalse(os.path.exists(self.state_path))
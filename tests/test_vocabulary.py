@@ -0,0 +1,65 @@
+import re
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+
+from youtube_stat.data.vocabulary import Vocabulary, VocabularyIndex
+
+
+def tokens(*surfaces, pos="名詞"):
+    return [dict(surface=s, pos=pos) for s in surfaces]
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_intern(self):
+        vocabulary = Vocabulary(["猫"])
+        np.testing.assert_array_equal([1, 0, 1, 2], vocabulary.intern_all(["犬", "猫", "犬", "鳥"]))
+        self.assertEqual(np.int32, vocabulary.intern_all(["猫"]).dtype)
+        self.assertEqual(["鳥", "猫"], list(vocabulary.lookup([2, 0])))
+        np.testing.assert_array_equal([0, 2], vocabulary.ids(["猫", "魚", "鳥"]))  # unknown ones are dropped
+        np.testing.assert_array_equal([True, False, False], vocabulary.contains([0, 1, 2], re.compile("^猫$")))
+
+
+class TestVocabularyIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = join(self.tmp_dir, "vocabulary.npz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_grow_across_runs(self):
+        index = VocabularyIndex(self.path)
+        index.add("v0", tokens("猫", "動画"))
+        index.add("v1", [])
+        index.add("v0", tokens("ignored"))  # a parsed title is not added again
+        index.save()
+        self.assertFalse(index.modified)
+        cat_id = index.surfaces.index["猫"]
+
+        index = VocabularyIndex(self.path)
+        self.assertEqual(["v0", "v1"], index.video_ids)
+        self.assertIn("v1", index)
+        self.assertFalse(index.modified)
+        index.add("v2", tokens("犬", "猫") + tokens("走る", pos="動詞"))
+        index.save()
+
+        index = VocabularyIndex(self.path)
+        self.assertEqual(cat_id, index.surfaces.index["猫"])  # ids saved before stay valid
+        self.assertEqual(["猫", "動画", "犬", "走る"], index.surfaces.items)
+        self.assertEqual(["名詞", "動詞"], index.pos.items)
+        np.testing.assert_array_equal([0, 2, 2, 5], index.offsets)
+        self.assertEqual(["猫", "動画", "犬", "猫", "走る"], list(index.surfaces.lookup(index.surface_ids)))
+        self.assertEqual(np.int32, index.surface_ids.dtype)
+
+    def test_token_table(self):
+        index = VocabularyIndex(self.path)
+        for i in range(1500):  # more words than %03d column names could tell apart
+            index.add(f"v{i}", tokens(f"w{i}", f"w{i + 1}"))
+        df = index.token_table(["v1200", "v3", "unknown"])
+        self.assertEqual([0, 0, 1, 1], df.vidx.tolist())
+        self.assertEqual(["w1200", "w1201", "w3", "w4"], list(index.surfaces.lookup(df.surface.values)))
+        self.assertEqual(1501, len(index.surfaces))
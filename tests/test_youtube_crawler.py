@@ -0,0 +1,88 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.stub_server import StubServer, stub_response
+from youtube_stat.config import Config
+from youtube_stat.data.youtube_crawler import YoutubeCrawler
+from youtube_stat.lib.file_util import iter_jsonl_from_file
+
+N_VIDEOS = 230  # 5 pages of search, 5 batches of videos
+
+
+class YoutubeApiStub:
+    """/search pages through N_VIDEOS videos; /videos answers later batches sooner to finish them out of order"""
+
+    def __call__(self, request):
+        if request.path == "/search":
+            page = int(request.params.get("pageToken", 0))
+            items = [dict(id=dict(kind="youtube#video", videoId=f"v{i:03d}"),
+                          snippet=dict(publishedAt=f"2019-01-01T00:{i // 60:02d}:{i % 60:02d}.000Z"))
+                     for i in range(page * 50, min((page + 1) * 50, N_VIDEOS))]
+            body = dict(items=items)
+            if (page + 1) * 50 < N_VIDEOS:
+                body["nextPageToken"] = str(page + 1)
+            return stub_response(200, json.dumps(body).encode())
+        if request.path == "/videos":
+            ids = request.params["id"].split(",")
+            items = [dict(id=x, snippet=dict(title=f"title {x}"), statistics=dict(viewCount=str(int(x[1:]) * 10)))
+                     for x in ids]
+            delay = 0.2 - int(ids[0][1:]) / N_VIDEOS * 0.2
+            return stub_response(200, json.dumps(dict(items=items)).encode(), delay=delay)
+        return stub_response(404)
+
+
+class TestYoutubeCrawler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def create_config(self, url, name, max_workers, rate_limit=None):
+        config = Config()
+        rc = config.resource
+        rc.system_dir = Path(self.tmp_dir) / name
+        rc.log_dir = rc.system_dir / "log"
+        rc.cache_dir = rc.system_dir / "cache"
+        config.data.channel_id = "UCtest"
+        rc.youtube_api_base_url = url
+        rc.youtube_api_key = "test"
+        rc.crawler_max_workers = max_workers
+        rc.crawler_rate_limit = rate_limit
+        rc.http_backoff_base = 0.01
+        rc.create_base_dirs()
+        return config
+
+    def crawl(self, config):
+        YoutubeCrawler(config).start()
+        kf = config.data.key_fetched_at
+        details = list(iter_jsonl_from_file(config.resource.video_detail_list_path))
+        for x in details:
+            self.assertIn(kf, x)
+            del x[kf]
+        return details
+
+    def test_workers_keep_order(self):
+        with StubServer(YoutubeApiStub()) as server:
+            expected = self.crawl(self.create_config(server.url, "serial", 1))
+            actual = self.crawl(self.create_config(server.url, "parallel", 4))
+        self.assertEqual(N_VIDEOS, len(expected))
+        self.assertEqual([f"v{i:03d}" for i in range(N_VIDEOS)], [x["id"] for x in expected])
+        self.assertEqual(expected, actual)
+        video_requests = [x for x in server.requests if x.path == "/videos"]
+        self.assertEqual(10, len(video_requests))
+        self.assertTrue(all("key" in x.params for x in video_requests))
+
+    def test_rate_limit(self):
+        rate_limit = 20
+        with StubServer(YoutubeApiStub()) as server:
+            self.crawl(self.create_config(server.url, "limited", 4, rate_limit=rate_limit))
+        times = sorted(x.time for x in server.requests)
+        self.assertEqual(10, len(times))
+        # requests are spaced by 1 / rate across the worker threads (allowing for scheduling jitter)
+        for a, b in zip(times, times[1:]):
+            self.assertGreaterEqual(b - a, 0.7 / rate_limit)
+        self.assertGreaterEqual(times[-1] - times[0], 0.9 * (len(times) - 1) / rate_limit)